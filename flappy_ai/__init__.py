@@ -1,14 +1,11 @@
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from pathlib import Path
-import os
+# The database lives in flappy_ai.database and is only set up the first time one of these is used,
+# so processes that never touch it, such as the actors, do not pay for importing SQLAlchemy.
+_DATABASE_NAMES = ("Base", "Session", "engine", "get_engine", "db_path")
 
-db_path = Path(f"{os.path.dirname(__file__)}/../data/data.db")
 
+def __getattr__(name: str):
+    if name in _DATABASE_NAMES:
+        from flappy_ai import database
 
-Base = declarative_base()
-engine = create_engine(f'sqlite:///{db_path}')
-
-Session = sessionmaker(bind=engine)
-
+        return getattr(database, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
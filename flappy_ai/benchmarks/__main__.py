@@ -0,0 +1,141 @@
+"""
+Runs every benchmark and writes the results to a JSON file, so runs on different commits can be compared.
+Runs on the CPU with synthetic frames unless --gpu is given.
+
+    python -m flappy_ai.benchmarks
+    python -m flappy_ai.benchmarks --only memory ipc
+    python -m flappy_ai.benchmarks --compare data/benchmarks/old.json data/benchmarks/new.json
+"""
+
+import argparse
+import importlib
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from typing import Iterable, Optional
+
+import numpy as np
+from structlog import get_logger
+
+logger = get_logger(__name__)
+
+# Name -> module, every module has a run() that returns its results.
+BENCHMARKS = {
+    "memory": "flappy_ai.benchmarks.memory",
+    "predict": "flappy_ai.benchmarks.predict",
+    "train_step": "flappy_ai.benchmarks.train_step",
+    "ipc": "flappy_ai.benchmarks.ipc",
+    "preprocess": "flappy_ai.benchmarks.preprocess",
+    "game_over": "flappy_ai.benchmarks.game_over",
+    "import_time": "flappy_ai.benchmarks.import_time",
+}
+OUTPUT_DIRECTORY = "data/benchmarks"
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "HEAD"], stderr=subprocess.DEVNULL, universal_newlines=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _to_json(value):
+    # The benchmarks hand back numpy scalars here and there.
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError(f"Can not write {type(value)} to JSON.")
+
+
+def run(names: Iterable[str] = BENCHMARKS) -> dict:
+    results = {}
+    for name in names:
+        start_time = time.time()
+        try:
+            result = importlib.import_module(BENCHMARKS[name]).run()
+        except ImportError as e:
+            # tensorflow is not always installed, the other benchmarks are still worth having.
+            logger.warn("Benchmark skipped.", benchmark=name, error=str(e))
+            result = {"skipped": str(e)}
+        except Exception as e:
+            logger.exception("Benchmark failed.", benchmark=name)
+            result = {"error": str(e)}
+        results[name] = {"seconds": round(time.time() - start_time, 3), "result": result}
+        logger.info("Benchmark done.", benchmark=name, seconds=results[name]["seconds"])
+
+    return {
+        "commit": _git_commit(),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "benchmarks": results,
+    }
+
+
+def _numbers(value, prefix: str = "") -> dict:
+    if isinstance(value, bool):
+        return {}
+    if isinstance(value, (int, float)):
+        return {prefix: value}
+    if isinstance(value, dict):
+        found = {}
+        for key, item in value.items():
+            found.update(_numbers(item, f"{prefix}.{key}" if prefix else str(key)))
+        return found
+    return {}
+
+
+def compare(old_path: str, new_path: str) -> dict:
+    """
+    new / old for every number both runs have. Whether higher is better depends on the number,
+    `_per_second` ones want to go up and latencies want to go down.
+    """
+    with open(old_path) as f:
+        old = _numbers(json.load(f)["benchmarks"])
+    with open(new_path) as f:
+        new = _numbers(json.load(f)["benchmarks"])
+    return {key: round(new[key] / old[key], 3) if old[key] else None for key in sorted(old.keys() & new.keys())}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m flappy_ai.benchmarks")
+    parser.add_argument("--only", nargs="+", choices=list(BENCHMARKS), help="Benchmarks to run, all by default.")
+    parser.add_argument("--output", help=f"Where to write the results, defaults to {OUTPUT_DIRECTORY}/.")
+    parser.add_argument("--gpu", action="store_true", help="Let tensorflow use the GPU.")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="Compare two result files and exit.")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        for key, ratio in compare(*args.compare).items():
+            print(f"{key:80} {ratio}")
+        return
+
+    if not args.gpu:
+        # Has to be set before tensorflow is imported, which the benchmarks only do once they run.
+        os.environ["CUDA_VISIBLE_DEVICES"] = "-1"
+
+    results = run(args.only or BENCHMARKS)
+    output = args.output
+    if output is None:
+        os.makedirs(OUTPUT_DIRECTORY, exist_ok=True)
+        commit = (results["commit"] or "unknown")[:8]
+        output = os.path.join(OUTPUT_DIRECTORY, f"{time.strftime('%Y%m%d-%H%M%S')}-{commit}.json")
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2, default=_to_json)
+    logger.info("Benchmark results written.", output=output)
+    # Skipped benchmarks are fine, one that failed, such as a detector disagreeing with the legacy check, is not.
+    failed = [name for name, benchmark in results["benchmarks"].items() if "error" in benchmark["result"]]
+    if failed:
+        logger.error("Benchmarks failed.", benchmarks=failed)
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
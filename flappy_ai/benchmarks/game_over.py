@@ -0,0 +1,130 @@
+"""
+Times GameOverDetector against the full screen check Game.step used to do, tests/test_game_over_detector.py
+checks that both come to the same answer on these frames. The detector is timed before it has seen the game
+over button (cold), with TemplatePosition set (seeded) and once it has found the button in an earlier game (warm).
+The frames are built from img/screen_base.png.
+
+    python -m flappy_ai.benchmarks.game_over
+"""
+
+import time
+from typing import Callable, List, Tuple
+
+import cv2
+import numpy as np
+from structlog import get_logger
+
+from flappy_ai.config import game_over_config
+from flappy_ai.models.game_over_detector import GameOverDetector
+from flappy_ai.models.image import Image
+
+logger = get_logger(__name__)
+
+# An orange that falls in the bird's HSV range, the greyscale sample has no colour left to find.
+BIRD_RGB = (230, 90, 30)
+BIRD_SIZE = (8, 12)
+BIRD_X = 46
+# Where the game over button is drawn on the frames of a finished game.
+BUTTON_POSITION = (60, 48)
+
+
+def fixtures(frames: int = 200, seed: int = 0) -> List[Image]:
+    """
+    A bird bobbing up and down with the odd jump, then frames without the bird and frames with the game over button.
+    """
+    random_state = np.random.RandomState(seed)
+    base = cv2.cvtColor(cv2.imread("img/screen_base.png", cv2.IMREAD_GRAYSCALE), cv2.COLOR_GRAY2RGB)
+    template = cv2.imread("img/game_over.png", cv2.IMREAD_GRAYSCALE)
+
+    images = []
+    bird_y = 70
+    for idx in range(frames):
+        image = base.copy()
+        if idx < frames * 3 // 4:
+            # Mostly small moves, sometimes one far bigger than the search window.
+            bird_y += random_state.randint(-4, 5) if random_state.rand() > 0.05 else random_state.randint(-40, 41)
+            bird_y = int(np.clip(bird_y, 0, image.shape[0] - BIRD_SIZE[0]))
+            image[bird_y : bird_y + BIRD_SIZE[0], BIRD_X : BIRD_X + BIRD_SIZE[1]] = BIRD_RGB
+        if idx >= frames * 7 // 8:
+            top, left = BUTTON_POSITION
+            image[top : top + template.shape[0], left : left + template.shape[1]] = template[..., None]
+            # The bird is still on screen while the button is shown.
+            image[bird_y : bird_y + BIRD_SIZE[0], BIRD_X : BIRD_X + BIRD_SIZE[1]] = BIRD_RGB
+        images.append(Image(image))
+    return images
+
+
+def legacy_game_over(template: np.array) -> Callable[[Image], bool]:
+    def game_over(screen: Image):
+        mask = cv2.inRange(screen.as_HSV(), lowerb=np.array([0, 100, 100]), upperb=np.array([15, 255, 255]))
+        points = cv2.findNonZero(mask)
+        if points is None or points.size == 0:
+            return True
+        match = cv2.matchTemplate(screen.as_greyscale(), template, cv2.TM_CCOEFF_NORMED)
+        match = np.where(match >= 0.8)
+        if match is None or not match[0].size:
+            return False
+        return True
+
+    return game_over
+
+
+def _fresh(image: Image) -> Image:
+    # Image caches its HSV copy, which would leave the legacy check nothing to do after the first pass.
+    return Image(image.image, greyscale=image.as_greyscale())
+
+
+def _latency_us(build: Callable[[], Callable[[Image], bool]], images: List[Image], repeats: int) -> float:
+    start_time = time.time()
+    for _ in range(repeats):
+        # A new check every pass, so whatever it worked out on the last pass does not carry over.
+        game_over = build()
+        for image in images:
+            game_over(_fresh(image))
+    return (time.time() - start_time) / (repeats * len(images)) * 1e6
+
+
+def _detector(template: np.array, template_position: Tuple[int, int] = None) -> GameOverDetector:
+    return GameOverDetector(
+        template=template,
+        bird_margin=game_over_config.bird_margin,
+        template_margin=game_over_config.template_margin,
+        template_scale=game_over_config.template_scale,
+        template_position=template_position,
+    )
+
+
+def _warm_detector(template: np.array, images: List[Image]) -> GameOverDetector:
+    # Like the detector of a game that has already ended once, it knows where the button is.
+    detector = _detector(template)
+    for image in images:
+        detector(_fresh(image))
+    detector.reset()
+    return detector
+
+
+def run(frames: int = 200, repeats: int = 20) -> dict:
+    template = cv2.imread("img/game_over.png", cv2.IMREAD_GRAYSCALE)
+    images = fixtures(frames)
+    builders = {
+        "legacy": lambda: legacy_game_over(template),
+        # Has to search the whole screen for the button until it first shows up, at the very end.
+        "detector_cold": lambda: _detector(template),
+        "detector_seeded": lambda: _detector(template, template_position=BUTTON_POSITION),
+        "detector_warm": lambda: _warm_detector(template, images),
+    }
+
+    game_over = builders["legacy"]()
+    results = {"frames": frames, "game_over_frames": sum(game_over(_fresh(image)) for image in images)}
+    for name, build in builders.items():
+        if name == "detector_warm":
+            # Warming it up is not part of the check.
+            detector = build()
+            results[f"{name}_us_per_frame"] = _latency_us(lambda: detector, images, repeats)
+        else:
+            results[f"{name}_us_per_frame"] = _latency_us(build, images, repeats)
+    return results
+
+
+if __name__ == "__main__":
+    logger.info("Game over benchmark", **run())
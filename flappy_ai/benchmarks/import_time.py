@@ -0,0 +1,60 @@
+"""
+Profiles how long it takes to import what each kind of process needs, using python -X importtime.
+Every module is imported in a fresh interpreter so nothing is already cached.
+
+    python -m flappy_ai.benchmarks.import_time
+"""
+
+import subprocess
+import sys
+from typing import Dict, List
+
+from structlog import get_logger
+
+logger = get_logger(__name__)
+
+# What each process imports before it can start working.
+ENTRY_POINTS = {
+    "actor": "flappy_ai.models.game_process",
+    "actor_pool": "flappy_ai.models.actor_pool",
+    "keras_process": "flappy_ai.models.keras_process",
+    "config": "flappy_ai.config",
+    "package": "flappy_ai",
+}
+# Heavy dependencies a light process should never load.
+HEAVY_MODULES = ["tensorflow", "keras", "sqlalchemy", "selenium", "mss", "matplotlib"]
+
+
+def _profile(module: str) -> List[dict]:
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"], stderr=subprocess.PIPE, universal_newlines=True
+    )
+    imports = []
+    for line in process.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        _, self_us, cumulative_us, name = [x.strip() for x in line.replace("import time:", "|").split("|")]
+        imports.append({"module": name.strip(), "self_us": int(self_us), "cumulative_us": int(cumulative_us)})
+    return imports
+
+
+def run(top: int = 5) -> Dict[str, dict]:
+    results = {}
+    for name, module in ENTRY_POINTS.items():
+        imports = _profile(module)
+        loaded = {x["module"] for x in imports}
+        entry = next((x for x in imports if x["module"] == module), None)
+        results[name] = {
+            "module": module,
+            "total_ms": entry["cumulative_us"] / 1000 if entry else None,
+            "modules_imported": len(imports),
+            "heavy_modules": [x for x in HEAVY_MODULES if x in loaded],
+            "slowest": [(x["module"], x["self_us"] / 1000) for x in sorted(imports, key=lambda x: -x["self_us"])[:top]],
+        }
+    return results
+
+
+if __name__ == "__main__":
+    for name, result in run().items():
+        logger.info("Import time", entry_point=name, **result)
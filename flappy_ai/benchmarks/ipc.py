@@ -0,0 +1,73 @@
+"""
+Round trip cost of a PredictionRequest between two processes, with the state sent over the pipe (PIPE)
+and with only its FrameRing slot sent (SHARED_MEMORY). The other end answers straight away, so this is
+the transport alone without any inference.
+
+    python -m flappy_ai.benchmarks.ipc
+"""
+
+import time
+from multiprocessing import Pipe, Process
+from multiprocessing.connection import Connection
+from typing import Dict
+
+import numpy as np
+from structlog import get_logger
+
+from flappy_ai.models.frame_ring import FrameRing
+from flappy_ai.models.prediction_request import PredictionRequest
+from flappy_ai.models.prediction_result import PredictionResult
+from flappy_ai.types.transport_types import TransportTypes
+
+logger = get_logger(__name__)
+
+
+def _responder(pipe: Connection, frame_ring: FrameRing):
+    while True:
+        request: PredictionRequest = pipe.recv()
+        if request is None:
+            return
+        data = request.data if request.slot is None else frame_ring.read(request.slot, request.sequence)
+        # The keras process stacks the states into a batch, which copies each of them once.
+        np.array(data)
+        pipe.send(PredictionResult(result=0, sequence=request.sequence))
+
+
+def _round_trips(transport: TransportTypes, round_trips: int, seed: int) -> dict:
+    frame_ring = FrameRing(actors=1)
+    parent_pipe, child_pipe = Pipe()
+    responder = Process(target=_responder, args=(child_pipe, frame_ring), daemon=True)
+    responder.start()
+
+    states = np.random.RandomState(seed).randint(0, 256, size=(8, 160, 120, 4), dtype=np.uint8)
+    latencies = []
+    for idx in range(round_trips + 1):
+        start_time = time.perf_counter()
+        if transport is TransportTypes.PIPE:
+            request = PredictionRequest(data=states[idx % len(states)], sequence=idx)
+        else:
+            slot, sequence = frame_ring.write(0, states[idx % len(states)])
+            request = PredictionRequest(slot=slot, sequence=sequence)
+        parent_pipe.send(request)
+        parent_pipe.recv()
+        # The first one pays for starting up the other end.
+        if idx:
+            latencies.append((time.perf_counter() - start_time) * 1e6)
+
+    parent_pipe.send(None)
+    responder.join()
+    return {
+        "round_trips_per_sec": round_trips / (sum(latencies) / 1e6),
+        "mean_us": float(np.mean(latencies)),
+        "p50_us": float(np.median(latencies)),
+        "p99_us": float(np.percentile(latencies, 99)),
+    }
+
+
+def run(round_trips: int = 2000, seed: int = 0) -> Dict[str, dict]:
+    return {transport.value: _round_trips(transport, round_trips, seed) for transport in TransportTypes}
+
+
+if __name__ == "__main__":
+    for transport, result in run().items():
+        logger.info("IPC benchmark", transport=transport, **result)
@@ -0,0 +1,107 @@
+"""
+Times GameHistory appends and get_sample_batch at different memory sizes, with and without prioritized replay.
+Every memory is filled to its size first, so appends run the steady state of a full memory that keeps
+overwriting its oldest entries and every sampled frame has been written.
+Memories that do not fit in RAM are memory mapped from a temporary directory instead, like MEMMAP would.
+Those are only marked as full rather than written, 19GB of frames is too much to write for a benchmark,
+and are reported with "filled" false: their batches mostly read pages that were never written.
+
+    python -m flappy_ai.benchmarks.memory
+"""
+
+import tempfile
+import time
+from typing import Dict, Iterable
+
+import numpy as np
+from structlog import get_logger
+
+from flappy_ai.models.game_history import GameHistory
+from flappy_ai.models.memmap_game_history import MemmapGameHistory
+from flappy_ai.models.memory_item import MemoryItem
+
+logger = get_logger(__name__)
+
+SIZES = (10000, 100000, 1000000)
+
+
+def _items(count: int, random_state: np.random.RandomState) -> Iterable[MemoryItem]:
+    # A handful of states reused over and over, generating fresh frames would take longer than appending them.
+    states = random_state.randint(0, 256, size=(8, 160, 120, 4), dtype=np.uint8)
+    actions = np.eye(2, dtype=np.int8)
+    for idx in range(count):
+        item = MemoryItem(state=states[idx % len(states)], action=actions[idx % 2])
+        item.reward = 1
+        item.is_terminal = idx % 50 == 49
+        yield item
+
+
+def _fill(memory: GameHistory, random_state: np.random.RandomState, chunk_size: int = 4096):
+    frames = random_state.randint(0, 256, size=(chunk_size,) + tuple(memory.frame_shape), dtype=np.uint8)
+    actions = random_state.randint(0, 2, size=chunk_size).astype(np.int8)
+    rewards = np.ones(chunk_size, dtype=np.float32)
+    terminals = np.arange(chunk_size) % 50 == 49
+    for start in range(0, memory.size, chunk_size):
+        count = min(chunk_size, memory.size - start)
+        memory.extend(frames[:count], actions[:count], rewards[:count], terminals[:count])
+
+
+def _benchmark(
+    memory: GameHistory, fill: bool, appends: int, batches: int, batch_size: int, random_state: np.random.RandomState
+) -> dict:
+    if fill:
+        _fill(memory, random_state)
+    else:
+        memory._count = memory.size
+        memory.reset_priorities()
+    items = list(_items(appends, random_state))
+
+    start_time = time.time()
+    for item in items:
+        memory.append(item)
+    append_seconds = time.time() - start_time
+
+    memory.get_sample_batch(batch_size=batch_size)
+    start_time = time.time()
+    for _ in range(batches):
+        batch = memory.get_sample_batch(batch_size=batch_size)
+        memory.update_priorities(batch.indices, random_state.rand(batch_size))
+    sample_seconds = time.time() - start_time
+
+    return {
+        "memory_type": type(memory).__name__,
+        "filled": fill,
+        "appends_per_sec": appends / append_seconds,
+        "batches_per_sec": batches / sample_seconds,
+        "ms_per_batch": sample_seconds / batches * 1000,
+    }
+
+
+def run(
+    sizes: Iterable[int] = SIZES, appends: int = 5000, batches: int = 200, batch_size: int = 32, seed: int = 0
+) -> Dict[str, dict]:
+    results = {}
+    for size in sizes:
+        for prioritized in (False, True):
+            name = f"{size}_{'prioritized' if prioritized else 'uniform'}"
+            random_state = np.random.RandomState(seed)
+            try:
+                memory = GameHistory(size=size, prioritized=prioritized)
+            except MemoryError:
+                memory = None
+            if memory is not None:
+                results[name] = _benchmark(memory, True, appends, batches, batch_size, random_state)
+                # Freed before the next one is allocated.
+                del memory
+                continue
+            with tempfile.TemporaryDirectory() as location:
+                memory = MemmapGameHistory(size=size, prioritized=prioritized, location=location)
+                results[name] = _benchmark(memory, False, appends, batches, batch_size, random_state)
+                # The maps have to be closed before the directory can go.
+                del memory
+    return results
+
+
+if __name__ == "__main__":
+    for name, result in run().items():
+        logger.info("Memory benchmark", memory=name, **result)
@@ -0,0 +1,78 @@
+"""
+Prediction latency at different batch sizes, for DQNNetwork and for the NumpyDQN actors use with LocalInference.
+Both run on the same weights.
+
+    python -m flappy_ai.benchmarks.predict
+"""
+
+import os
+import tempfile
+import time
+from typing import Callable, Dict, Iterable
+
+import attr
+import numpy as np
+from structlog import get_logger
+
+from flappy_ai.config import dqn_config
+from flappy_ai.models.networks.numpy_dqn import NumpyDQN
+from flappy_ai.types.memory_types import MemoryTypes
+
+logger = get_logger(__name__)
+
+BATCH_SIZES = (1, 8, 32)
+
+
+def _latency_ms(predict: Callable[[np.array], any], states: np.array, calls: int) -> dict:
+    predict(states)
+    latencies = []
+    for _ in range(calls):
+        start_time = time.perf_counter()
+        predict(states)
+        latencies.append((time.perf_counter() - start_time) * 1000)
+    return {
+        "mean_ms": float(np.mean(latencies)),
+        "p50_ms": float(np.median(latencies)),
+        "p99_ms": float(np.percentile(latencies, 99)),
+    }
+
+
+def run(batch_sizes: Iterable[int] = BATCH_SIZES, calls: int = 200, seed: int = 0) -> Dict[str, dict]:
+    with tempfile.TemporaryDirectory() as directory:
+        # Kept away from the checkpoints of a run that might be training next to the benchmark.
+        config = attr.evolve(
+            dqn_config,
+            memory_type=MemoryTypes.RAM,
+            memory_size=1,
+            checkpoint_location=os.path.join(directory, "checkpoints"),
+            snapshot_location=os.path.join(directory, "snapshot"),
+        )
+        return _run(config, batch_sizes, calls, seed)
+
+
+def _run(config, batch_sizes: Iterable[int], calls: int, seed: int) -> Dict[str, dict]:
+    # Imported here so tensorflow only loads when the benchmark actually runs.
+    from flappy_ai.models.networks.dqn_network import DQNNetwork
+
+    agent = DQNNetwork(config=config)
+    numpy_dqn = NumpyDQN(action_size=agent.action_size)
+    numpy_dqn.update(agent.weights_update(version=-1))
+
+    random_state = np.random.RandomState(seed)
+    results = {}
+    for batch_size in batch_sizes:
+        states = random_state.randint(0, 256, size=(batch_size,) + agent.data_shape, dtype=np.uint8)
+        results[f"batch_{batch_size}"] = {
+            "keras": _latency_ms(agent.predict_batch, states, calls),
+            "numpy": _latency_ms(numpy_dqn.q_values, states, calls),
+            # The two should pick the same actions, anything else means NumpyDQN drifted from the model.
+            "actions_match": bool(
+                np.array_equal(agent.predict_batch(states), np.argmax(numpy_dqn.q_values(states), axis=1))
+            ),
+        }
+    return results
+
+
+if __name__ == "__main__":
+    for name, result in run().items():
+        logger.info("Predict benchmark", batch=name, **result)
@@ -0,0 +1,82 @@
+"""
+Compares the preprocessing pipeline against the decode, stride and mean greyscale Game used to do.
+The screenshots are made from the samples in img/, scaled back up to the size of the game canvas,
+and both paths have to give the same observations as the legacy one for them.
+
+    python -m flappy_ai.benchmarks.preprocess
+"""
+
+import time
+from typing import Callable, List
+
+import cv2
+import numpy as np
+from structlog import get_logger
+
+from flappy_ai.config import preprocess_config
+from flappy_ai.models.image import Image
+from flappy_ai.models.preprocessor import Preprocessor
+
+logger = get_logger(__name__)
+
+SAMPLE_IMAGES = ["img/screen_merged.png", "img/screen_base.png"]
+
+
+def screenshots() -> List[bytes]:
+    """
+    PNGs the size the browser hands back, 4 times the (160, 120) observation.
+    """
+    pngs = []
+    for path in SAMPLE_IMAGES:
+        image = cv2.imread(path, cv2.IMREAD_COLOR)
+        image = cv2.resize(image, None, fx=4, fy=4, interpolation=cv2.INTER_NEAREST)
+        pngs.append(cv2.imencode(".png", image)[1].tobytes())
+    return pngs
+
+
+def legacy(png: bytes) -> np.array:
+    image = np.frombuffer(png, np.uint8)
+    image = cv2.imdecode(image, cv2.IMREAD_COLOR)
+    image = image[::4, ::4]
+    image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+    image = Image(image)
+    # Game.step needed both of these for every frame.
+    image.as_HSV()
+    return image.as_greyscale()
+
+
+def _frames_per_second(preprocess: Callable[[bytes], any], pngs: List[bytes], frames: int) -> float:
+    preprocess(pngs[0])
+    start_time = time.time()
+    for idx in range(frames):
+        preprocess(pngs[idx % len(pngs)])
+    return frames / (time.time() - start_time)
+
+
+def run(frames: int = 2000) -> dict:
+    pngs = screenshots()
+    preprocessor = Preprocessor(config=preprocess_config)
+
+    def colour(png: bytes) -> np.array:
+        image = preprocessor.colour(png)
+        image.as_HSV()
+        return image.as_greyscale()
+
+    # The samples are scaled up by whole pixels, so reducing them any way gets back the same pixels.
+    for path, png in zip(SAMPLE_IMAGES, pngs):
+        expected = legacy(png)
+        for name, preprocess in (("greyscale", preprocessor.greyscale), ("colour", colour)):
+            mismatched = int(np.count_nonzero(preprocess(png) != expected))
+            if mismatched:
+                raise ValueError(f"The {name} path differs from the legacy one in {mismatched} pixels of {path}.")
+
+    return {
+        "frames": frames,
+        "legacy_frames_per_sec": _frames_per_second(legacy, pngs, frames),
+        "colour_frames_per_sec": _frames_per_second(colour, pngs, frames),
+        "greyscale_frames_per_sec": _frames_per_second(preprocessor.greyscale, pngs, frames),
+    }
+
+
+if __name__ == "__main__":
+    logger.info("Preprocess benchmark", **run())
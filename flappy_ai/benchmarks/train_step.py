@@ -0,0 +1,79 @@
+"""
+Compares the compiled train step against the predict then fit keras path.
+
+    python -m flappy_ai.benchmarks.train_step
+"""
+
+import os
+import tempfile
+import time
+
+import attr
+import numpy as np
+from structlog import get_logger
+
+from flappy_ai.config import dqn_config
+from flappy_ai.models.memory_item import MemoryItem
+from flappy_ai.types.memory_types import MemoryTypes
+
+logger = get_logger(__name__)
+
+
+def _fill_memory(agent, frames: int, random_state: np.random.RandomState):
+    for idx in range(frames):
+        item = MemoryItem(
+            state=random_state.randint(0, 256, size=agent.data_shape, dtype=np.uint8),
+            action=np.eye(agent.action_size, dtype=np.int8)[random_state.randint(agent.action_size)],
+        )
+        item.reward = 1
+        item.is_terminal = random_state.rand() < 0.02
+        agent.memory.append(item)
+
+
+def _steps_per_second(train_step, batches) -> float:
+    # The first call pays for building the graph.
+    train_step(batches[0])
+    start_time = time.time()
+    for batch in batches:
+        train_step(batch)
+    return len(batches) / (time.time() - start_time)
+
+
+def run(steps: int = 200, memory_frames: int = 2000, seed: int = 0) -> dict:
+    with tempfile.TemporaryDirectory() as directory:
+        # Kept away from the checkpoints of a run that might be training next to the benchmark.
+        config = attr.evolve(
+            dqn_config,
+            memory_type=MemoryTypes.RAM,
+            memory_size=memory_frames,
+            prioritized_replay=False,
+            checkpoint_location=os.path.join(directory, "checkpoints"),
+            snapshot_location=os.path.join(directory, "snapshot"),
+        )
+        return _run(config, steps, memory_frames, seed)
+
+
+def _run(config, steps: int, memory_frames: int, seed: int) -> dict:
+    # Imported here so tensorflow only loads when the benchmark actually runs.
+    from flappy_ai.models.networks.dqn_network import DQNNetwork
+
+    compiled = DQNNetwork(config=attr.evolve(config, compiled_train_step=True))
+    keras = DQNNetwork(config=attr.evolve(config, compiled_train_step=False))
+
+    random_state = np.random.RandomState(seed)
+    _fill_memory(compiled, memory_frames, random_state)
+    # Both paths train on the very same batches.
+    batches = [compiled.memory.get_sample_batch(batch_size=config.batch_size) for _ in range(steps)]
+
+    results = {
+        "batch_size": config.batch_size,
+        "steps": steps,
+        "compiled_steps_per_sec": _steps_per_second(compiled._train_step, batches),
+        "keras_steps_per_sec": _steps_per_second(keras._train_step_keras, batches),
+    }
+    results["speedup"] = results["compiled_steps_per_sec"] / results["keras_steps_per_sec"]
+    return results
+
+
+if __name__ == "__main__":
+    logger.info("Train step benchmark", **run())
@@ -1,18 +1,153 @@
 import configparser
+from functools import lru_cache
 
+from flappy_ai.models.actor_config import ActorConfig
+from flappy_ai.models.game_config import GameConfig
+from flappy_ai.models.game_over_config import GameOverConfig
+from flappy_ai.models.inference_config import InferenceConfig
+from flappy_ai.models.learner_config import LearnerConfig
 from flappy_ai.models.network_configs.dqn_config import DQNConfig
+from flappy_ai.models.preprocess_config import PreprocessConfig
+from flappy_ai.models.recorder_config import RecorderConfig
+from flappy_ai.models.results_writer_config import ResultsWriterConfig
+from flappy_ai.models.trace_config import TraceConfig
+from flappy_ai.types.game_types import GameTypes
+from flappy_ai.types.memory_types import MemoryTypes
+from flappy_ai.types.transport_types import TransportTypes
 
-config = configparser.ConfigParser()
-config.read("config/config.ini")
-
-dqn_config = DQNConfig(
-    gamma=float(config["DQN_CONFIG"]["Gamma"]),
-    start_epsilon=float(config["DQN_CONFIG"]["StartingEpsilon"]),
-    epsilon_min=float(config["DQN_CONFIG"]["MinEpsilon"]),
-    anneal_epsilon_over_x_frames=int(config["DQN_CONFIG"]["AnnealEpsilonOverXFrames"]),
-    observe_frames_before_learning=int(config["DQN_CONFIG"]["ObserveFramesBeforeLearning"]),
-    learning_rate=float(config["DQN_CONFIG"]["LearningRate"]),
-    memory_size=int(config["DQN_CONFIG"]["MaxMemorySize"]),
-    batch_size=int(config["DQN_CONFIG"]["BatchSize"]),
-    save_location=str(config["DQN_CONFIG"]["ModelSaveLocation"]),
-)
+
+# Nothing is read until a config is first used, after that every config is built once and cached.
+@lru_cache(maxsize=None)
+def _config_file() -> configparser.ConfigParser:
+    config = configparser.ConfigParser()
+    config.read("config/config.ini")
+    return config
+
+
+def _dqn_config(config: configparser.ConfigParser) -> DQNConfig:
+    return DQNConfig(
+        gamma=float(config["DQN_CONFIG"]["Gamma"]),
+        start_epsilon=float(config["DQN_CONFIG"]["StartingEpsilon"]),
+        epsilon_min=float(config["DQN_CONFIG"]["MinEpsilon"]),
+        anneal_epsilon_over_x_frames=int(config["DQN_CONFIG"]["AnnealEpsilonOverXFrames"]),
+        observe_frames_before_learning=int(config["DQN_CONFIG"]["ObserveFramesBeforeLearning"]),
+        learning_rate=float(config["DQN_CONFIG"]["LearningRate"]),
+        memory_size=int(config["DQN_CONFIG"]["MaxMemorySize"]),
+        batch_size=int(config["DQN_CONFIG"]["BatchSize"]),
+        save_location=str(config["DQN_CONFIG"]["ModelSaveLocation"]),
+        memory_type=MemoryTypes(config["DQN_CONFIG"]["MemoryType"]),
+        memory_location=str(config["DQN_CONFIG"]["MemoryLocation"]),
+        prioritized_replay=config["DQN_CONFIG"].getboolean("PrioritizedReplay"),
+        priority_alpha=float(config["DQN_CONFIG"]["PriorityAlpha"]),
+        priority_beta=float(config["DQN_CONFIG"]["PriorityBeta"]),
+        priority_beta_anneal_steps=int(config["DQN_CONFIG"]["PriorityBetaAnnealSteps"]),
+        compiled_train_step=config["DQN_CONFIG"].getboolean("CompiledTrainStep"),
+        checkpoint_location=str(config["DQN_CONFIG"]["CheckpointLocation"]),
+        checkpoints_to_keep=int(config["DQN_CONFIG"]["CheckpointsToKeep"]),
+        snapshot_location=str(config["DQN_CONFIG"]["SnapshotLocation"]),
+        snapshot_chunk_size=int(config["DQN_CONFIG"]["SnapshotChunkSize"]),
+    )
+
+
+def _game_config(config: configparser.ConfigParser) -> GameConfig:
+    return GameConfig(
+        game_type=GameTypes(config["GAME_CONFIG"]["GameType"]),
+        seed=int(config["GAME_CONFIG"]["Seed"]),
+        vector_games=int(config["GAME_CONFIG"]["VectorGames"]),
+    )
+
+
+def _inference_config(config: configparser.ConfigParser) -> InferenceConfig:
+    return InferenceConfig(
+        max_batch_size=int(config["INFERENCE_CONFIG"]["MaxBatchSize"]),
+        max_wait_ms=float(config["INFERENCE_CONFIG"]["MaxWaitMs"]),
+        transport=TransportTypes(config["INFERENCE_CONFIG"]["Transport"]),
+    )
+
+
+def _learner_config(config: configparser.ConfigParser) -> LearnerConfig:
+    return LearnerConfig(
+        replay_ratio=float(config["LEARNER_CONFIG"]["ReplayRatio"]),
+        sync_weights_every=int(config["LEARNER_CONFIG"]["SyncWeightsEvery"]),
+    )
+
+
+def _results_writer_config(config: configparser.ConfigParser) -> ResultsWriterConfig:
+    return ResultsWriterConfig(
+        flush_rows=int(config["RESULTS_WRITER_CONFIG"]["FlushRows"]),
+        flush_seconds=float(config["RESULTS_WRITER_CONFIG"]["FlushSeconds"]),
+    )
+
+
+def _preprocess_config(config: configparser.ConfigParser) -> PreprocessConfig:
+    return PreprocessConfig(
+        scale=int(config["PREPROCESS_CONFIG"]["Scale"]),
+        crop_top=int(config["PREPROCESS_CONFIG"]["CropTop"]),
+        crop_bottom=int(config["PREPROCESS_CONFIG"]["CropBottom"]),
+        crop_left=int(config["PREPROCESS_CONFIG"]["CropLeft"]),
+        crop_right=int(config["PREPROCESS_CONFIG"]["CropRight"]),
+        output_height=int(config["PREPROCESS_CONFIG"]["OutputHeight"]),
+        output_width=int(config["PREPROCESS_CONFIG"]["OutputWidth"]),
+        threshold=int(config["PREPROCESS_CONFIG"]["Threshold"]),
+    )
+
+
+def _game_over_config(config: configparser.ConfigParser) -> GameOverConfig:
+    position = config["GAME_OVER_CONFIG"].get("TemplatePosition", "")
+    return GameOverConfig(
+        bird_margin=int(config["GAME_OVER_CONFIG"]["BirdMargin"]),
+        template_margin=int(config["GAME_OVER_CONFIG"]["TemplateMargin"]),
+        template_scale=int(config["GAME_OVER_CONFIG"]["TemplateScale"]),
+        template_position=tuple(int(x) for x in position.split(",")) if position.strip() else None,
+    )
+
+
+def _actor_config(config: configparser.ConfigParser) -> ActorConfig:
+    return ActorConfig(
+        stack_depth=int(config["ACTOR_CONFIG"]["StackDepth"]),
+        max_pool_frames=int(config["ACTOR_CONFIG"]["MaxPoolFrames"]),
+        action_repeat=int(config["ACTOR_CONFIG"]["ActionRepeat"]),
+        pool_size=int(config["ACTOR_CONFIG"]["PoolSize"]),
+        local_inference=config["ACTOR_CONFIG"].getboolean("LocalInference"),
+        weights_sync_episodes=int(config["ACTOR_CONFIG"]["WeightsSyncEpisodes"]),
+        weights_sync_seconds=float(config["ACTOR_CONFIG"]["WeightsSyncSeconds"]),
+        metrics_every_seconds=float(config["ACTOR_CONFIG"]["MetricsEverySeconds"]),
+    )
+
+
+def _trace_config(config: configparser.ConfigParser) -> TraceConfig:
+    return TraceConfig(
+        enabled=config["TRACE_CONFIG"].getboolean("Enabled"),
+        directory=str(config["TRACE_CONFIG"]["Directory"]),
+        buffer_size=int(config["TRACE_CONFIG"]["BufferSize"]),
+    )
+
+
+def _recorder_config(config: configparser.ConfigParser) -> RecorderConfig:
+    return RecorderConfig(
+        enabled=config["RECORDER_CONFIG"].getboolean("Enabled"),
+        directory=str(config["RECORDER_CONFIG"]["Directory"]),
+        chunk_frames=int(config["RECORDER_CONFIG"]["ChunkFrames"]),
+    )
+
+
+_BUILDERS = {
+    "dqn_config": _dqn_config,
+    "game_config": _game_config,
+    "inference_config": _inference_config,
+    "learner_config": _learner_config,
+    "results_writer_config": _results_writer_config,
+    "preprocess_config": _preprocess_config,
+    "game_over_config": _game_over_config,
+    "actor_config": _actor_config,
+    "trace_config": _trace_config,
+    "recorder_config": _recorder_config,
+}
+
+
+def __getattr__(name: str):
+    if name not in _BUILDERS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = _BUILDERS[name](_config_file())
+    globals()[name] = value
+    return value
@@ -0,0 +1,55 @@
+import os
+from pathlib import Path
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.orm import sessionmaker
+
+db_path = Path(f"{os.path.dirname(__file__)}/../data/data.db")
+
+Base = declarative_base()
+
+_engine = None
+_session_factory = None
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    # WAL lets readers such as the plotter carry on while a process writes, and only syncs on checkpoints.
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.execute("PRAGMA busy_timeout=30000")
+    cursor.close()
+
+
+def get_engine():
+    """
+    Connects to the database and creates the tables the first time it is called.
+    """
+    global _engine
+    if _engine is None:
+        # The keras process and the runner write to the same database, wait for the other one instead of failing.
+        engine = create_engine(f"sqlite:///{db_path}", connect_args={"timeout": 30})
+        event.listen(engine, "connect", _set_sqlite_pragmas)
+
+        # Imported here as the models need Base from this module.
+        from flappy_ai.models.sql_models import (  # noqa: F401
+            discarded_episode, fit_data, saved_episode_result, stage_timing)
+
+        Base.metadata.create_all(engine)
+        _engine = engine
+    return _engine
+
+
+def Session():
+    global _session_factory
+    if _session_factory is None:
+        _session_factory = sessionmaker(bind=get_engine())
+    return _session_factory()
+
+
+def __getattr__(name: str):
+    if name == "engine":
+        return get_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
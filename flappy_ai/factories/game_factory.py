@@ -0,0 +1,19 @@
+from flappy_ai.types.game_types import GameTypes
+
+
+def game_factory(game_type: GameTypes, headless: bool = True, seed: int = None, games: int = 1, stack_depth: int = 4):
+    # Games are imported inside to prevent the loading of selenium until it is needed.
+    if game_type is GameTypes.SELENIUM:
+        from flappy_ai.models.game import Game
+
+        return Game(headless=headless)
+    elif game_type is GameTypes.SIMULATED:
+        from flappy_ai.models.simulated_game import SimulatedGame
+
+        return SimulatedGame(headless=headless, seed=seed)
+    elif game_type is GameTypes.VECTOR:
+        from flappy_ai.models.vector_game import VectorGame
+
+        return VectorGame(size=games, seed=seed, stack_frames=stack_depth)
+    else:
+        raise NotImplementedError(f"Game type of {game_type} is not implemented.")
@@ -0,0 +1,25 @@
+from typing import Tuple
+
+from flappy_ai.models.game_history import GameHistory
+from flappy_ai.models.network_configs.dqn_config import DQNConfig
+from flappy_ai.types.memory_types import MemoryTypes
+
+
+def memory_factory(config: DQNConfig, frame_shape: Tuple[int, int], history_length: int) -> GameHistory:
+    kwargs = dict(
+        size=config.memory_size,
+        frame_shape=frame_shape,
+        history_length=history_length,
+        prioritized=config.prioritized_replay,
+        priority_alpha=config.priority_alpha,
+        priority_beta=config.priority_beta,
+        priority_beta_anneal_steps=config.priority_beta_anneal_steps,
+    )
+    if config.memory_type is MemoryTypes.RAM:
+        return GameHistory(**kwargs)
+    elif config.memory_type is MemoryTypes.MEMMAP:
+        from flappy_ai.models.memmap_game_history import MemmapGameHistory
+
+        return MemmapGameHistory(location=config.memory_location, **kwargs)
+    else:
+        raise NotImplementedError(f"Memory type of {config.memory_type} is not implemented.")
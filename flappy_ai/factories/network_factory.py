@@ -1,4 +1,4 @@
-from flappy_ai.config import dqn_config
+from flappy_ai.config import actor_config, dqn_config
 from flappy_ai.types.network_types import NetworkTypes
 
 
@@ -7,6 +7,6 @@ def network_factory(network_type: NetworkTypes):
     from flappy_ai.models.networks.dqn_network import DQNNetwork
 
     if network_type is NetworkTypes.DQN:
-        return DQNNetwork(config=dqn_config)
+        return DQNNetwork(config=dqn_config, data_shape=(160, 120, actor_config.stack_depth))
     else:
         raise NotImplementedError(f"Network type of {DQNNetwork} is not implemented.")
@@ -1,8 +1,31 @@
+from .episode_discarded import EpisodeDiscarded
 from .episode_result import EpisodeResult
-from .game import Game
 from .game_data import GameData
 from .memory_item import MemoryItem
 from .prediction_request import PredictionRequest
 from .prediction_result import PredictionResult
+from .process_ready import ProcessReady
+from .weights_request import WeightsRequest
+from .weights_update import WeightsUpdate
 
-__all__ = ["PredictionRequest", "EpisodeResult", "PredictionResult", "GameData", "MemoryItem", "Game"]
+__all__ = [
+    "PredictionRequest",
+    "EpisodeResult",
+    "EpisodeDiscarded",
+    "PredictionResult",
+    "GameData",
+    "MemoryItem",
+    "Game",
+    "ProcessReady",
+    "WeightsRequest",
+    "WeightsUpdate",
+]
+
+
+def __getattr__(name: str):
+    # Game pulls in selenium and mss, only import it when something actually asks for it.
+    if name == "Game":
+        from .game import Game
+
+        return Game
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,20 @@
+import attr
+
+
+@attr.s(auto_attribs=True)
+class ActorConfig:
+    # How many frames make up a single state.
+    stack_depth: int
+    # Each stacked frame is the pixel-wise max of this many raw frames, 1 turns pooling off.
+    max_pool_frames: int
+    # How many game steps each chosen action is held for, only one prediction is asked for per action.
+    action_repeat: int
+    # How many actor processes play at once, each keeps its game open between episodes.
+    pool_size: int
+    # Pick actions in the actor with NumpyDQN instead of asking the keras process for every one.
+    local_inference: bool = attr.ib(default=False)
+    # With local inference, new weights are pulled after this many episodes or seconds, whichever comes first.
+    weights_sync_episodes: int = attr.ib(default=10)
+    weights_sync_seconds: float = attr.ib(default=60.0)
+    # How often each actor reports the timings of the stages of its loop.
+    metrics_every_seconds: float = attr.ib(default=60.0)
@@ -0,0 +1,14 @@
+from typing import Dict
+
+import attr
+
+
+@attr.s(auto_attribs=True)
+class ActorMetrics:
+    """
+    Sent by an actor every ACTOR_CONFIG.MetricsEverySeconds with the StageTimer summary of each stage
+    of its loop since the last one.
+    """
+
+    actor_index: int
+    stages: Dict[str, dict]
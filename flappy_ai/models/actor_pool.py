@@ -0,0 +1,126 @@
+from collections import deque
+from multiprocessing.connection import Connection, wait
+from typing import Deque, Dict, List, Set, Union
+
+import attr
+from structlog import get_logger
+
+from flappy_ai.models.actor_metrics import ActorMetrics
+from flappy_ai.models.episode_discarded import EpisodeDiscarded
+from flappy_ai.models.episode_result import EpisodeResult
+from flappy_ai.models.frame_ring import FrameRing
+from flappy_ai.models.game_process import GameProcess
+from flappy_ai.models.process_ready import ProcessReady
+from flappy_ai.types.game_types import GameTypes
+
+logger = get_logger(__name__)
+
+
+@attr.s(auto_attribs=True)
+class ActorPool:
+    """
+    Keeps `size` GameProcesses running and hands them episode numbers from a queue, up to `episodes_per_actor`
+    at a time, which is more than one for actors that play several games at once such as GameTypes.VECTOR.
+    Actors are only given work once they have said they are ready, so one that fails to start never holds an episode.
+    An actor that dies is restarted on the same actor index and the episodes it was playing are queued again,
+    an EpisodeDiscarded with the reason "actor_died" is handed back for every attempt that was lost.
+    """
+
+    size: int
+    game_type: GameTypes
+    # The actor ends of the pipes to the keras process, one per actor index.
+    inference_pipes: List[Connection]
+    frame_ring: FrameRing = attr.ib(default=None)
+    episodes_per_actor: int = attr.ib(default=1)
+
+    restarts: int = attr.ib(init=False, default=0)
+    _actors: List[GameProcess] = attr.ib(init=False, default=attr.Factory(list))
+    _queue: Deque[int] = attr.ib(init=False, default=attr.Factory(deque))
+    # The episodes each busy actor index is playing.
+    _playing: Dict[int, List[int]] = attr.ib(init=False, default=attr.Factory(dict))
+    _ready: Set[int] = attr.ib(init=False, default=attr.Factory(set))
+
+    def start(self):
+        self._actors = [self._start_actor(actor_index) for actor_index in range(self.size)]
+
+    def _start_actor(self, actor_index: int) -> GameProcess:
+        actor = GameProcess(actor_index=actor_index)
+        actor.start(
+            game_type=self.game_type, frame_ring=self.frame_ring, inference_pipe=self.inference_pipes[actor_index]
+        )
+        return actor
+
+    def submit(self, episode_number: int):
+        self._queue.append(episode_number)
+        self._dispatch()
+
+    def outstanding(self) -> int:
+        """
+        Episodes that have been submitted but not finished yet.
+        """
+        return len(self._queue) + sum(len(playing) for playing in self._playing.values())
+
+    def capacity(self) -> int:
+        """
+        Episodes the actors can be playing at once.
+        """
+        return self.size * self.episodes_per_actor
+
+    def _dispatch(self):
+        for actor_index, actor in enumerate(self._actors):
+            if actor_index not in self._ready or not actor.is_alive():
+                continue
+            playing = self._playing.setdefault(actor_index, [])
+            while self._queue and len(playing) < self.episodes_per_actor:
+                episode_number = self._queue.popleft()
+                playing.append(episode_number)
+                actor.parent_pipe.send(episode_number)
+
+    def wait(self, *others, timeout: float = None) -> List[any]:
+        """
+        Sleeps until an actor has something to say, an actor exits or any of the other objects is ready.
+        """
+        return wait(
+            [x.parent_pipe for x in self._actors] + [x.sentinel() for x in self._actors] + list(others),
+            timeout=timeout,
+        )
+
+    def poll(self) -> List[Union[EpisodeResult, EpisodeDiscarded, ActorMetrics]]:
+        """
+        Collects whatever the actors have finished, restarts any that died and hands out more work.
+        """
+        results = []
+        for actor_index, actor in enumerate(self._actors):
+            while actor.parent_pipe.poll():
+                message = actor.parent_pipe.recv()
+                if isinstance(message, ProcessReady):
+                    self._ready.add(actor_index)
+                    continue
+                if isinstance(message, ActorMetrics):
+                    # Sent between episodes, the actor is not done with anything.
+                    results.append(message)
+                    continue
+                results.append(message)
+                if isinstance(message, EpisodeResult):
+                    episode_number = message.game_data.episode_number
+                else:
+                    episode_number = message.episode_number
+                self._playing[actor_index].remove(episode_number)
+
+            if not actor.is_alive():
+                self._ready.discard(actor_index)
+                lost = self._playing.pop(actor_index, [])
+                # Played again from the start by whichever actor is free first, in the order they were handed out.
+                self._queue.extendleft(reversed(lost))
+                for episode_number in lost:
+                    results.append(EpisodeDiscarded(episode_number=episode_number, reason="actor_died"))
+                logger.warn("[ActorPool] Actor died, restarting it.", actor_index=actor_index, episodes=lost)
+                self._actors[actor_index] = self._start_actor(actor_index)
+                self.restarts += 1
+
+        self._dispatch()
+        return results
+
+    def stop(self):
+        for actor in self._actors:
+            actor.cleanup()
@@ -0,0 +1,182 @@
+import os
+import re
+import threading
+import time
+import zipfile
+from typing import Iterator, List, Optional
+
+import attr
+import numpy as np
+from structlog import get_logger
+
+from flappy_ai.models.tracer import tracer
+
+logger = get_logger(__name__)
+
+_CHECKPOINT_NAME = re.compile(r"^checkpoint-(\d+)\.npz$")
+
+
+@attr.s(auto_attribs=True)
+class Checkpoint:
+    """
+    A saved copy of the weights along with the training step and epsilon they were saved at.
+    """
+
+    path: str
+    step: int
+    epsilon: float = attr.ib(default=None)
+    created: float = attr.ib(default=None)
+    weights: List[np.array] = attr.ib(default=None)
+
+    @classmethod
+    def read(cls, path: str) -> "Checkpoint":
+        """
+        Loads a checkpoint, raises if the file is truncated or is missing any of its arrays.
+        """
+        with np.load(path, allow_pickle=False) as data:
+            count = int(data["weight_count"])
+            return cls(
+                path=path,
+                step=int(data["step"]),
+                epsilon=float(data["epsilon"]),
+                created=float(data["created"]),
+                weights=[data[f"weight_{i}"] for i in range(count)],
+            )
+
+
+@attr.s(auto_attribs=True)
+class Checkpointer:
+    """
+    Writes weight snapshots to `directory` from a background thread so training and inference never wait on disk.
+    Each snapshot goes to a temp file that is renamed into place once it is fully written, so a crash can only
+    ever lose the checkpoint being written and never corrupt an older one. The newest `keep` are kept.
+    If snapshots arrive faster than they can be written only the newest pending one is written.
+    """
+
+    directory: str
+    keep: int = attr.ib(default=5)
+
+    _thread: threading.Thread = attr.ib(init=False, default=None)
+    _condition: threading.Condition = attr.ib(init=False, default=attr.Factory(threading.Condition))
+    _pending: Checkpoint = attr.ib(init=False, default=None)
+    _writing: bool = attr.ib(init=False, default=False)
+    _stopping: bool = attr.ib(init=False, default=False)
+
+    def start(self) -> "Checkpointer":
+        os.makedirs(self.directory, exist_ok=True)
+        # Left behind by a write that was cut short, the checkpoint it was for never made it into place.
+        for name in os.listdir(self.directory):
+            if name.endswith(".npz.tmp"):
+                os.remove(os.path.join(self.directory, name))
+        self._thread = threading.Thread(target=self._run, name="checkpointer", daemon=True)
+        self._thread.start()
+        return self
+
+    def save(self, weights: List[np.array], step: int, epsilon: float):
+        """
+        Queues a snapshot to be written. The weights have to be a copy the caller will not change afterwards,
+        which is what model.get_weights() hands back.
+        """
+        checkpoint = Checkpoint(
+            path=os.path.join(self.directory, f"checkpoint-{step:012d}.npz"),
+            step=step,
+            epsilon=epsilon,
+            created=time.time(),
+            weights=weights,
+        )
+        with self._condition:
+            if self._pending is not None:
+                logger.debug("Checkpoint superseded before it was written.", step=self._pending.step)
+            self._pending = checkpoint
+            self._condition.notify_all()
+
+    def flush(self):
+        """
+        Blocks until every queued snapshot is on disk.
+        """
+        with self._condition:
+            while self._pending is not None or self._writing:
+                if self._thread is None or not self._thread.is_alive():
+                    return
+                self._condition.wait(timeout=1)
+
+    def stop(self):
+        self.flush()
+        with self._condition:
+            self._stopping = True
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+
+    def checkpoints(self) -> Iterator[Checkpoint]:
+        """
+        Every checkpoint in the directory, newest first. Their weights are not read, see Checkpoint.read.
+        """
+        if not os.path.isdir(self.directory):
+            return iter([])
+        found = []
+        for name in os.listdir(self.directory):
+            match = _CHECKPOINT_NAME.match(name)
+            if match:
+                found.append(Checkpoint(path=os.path.join(self.directory, name), step=int(match.group(1))))
+        return iter(sorted(found, key=lambda checkpoint: checkpoint.step, reverse=True))
+
+    def latest(self) -> Optional[Checkpoint]:
+        """
+        Reads the newest checkpoint that loads cleanly, skipping any that are damaged.
+        """
+        for checkpoint in self.checkpoints():
+            try:
+                return Checkpoint.read(checkpoint.path)
+            except (OSError, ValueError, KeyError, zipfile.BadZipFile) as e:
+                logger.warn("Skipping unreadable checkpoint.", path=checkpoint.path, error=str(e))
+        return None
+
+    def _write(self, checkpoint: Checkpoint):
+        start_time = time.time()
+        temp_path = f"{checkpoint.path}.tmp"
+        arrays = {f"weight_{i}": weight for i, weight in enumerate(checkpoint.weights)}
+        with open(temp_path, "wb") as f:
+            np.savez(
+                f,
+                step=checkpoint.step,
+                epsilon=checkpoint.epsilon,
+                created=checkpoint.created,
+                weight_count=len(checkpoint.weights),
+                **arrays,
+            )
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, checkpoint.path)
+        self._prune()
+        logger.debug(
+            "Checkpoint written.",
+            path=checkpoint.path,
+            seconds=round(time.time() - start_time, 3),
+        )
+
+    def _prune(self):
+        for checkpoint in list(self.checkpoints())[self.keep :]:
+            try:
+                os.remove(checkpoint.path)
+            except OSError:
+                logger.warn("Unable to remove old checkpoint.", path=checkpoint.path)
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while self._pending is None and not self._stopping:
+                    self._condition.wait()
+                if self._pending is None:
+                    return
+                checkpoint, self._pending = self._pending, None
+                self._writing = True
+            try:
+                with tracer.span("checkpoint_write", step=checkpoint.step):
+                    self._write(checkpoint)
+            except Exception:
+                logger.exception("Unable to write checkpoint.", path=checkpoint.path)
+            finally:
+                with self._condition:
+                    self._writing = False
+                    self._condition.notify_all()
@@ -0,0 +1,101 @@
+import glob
+import json
+import os
+import zipfile
+from typing import Iterator, List
+
+import attr
+import numpy as np
+from structlog import get_logger
+
+logger = get_logger(__name__)
+
+INDEX_NAME = "index.json"
+
+
+@attr.s(auto_attribs=True)
+class RecordedEpisode:
+    """
+    An episode as EpisodeRecorder stores it. Every frame is kept once: the frames of the first state
+    followed by the newest frame of each state after it, so state i is frames[i : i + stack_depth]
+    and its next state is frames[i + 1 : i + 1 + stack_depth].
+    """
+
+    episode_number: int
+    score: int
+    stack_depth: int
+    # (steps + stack_depth, height, width)
+    frames: np.array
+    # Action indices, not one hot.
+    actions: np.array
+    rewards: np.array
+    terminals: np.array
+
+    def __len__(self):
+        return len(self.actions)
+
+    def newest_frames(self) -> np.array:
+        """
+        The newest frame of every state, which is all GameHistory keeps of them, see GameHistory.extend.
+        """
+        return self.frames[self.stack_depth - 1 : self.stack_depth - 1 + len(self)]
+
+    def earlier_frames(self) -> np.array:
+        """
+        The frames of the first state before its newest one, which GameHistory keeps ahead of the episode.
+        """
+        return self.frames[: self.stack_depth - 1]
+
+
+@attr.s(auto_attribs=True)
+class EpisodeArchive:
+    """
+    Reads back the episodes every actor recorded under `directory`.
+    Chunks are read one at a time in the order their episodes were played, a chunk that can not be read is skipped.
+    """
+
+    directory: str
+
+    def _chunks(self) -> List[dict]:
+        chunks = []
+        for index_path in glob.glob(os.path.join(self.directory, "*", INDEX_NAME)):
+            with open(index_path) as f:
+                index = json.load(f)
+            for chunk in index["chunks"]:
+                chunk["path"] = os.path.join(os.path.dirname(index_path), chunk["file"])
+                chunks.append(chunk)
+        # Episode numbers are handed out by the runner, so they put the chunks of every actor in order.
+        return sorted(chunks, key=lambda chunk: chunk["episodes"][0]["episode_number"])
+
+    def episode_count(self) -> int:
+        return sum(len(chunk["episodes"]) for chunk in self._chunks())
+
+    def transitions(self) -> int:
+        return sum(chunk["steps"] for chunk in self._chunks())
+
+    def episodes(self) -> Iterator[RecordedEpisode]:
+        for chunk in self._chunks():
+            try:
+                with np.load(chunk["path"], allow_pickle=False) as data:
+                    arrays = {name: data[name] for name in data.files}
+            except (OSError, ValueError, KeyError, zipfile.BadZipFile) as e:
+                logger.warn("Skipping unreadable episode chunk.", path=chunk["path"], error=str(e))
+                continue
+
+            stack_depth = int(arrays["stack_depth"])
+            frame = 0
+            step = 0
+            for episode_number, score, steps in zip(
+                arrays["episode_numbers"], arrays["scores"], arrays["episode_steps"]
+            ):
+                yield RecordedEpisode(
+                    episode_number=int(episode_number),
+                    score=int(score),
+                    stack_depth=stack_depth,
+                    frames=arrays["frames"][frame : frame + steps + stack_depth],
+                    actions=arrays["actions"][step : step + steps],
+                    rewards=arrays["rewards"][step : step + steps],
+                    terminals=arrays["terminals"][step : step + steps],
+                )
+                frame += steps + stack_depth
+                step += steps
@@ -0,0 +1,20 @@
+from typing import Dict
+
+import attr
+
+
+@attr.s(auto_attribs=True)
+class EpisodeDiscarded:
+    """
+    Sent instead of an EpisodeResult when an episode had to be thrown away, such as when the game lagged ("slow_loop").
+    The actor pool sends one as well when an actor dies mid episode ("actor_died"), that episode is played again.
+    """
+
+    episode_number: int
+    reason: str = attr.ib(default=None)
+    loop_time: float = attr.ib(default=None)
+    # Seconds spent in each stage of the loop the episode was thrown away in.
+    stage_times: Dict[str, float] = attr.ib(default=attr.Factory(dict))
+
+    def slowest_stage(self) -> str:
+        return max(self.stage_times, key=self.stage_times.get) if self.stage_times else None
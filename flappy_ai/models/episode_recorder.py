@@ -0,0 +1,159 @@
+import json
+import os
+import queue
+import re
+import threading
+import time
+from typing import List
+
+import attr
+import numpy as np
+from structlog import get_logger
+
+from flappy_ai.models.episode_archive import INDEX_NAME
+from flappy_ai.models.game_data import GameData
+from flappy_ai.models.tracer import tracer
+
+logger = get_logger(__name__)
+
+_CHUNK_NAME = re.compile(r"^chunk-(\d+)\.npz$")
+
+
+@attr.s(auto_attribs=True)
+class EpisodeRecorder:
+    """
+    Writes finished episodes to `directory` so they can be trained on again later, see EpisodeArchive.
+
+    Episodes are gathered until they hold `chunk_frames` frames and are then written as one compressed chunk:
+    the frames as a single uint8 array, every frame stored once, next to columns of actions, rewards and terminals.
+    index.json lists the episodes in each chunk. Chunks are written from a background thread and renamed into
+    place before the index mentions them, so a crash only loses the episodes that were not written yet.
+    Only one recorder may write to a directory at a time.
+    """
+
+    directory: str
+    chunk_frames: int = attr.ib(default=2048)
+
+    _episodes: List[dict] = attr.ib(init=False, default=attr.Factory(list))
+    _frames: int = attr.ib(init=False, default=0)
+    _index: dict = attr.ib(init=False, default=None)
+    _next_chunk: int = attr.ib(init=False, default=0)
+    # Holds a couple of chunks at most, record() waits if the disk can not keep up.
+    _queue: queue.Queue = attr.ib(init=False, default=attr.Factory(lambda: queue.Queue(maxsize=2)))
+    _thread: threading.Thread = attr.ib(init=False, default=None)
+
+    def start(self) -> "EpisodeRecorder":
+        os.makedirs(self.directory, exist_ok=True)
+        chunks = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".tmp"):
+                # Cut short by a crash, never made it into the index.
+                os.remove(os.path.join(self.directory, name))
+            match = _CHUNK_NAME.match(name)
+            if match:
+                chunks.append(int(match.group(1)))
+        # Carries on after whatever a previous process on this directory wrote, even chunks the index lost.
+        self._next_chunk = max(chunks) + 1 if chunks else 0
+        try:
+            with open(os.path.join(self.directory, INDEX_NAME)) as f:
+                self._index = json.load(f)
+        except FileNotFoundError:
+            self._index = {"chunks": []}
+
+        self._thread = threading.Thread(target=self._run, name="episode_recorder", daemon=True)
+        self._thread.start()
+        return self
+
+    def record(self, game_data: GameData):
+        if not len(game_data):
+            return
+        # The whole first state, then only the frame each step adds to the stack.
+        first_state = game_data[0].state
+        frames = np.empty((len(game_data) + first_state.shape[-1],) + first_state.shape[:-1], dtype=np.uint8)
+        frames[: first_state.shape[-1]] = np.moveaxis(first_state, -1, 0)
+        for idx, item in enumerate(game_data):
+            frames[first_state.shape[-1] + idx] = item.next_state[..., -1]
+
+        self._episodes.append(
+            dict(
+                episode_number=game_data.episode_number,
+                score=game_data.score,
+                stack_depth=first_state.shape[-1],
+                frames=frames,
+                actions=np.array([np.argmax(item.action) for item in game_data], dtype=np.int8),
+                rewards=np.array([item.reward for item in game_data], dtype=np.float32),
+                terminals=np.array([item.is_terminal for item in game_data], dtype=bool),
+            )
+        )
+        self._frames += len(frames)
+        if self._frames >= self.chunk_frames:
+            self._queue_chunk()
+
+    def stop(self):
+        """
+        Writes whatever has been recorded and waits for it to be on disk.
+        """
+        self._queue_chunk()
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+
+    def _queue_chunk(self):
+        if not self._episodes:
+            return
+        self._queue.put(self._episodes)
+        self._episodes = []
+        self._frames = 0
+
+    def _write(self, episodes: List[dict]):
+        start_time = time.time()
+        name = f"chunk-{self._next_chunk:05d}.npz"
+        self._next_chunk += 1
+        path = os.path.join(self.directory, name)
+        with open(f"{path}.tmp", "wb") as f:
+            np.savez_compressed(
+                f,
+                stack_depth=episodes[0]["stack_depth"],
+                episode_numbers=np.array([episode["episode_number"] for episode in episodes], dtype=np.int64),
+                scores=np.array([episode["score"] for episode in episodes], dtype=np.int64),
+                episode_steps=np.array([len(episode["actions"]) for episode in episodes], dtype=np.int64),
+                frames=np.concatenate([episode["frames"] for episode in episodes]),
+                actions=np.concatenate([episode["actions"] for episode in episodes]),
+                rewards=np.concatenate([episode["rewards"] for episode in episodes]),
+                terminals=np.concatenate([episode["terminals"] for episode in episodes]),
+            )
+        os.replace(f"{path}.tmp", path)
+
+        self._index["chunks"].append(
+            dict(
+                file=name,
+                steps=sum(len(episode["actions"]) for episode in episodes),
+                episodes=[
+                    dict(
+                        episode_number=int(episode["episode_number"]),
+                        score=int(episode["score"]),
+                        steps=len(episode["actions"]),
+                    )
+                    for episode in episodes
+                ],
+            )
+        )
+        index_path = os.path.join(self.directory, INDEX_NAME)
+        with open(f"{index_path}.tmp", "w") as f:
+            json.dump(self._index, f)
+        os.replace(f"{index_path}.tmp", index_path)
+        logger.debug(
+            "Episode chunk written.", path=path, episodes=len(episodes), seconds=round(time.time() - start_time, 3)
+        )
+
+    def _run(self):
+        while True:
+            episodes = self._queue.get()
+            if episodes is None:
+                return
+            try:
+                with tracer.span("record_chunk", episodes=len(episodes)):
+                    self._write(episodes)
+            except Exception:
+                logger.exception("Unable to write episode chunk.", directory=self.directory)
@@ -0,0 +1,67 @@
+import ctypes
+from multiprocessing.sharedctypes import RawArray
+from typing import Tuple
+
+import attr
+import numpy as np
+from structlog import get_logger
+
+logger = get_logger(__name__)
+
+
+@attr.s(auto_attribs=True)
+class FrameRing:
+    """
+    Shared memory slots that actors write their stacked observations into, so only the slot and a sequence
+    number have to travel over the pipe. The reader gets a NumPy view straight onto the shared memory.
+    Each actor owns `slots_per_actor` slots and cycles through them.
+
+    It has to be created before the processes that use it are started and handed to them as a start argument.
+    """
+
+    actors: int
+    slots_per_actor: int = attr.ib(default=2)
+    state_shape: Tuple[int, int, int] = attr.ib(default=(160, 120, 4))
+
+    _buffer: RawArray = attr.ib(init=False, default=None)
+    # The sequence number of whatever was last written to each slot.
+    _sequences: RawArray = attr.ib(init=False, default=None)
+    # Local to each process, views cannot be shared and are rebuilt after the ring is handed over.
+    _frames: np.array = attr.ib(init=False, default=None)
+    _next_sequence: int = attr.ib(init=False, default=0)
+
+    def __attrs_post_init__(self):
+        slots = self.actors * self.slots_per_actor
+        self._buffer = RawArray(ctypes.c_uint8, slots * int(np.prod(self.state_shape)))
+        self._sequences = RawArray(ctypes.c_int64, slots)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_frames"] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+
+    def _views(self) -> np.array:
+        if self._frames is None:
+            self._frames = np.frombuffer(self._buffer, dtype=np.uint8).reshape((-1,) + tuple(self.state_shape))
+        return self._frames
+
+    def write(self, actor_index: int, state: np.array) -> (int, int):
+        """
+        Copies the state into the actor's next slot and returns the slot and sequence number to send.
+        """
+        self._next_sequence += 1
+        slot = actor_index * self.slots_per_actor + self._next_sequence % self.slots_per_actor
+        self._views()[slot] = state
+        self._sequences[slot] = self._next_sequence
+        return slot, self._next_sequence
+
+    def read(self, slot: int, sequence: int) -> np.array:
+        """
+        A zero copy view of the slot, only valid until the actor writes to the slot again.
+        """
+        if self._sequences[slot] != sequence:
+            logger.warn("[FrameRing] Slot was overwritten before it was read.", slot=slot, sequence=sequence)
+        return self._views()[slot]
@@ -0,0 +1,95 @@
+from typing import Tuple
+
+import attr
+import numpy as np
+
+
+@attr.s(auto_attribs=True)
+class FrameStacker:
+    """
+    Keeps the last `depth` frames of a game and hands them out stacked along a new last axis, oldest first.
+
+    Frames are written one after another into a buffer of `capacity` frames, so the newest `depth` of them
+    are always next to each other and current() is just a transposed view of that slice, nothing is copied.
+    When the buffer is full the frames that are still needed are copied back to its start.
+    The views are only valid until the next push, copy them if they have to be kept.
+
+    With `max_pool` above 1 every pushed frame is the pixel-wise max of the last `max_pool` raw frames,
+    frames that are skipped can still be seen by passing them to observe().
+
+    frame_shape can have a leading batch axis, such as the (games, 160, 120) screens VectorGame draws.
+    """
+
+    frame_shape: Tuple[int, ...]
+    depth: int = attr.ib(default=4)
+    max_pool: int = attr.ib(default=1)
+    # Frames the buffer holds, bigger means the frames are copied back to the start less often.
+    capacity: int = attr.ib(default=None)
+    dtype: type = attr.ib(default=np.uint8)
+
+    _frames: np.array = attr.ib(init=False, default=None)
+    # Where the newest frame is.
+    _newest: int = attr.ib(init=False, default=0)
+    _raw: np.array = attr.ib(init=False, default=None)
+    _raw_position: int = attr.ib(init=False, default=0)
+
+    def __attrs_post_init__(self):
+        if self.capacity is None:
+            self.capacity = 2 * (self.depth + 1)
+        if self.capacity < self.depth + 2:
+            raise ValueError("The buffer needs room for the current and previous stacks plus one frame.")
+        # Starts out with an empty history so the stacks are always available.
+        self._frames = np.zeros((self.capacity,) + tuple(self.frame_shape), dtype=self.dtype)
+        self._newest = self.depth
+        self._raw = np.zeros((self.max_pool,) + tuple(self.frame_shape), dtype=self.dtype)
+
+    def _advance(self) -> int:
+        if self._newest + 1 == self.capacity:
+            # previous() needs the newest depth frames, everything before them can go.
+            np.copyto(self._frames[: self.depth], self._frames[self.capacity - self.depth :])
+            self._newest = self.depth - 1
+        self._newest += 1
+        return self._newest
+
+    def observe(self, frame: np.array):
+        """
+        Records a raw frame for max pooling without pushing it onto the stack.
+        """
+        self._raw_position = (self._raw_position + 1) % self.max_pool
+        np.copyto(self._raw[self._raw_position], frame)
+
+    def push(self, frame: np.array):
+        self.observe(frame)
+        out = self._frames[self._advance()]
+        if self.max_pool == 1:
+            np.copyto(out, frame)
+        else:
+            np.max(self._raw, axis=0, out=out)
+
+    def fill(self, mask: np.array = None):
+        """
+        Makes the newest frame the whole history, as if the game had just started on it.
+        mask picks which entries along the batch axis this applies to, all of them when it is None.
+        """
+        if mask is None:
+            mask = slice(None)
+        newest = self._frames[self._newest]
+        history = self._frames[self._newest - self.depth : self._newest]
+        history[:, mask] = newest[mask]
+        self._raw[:, mask] = self._raw[self._raw_position][mask]
+
+    def reset(self, frame: np.array):
+        self.push(frame)
+        self.fill()
+
+    def current(self) -> np.array:
+        """
+        The newest `depth` frames stacked, with shape frame_shape + (depth,).
+        """
+        return np.moveaxis(self._frames[self._newest + 1 - self.depth : self._newest + 1], 0, -1)
+
+    def previous(self) -> np.array:
+        """
+        The stack current() returned before the newest frame was pushed.
+        """
+        return np.moveaxis(self._frames[self._newest - self.depth : self._newest], 0, -1)
@@ -1,4 +1,6 @@
+import os
 import time
+from pathlib import Path
 
 import attr
 import cv2
@@ -7,31 +9,55 @@ import numpy as np
 from selenium import webdriver
 from selenium.webdriver.common.action_chains import ActionChains
 from selenium.webdriver.firefox.options import Options
-from selenium.webdriver.firefox.webdriver import FirefoxWebElement, FirefoxProfile
+from selenium.webdriver.firefox.webdriver import (FirefoxProfile,
+                                                  FirefoxWebElement)
 from structlog import get_logger
 
 from flappy_ai.factories.selenium_key_factory import selenium_key_factory
+from flappy_ai.models.game_over_detector import GameOverDetector
 from flappy_ai.models.image import Image
+from flappy_ai.models.preprocessor import Preprocessor
+from flappy_ai.models.stage_timer import stage_timer
 from flappy_ai.types.keys import Keys
-from pathlib import Path
-import os
 
 logger = get_logger(__name__)
 
 
+def _build_preprocessor() -> Preprocessor:
+    # Imported here as flappy_ai.config imports the models package, which imports this module.
+    from flappy_ai.config import preprocess_config
+
+    return Preprocessor(config=preprocess_config)
+
+
+def _build_game_over_detector() -> GameOverDetector:
+    from flappy_ai.config import game_over_config
+
+    return GameOverDetector(
+        template=cv2.imread("img/game_over.png", cv2.IMREAD_GRAYSCALE),
+        bird_margin=game_over_config.bird_margin,
+        template_margin=game_over_config.template_margin,
+        template_scale=game_over_config.template_scale,
+        template_position=game_over_config.template_position,
+    )
+
+
 @attr.s(auto_attribs=True)
 class Game:
     headless: bool = attr.ib(default=False)
     _game_over: bool = attr.ib(init=False, default=False)
+    # Whether the current game has been stepped, one that has not is ready to go without being restarted.
+    _played: bool = attr.ib(init=False, default=False)
     _browser: webdriver = attr.ib(init=False)
     _game_element: FirefoxWebElement = attr.ib(init=False, default=None)
+    _preprocessor: Preprocessor = attr.ib(init=False, default=attr.Factory(_build_preprocessor))
+    _game_over_detector: GameOverDetector = attr.ib(init=False, default=attr.Factory(_build_game_over_detector))
 
     # X and Y positions of the game window.
     _pos_x: int = None
     _pos_y: int = None
     _browser_height: int = 830
     _browser_width: int = 570
-    _game_over_button = cv2.imread("img/game_over.png", cv2.IMREAD_GRAYSCALE)
 
     @staticmethod
     def actions():
@@ -83,14 +109,11 @@ class Game:
         It is slower than _grab_screen_legacy ~.05 vs ~0.1 but its still within margins.
         Using this we can run multiple sessions and train much faster.
         """
-        image = np.fromstring(self._game_element.screenshot_as_png, np.uint8)
-        image = cv2.imdecode(image, cv2.IMREAD_COLOR)
-        image = image[::4, ::4]
-        image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-        # import matplotlib.pyplot as plt
-        # plt.imshow(image)
-        # plt.show()
-        return Image(image)
+        # Decoded at a quarter of the size, see PREPROCESS_CONFIG.
+        # The frames come out of a ring of buffers, see Preprocessor.
+        with stage_timer.time("capture"):
+            png = self._game_element.screenshot_as_png
+        return self._preprocessor.colour(png)
 
     def _grab_screen_legacy(self) -> Image:
         """
@@ -112,33 +135,17 @@ class Game:
         return screen
 
     def step(self, action) -> (np.array, int, bool):
+        self._played = True
         if action == 0:
             pass
         elif action == 1:
-            self.input(Keys.SPACE)
+            with stage_timer.time("key_input"):
+                self.input(Keys.SPACE)
 
         screen = self._state()
 
-        def game_over(screen: Image):
-
-            # Find colors that only the bird is going to have.
-            mask = cv2.inRange(screen.as_HSV(), lowerb=np.array([0, 100, 100]), upperb=np.array([15, 255, 255]))
-            points = cv2.findNonZero(mask)
-            # merge our findings together.
-
-            # Bird is off screen?
-            if points is None or points.size == 0:
-                return True
-
-            # Template matching is very good for exact matches.
-            match = cv2.matchTemplate(screen.as_greyscale(), self._game_over_button, cv2.TM_CCOEFF_NORMED)
-            match = np.where(match >= 0.8)
-            # logger.debug("[find_match_with_template]", runtime=time.time() - start_time, m=match)
-            if match is None or not match[0].size:
-                return False
-            return True
-
-        done = int(game_over(screen))
+        with stage_timer.time("game_over"):
+            done = int(self._game_over_detector(screen))
         if done:
             self._game_over = True
 
@@ -152,7 +159,14 @@ class Game:
     def game_over(self) -> bool:
         return self._game_over
 
-    def reset(self):
+    def reset(self, seed: int = None):
+        # flappybird.io cannot be seeded, seed is only taken so games can be swapped.
+        self._game_over = False
+        self._game_over_detector.reset()
+        if not self._played:
+            # Just opened or restarted, it is ready to go already.
+            return
+        self._played = False
         self.input(Keys.SPACE)
         self.input(Keys.SPACE)
         time.sleep(0.5)
@@ -0,0 +1,12 @@
+import attr
+
+from flappy_ai.types.game_types import GameTypes
+
+
+@attr.s(auto_attribs=True)
+class GameConfig:
+    game_type: GameTypes
+    # Base seed for the simulated game, each episode offsets it by its episode number.
+    seed: int
+    # How many simulated games each actor steps in lockstep with the VECTOR game type.
+    vector_games: int = attr.ib(default=16)
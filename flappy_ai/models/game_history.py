@@ -1,32 +1,380 @@
-import random
-from collections import deque
-from typing import List
+import os
+import threading
+from typing import Tuple
 
 import attr
+import numpy as np
 
-from flappy_ai.models.game_data import GameData
 from flappy_ai.models.memory_item import MemoryItem
+from flappy_ai.models.sample_batch import SampleBatch
+from flappy_ai.models.sum_tree import SumTree
+
+# Marks the entries that only hold the earlier frames of an episode's first state, they are never sampled.
+_NO_ACTION = -1
 
 
 @attr.s(auto_attribs=True)
 class GameHistory:
+    """
+    Circular replay memory backed by preallocated arrays.
+
+    Each entry keeps only the newest frame of the state that was acted on, together with the action,
+    reward and terminal flag of that step. Stacked states are rebuilt from the frame indices when a batch
+    is sampled: the state of entry i is frames i-3..i and its next state is frames i-2..i+1.
+    Every episode starts with history_length - 1 entries that hold the rest of its first state, so its first
+    states are sampled exactly as they were played. They have no action and are never sampled, but do count
+    towards len(). Frames that belong to an earlier episode are blanked, which only happens when an episode
+    was added without them.
+
+    Entries have to be appended in the order they were played, one episode after another.
+    Appending and sampling are safe to do from different threads.
+
+    With `prioritized` set, entries are sampled in proportion to their priority (their last TD error)
+    out of a SumTree, and each batch carries the importance sampling weights that undo the bias.
+    """
+
     size: int
-    _buffer: deque = attr.ib(default=attr.Factory(deque), init=False)
+    frame_shape: Tuple[int, int] = attr.ib(default=(160, 120))
+    # How many frames make up a single state.
+    history_length: int = attr.ib(default=4)
+
+    prioritized: bool = attr.ib(default=False)
+    # How strongly the priorities skew sampling, 0 is uniform.
+    priority_alpha: float = attr.ib(default=0.6)
+    # How much of the sampling bias is corrected, grows to 1 over priority_beta_anneal_steps batches.
+    priority_beta: float = attr.ib(default=0.4)
+    priority_beta_anneal_steps: int = attr.ib(default=100000)
+    # Keeps entries with a TD error of 0 from never being sampled again.
+    priority_epsilon: float = attr.ib(default=1e-6)
+
+    _frames: np.array = attr.ib(init=False, default=None)
+    _actions: np.array = attr.ib(init=False, default=None)
+    _rewards: np.array = attr.ib(init=False, default=None)
+    _terminals: np.array = attr.ib(init=False, default=None)
+    # Where the next entry will be written.
+    _cursor: int = attr.ib(init=False, default=0)
+    _count: int = attr.ib(init=False, default=0)
+    _random_state: np.random.RandomState = attr.ib(init=False, default=attr.Factory(np.random.RandomState))
+    _tree: SumTree = attr.ib(init=False, default=None)
+    _max_priority: float = attr.ib(init=False, default=1.0)
+    _beta_increment: float = attr.ib(init=False, default=0.0)
+    _lock: threading.RLock = attr.ib(init=False, default=attr.Factory(threading.RLock))
 
     def __attrs_post_init__(self):
-        self._buffer = deque(maxlen=self.size)
+        self._frames = self._allocate("frames", (self.size,) + tuple(self.frame_shape), np.uint8)
+        self._actions = self._allocate("actions", (self.size,), np.int8)
+        self._rewards = self._allocate("rewards", (self.size,), np.float32)
+        self._terminals = self._allocate("terminals", (self.size,), bool)
+        if self.prioritized:
+            self._tree = SumTree(capacity=self.size)
+            self._beta_increment = (1.0 - self.priority_beta) / self.priority_beta_anneal_steps
+
+    def _allocate(self, name: str, shape: Tuple[int, ...], dtype) -> np.array:
+        # np.zeros only reserves the memory, pages are not touched until an entry is written to them.
+        return np.zeros(shape, dtype=dtype)
+
+    def flush(self):
+        """
+        Makes sure everything appended so far is stored, a no-op for the in memory buffer.
+        """
+        pass
 
     def append(self, memory: MemoryItem):
-        if len(self._buffer) > self.size:
-            del self._buffer[0]
-        self._buffer.append(memory)
+        with self._lock:
+            self._append(memory)
+
+    def _append(self, memory: MemoryItem):
+        first = self._cursor
+        was_empty = self._count == 0
+        written = 1
+        if was_empty or self._terminals[(first - 1) % self.size]:
+            # The first entry of an episode, the frames before the newest one go in ahead of it.
+            for frame in np.moveaxis(memory.state[..., -self.history_length : -1], -1, 0):
+                self._write(frame, _NO_ACTION, 0.0, False)
+                written += 1
+        # Actions arrive one hot encoded.
+        self._write(memory.state[..., -1], np.argmax(memory.action), memory.reward, memory.is_terminal)
+
+        if self._tree is not None:
+            self._prioritize_written(first, written, was_empty)
+
+    def _write(self, frame: np.array, action: int, reward: float, is_terminal: bool):
+        idx = self._cursor
+        self._frames[idx] = frame
+        self._actions[idx] = action
+        self._rewards[idx] = reward
+        self._terminals[idx] = is_terminal
+        self._cursor = (idx + 1) % self.size
+        self._count = min(self._count + 1, self.size)
+
+    def _prioritize_written(self, first: int, count: int, was_empty: bool):
+        """
+        Updates the priorities around `count` entries just written from `first`, in a single pass over the tree.
+        Every entry before the newest one now has its next frame and can be sampled, the newest can not yet.
+        """
+        newest = (first + count - 1) % self.size
+        indices = np.arange(first if was_empty else first - 1, first + count) % self.size
+        unsampleable = [newest]
+        if self._count == self.size:
+            # The oldest entries lost their earlier frames to the new ones.
+            blanked = (self._oldest() + np.arange(self.history_length - 1)) % self.size
+            indices = np.concatenate([indices, blanked])
+            unsampleable = np.append(blanked, newest)
+        priorities = self._priorities_of(indices)
+        # Indices can repeat once the memory wraps, they all have to agree on the priority.
+        priorities[(indices[:, None] == np.asarray(unsampleable)[None, :]).any(axis=1)] = 0.0
+        self._tree.update(indices, priorities)
+
+    def extend(
+        self,
+        frames: np.array,
+        actions: np.array,
+        rewards: np.array,
+        terminals: np.array,
+        earlier_frames: np.array = None,
+    ):
+        """
+        Appends a run of entries in one go.
+        `frames` holds the newest frame of each entry's state and `actions` are indices rather than one hot.
+        When the run starts an episode `earlier_frames` should hold the other history_length - 1 frames of its
+        first state, oldest first, which makes it the same as appending the entries one at a time.
+        """
+        with self._lock:
+            if earlier_frames is not None:
+                self._extend_run(
+                    earlier_frames,
+                    np.full(len(earlier_frames), _NO_ACTION, dtype=np.int8),
+                    np.zeros(len(earlier_frames), dtype=np.float32),
+                    np.zeros(len(earlier_frames), dtype=bool),
+                )
+            self._extend_run(frames, actions, rewards, terminals)
+
+    def _extend_run(self, frames: np.array, actions: np.array, rewards: np.array, terminals: np.array):
+        start = 0
+        while start < len(actions):
+            # Written up to the end of the buffer at most, the rest wraps around on the next pass.
+            count = min(len(actions) - start, self.size - self._cursor)
+            self._extend(
+                frames[start : start + count],
+                actions[start : start + count],
+                rewards[start : start + count],
+                terminals[start : start + count],
+            )
+            start += count
+
+    def _extend(self, frames: np.array, actions: np.array, rewards: np.array, terminals: np.array):
+        idx = self._cursor
+        count = len(actions)
+        self._frames[idx : idx + count] = frames
+        self._actions[idx : idx + count] = actions
+        self._rewards[idx : idx + count] = rewards
+        self._terminals[idx : idx + count] = terminals
+
+        was_empty = self._count == 0
+        self._cursor = (idx + count) % self.size
+        self._count = min(self._count + count, self.size)
+
+        if self._tree is not None:
+            self._prioritize_written(idx, count, was_empty)
+
+    def dump(self, directory: str, chunk_size: int = 2048):
+        """
+        Writes every entry to compressed chunks of `chunk_size` entries in `directory`, oldest first,
+        followed by replay.npz which holds what is needed to read them back.
+        Appending waits until it is done.
+        """
+        with self._lock:
+            oldest = self._oldest()
+            chunks = 0
+            for start in range(0, self._count, chunk_size):
+                indices = (oldest + np.arange(start, min(start + chunk_size, self._count))) % self.size
+                arrays = dict(
+                    frames=self._frames[indices],
+                    actions=self._actions[indices],
+                    rewards=self._rewards[indices],
+                    terminals=self._terminals[indices],
+                )
+                if self._tree is not None:
+                    arrays["priorities"] = self._tree.get(indices)
+                np.savez_compressed(os.path.join(directory, f"replay-{chunks:05d}.npz"), **arrays)
+                chunks += 1
 
-    def __getitem__(self, idx):
-        return self._buffer[idx]
+            _, keys, position, has_gauss, cached_gaussian = self._random_state.get_state()
+            np.savez(
+                os.path.join(directory, "replay.npz"),
+                count=self._count,
+                chunks=chunks,
+                frame_shape=np.array(self.frame_shape),
+                max_priority=self._max_priority,
+                priority_beta=self.priority_beta,
+                random_keys=keys,
+                random_position=position,
+                random_has_gauss=has_gauss,
+                random_cached_gaussian=cached_gaussian,
+            )
+
+    def restore(self, directory: str):
+        """
+        Reads back what dump wrote, one chunk at a time so it never needs more than a chunk of extra memory.
+        The memory has to be empty. If it is smaller than the one that was dumped only the newest entries are kept.
+        """
+        with self._lock, np.load(os.path.join(directory, "replay.npz")) as replay:
+            if len(self):
+                raise ValueError("Can only restore into an empty memory.")
+            if tuple(replay["frame_shape"]) != tuple(self.frame_shape):
+                raise ValueError(f"Frame shape {tuple(replay['frame_shape'])} does not match {self.frame_shape}.")
+
+            # Entries that would be overwritten anyway are skipped.
+            skip = max(int(replay["count"]) - self.size, 0)
+            truncated = skip > 0
+            for chunk in range(int(replay["chunks"])):
+                with np.load(os.path.join(directory, f"replay-{chunk:05d}.npz")) as arrays:
+                    first = min(skip, len(arrays["actions"]))
+                    skip -= first
+                    count = len(arrays["actions"]) - first
+                    if not count:
+                        continue
+                    indices = self._cursor + np.arange(count)
+                    self._frames[indices] = arrays["frames"][first:]
+                    self._actions[indices] = arrays["actions"][first:]
+                    self._rewards[indices] = arrays["rewards"][first:]
+                    self._terminals[indices] = arrays["terminals"][first:]
+                    if self._tree is not None and "priorities" in arrays:
+                        self._tree.update(indices, arrays["priorities"][first:])
+                    self._cursor = (self._cursor + count) % self.size
+                    self._count += count
+
+            self._random_state.set_state(
+                (
+                    "MT19937",
+                    replay["random_keys"],
+                    int(replay["random_position"]),
+                    int(replay["random_has_gauss"]),
+                    float(replay["random_cached_gaussian"]),
+                )
+            )
+            if self._tree is not None:
+                self._max_priority = float(replay["max_priority"])
+                self.priority_beta = float(replay["priority_beta"])
+                if truncated or not self._tree.total():
+                    # Dumped without priorities, or the oldest entries lost their earlier frames.
+                    self.reset_priorities()
+                else:
+                    # The newest entry can not be sampled until its next frame arrives.
+                    self._tree.update([(self._cursor - 1) % self.size], [0.0])
 
     def __len__(self):
-        return len(self._buffer)
+        return self._count
+
+    def _oldest(self) -> int:
+        return self._cursor if self._count == self.size else 0
+
+    def _sample_offsets(self, batch_size: int) -> np.array:
+        """
+        Picks entries by their distance from the oldest entry.
+        Once the memory has wrapped the oldest few entries are skipped as their earlier frames were overwritten,
+        and the newest entry is always skipped as its next frame has not been written yet.
+        """
+        low = self.history_length - 1 if self._count == self.size else 0
+        offsets = self._random_state.randint(low, self._count - 1, size=batch_size)
+        # The entries ahead of each episode are a small part of the memory, so they are just drawn again.
+        redraw = self._actions[(self._oldest() + offsets) % self.size] == _NO_ACTION
+        attempts = 0
+        while redraw.any():
+            attempts += 1
+            if attempts == 100 and not len(self._sampleable_offsets()):
+                raise ValueError("The memory holds no entries that can be sampled yet.")
+            offsets[redraw] = self._random_state.randint(low, self._count - 1, size=int(redraw.sum()))
+            redraw = self._actions[(self._oldest() + offsets) % self.size] == _NO_ACTION
+        return offsets
+
+    def _sampleable_offsets(self) -> np.array:
+        low = self.history_length - 1 if self._count == self.size else 0
+        offsets = np.arange(low, max(self._count - 1, low))
+        return offsets[self._actions[(self._oldest() + offsets) % self.size] != _NO_ACTION]
+
+    def _priorities_of(self, indices: np.array) -> np.array:
+        """
+        The priority entries that just became sampleable start with, the highest seen so far.
+        """
+        return np.where(self._actions[indices] == _NO_ACTION, 0.0, self._max_priority)
+
+    def reset_priorities(self):
+        """
+        Gives every sampleable entry the highest priority seen so far, used when entries were loaded without theirs.
+        """
+        if self._tree is None:
+            return
+        with self._lock:
+            self._tree = SumTree(capacity=self.size)
+            self._tree.update((self._oldest() + self._sampleable_offsets()) % self.size, self._max_priority)
+
+    def update_priorities(self, indices: np.array, td_errors: np.array):
+        if self._tree is None:
+            return
+        priorities = (np.abs(td_errors) + self.priority_epsilon) ** self.priority_alpha
+        with self._lock:
+            # Entries that stopped being sampleable since the batch was drawn must stay at 0.
+            still_sampleable = self._tree.get(indices) > 0
+            self._tree.update(np.asarray(indices)[still_sampleable], priorities[still_sampleable])
+            self._max_priority = max(self._max_priority, float(np.max(priorities)))
+
+    def _build_batch(self, offsets: np.array) -> SampleBatch:
+        batch_size = len(offsets)
+        history = self.history_length
+        oldest = self._oldest()
+
+        # Frames i-3..i+1 for every sampled entry i, measured from the oldest entry.
+        window = offsets[:, None] + np.arange(-(history - 1), 2)
+        indices = (oldest + window) % self.size
+        frames = self._frames[indices]
+
+        # A frame can only be part of a stack if no episode ended between it and the top of the stack.
+        ended = self._terminals[indices[:, :-1]]
+        ended_before_state = np.logical_or.accumulate(ended[:, -2::-1], axis=1)[:, ::-1]
+        ended_before_next = np.logical_or.accumulate(ended[:, ::-1], axis=1)[:, ::-1]
+        in_buffer = window >= 0
+
+        state_mask = np.ones((batch_size, history), dtype=bool)
+        state_mask[:, :-1] = ~ended_before_state & in_buffer[:, :-2]
+        next_mask = np.ones((batch_size, history), dtype=bool)
+        next_mask[:, :-1] = ~ended_before_next[:, 1:] & in_buffer[:, 1:-1]
+
+        states = np.empty((batch_size,) + tuple(self.frame_shape) + (history,), dtype=np.uint8)
+        next_states = np.empty_like(states)
+        for position in range(history):
+            np.multiply(frames[:, position], state_mask[:, position, None, None], out=states[..., position])
+            np.multiply(frames[:, position + 1], next_mask[:, position, None, None], out=next_states[..., position])
+
+        entries = indices[:, history - 1]
+        return SampleBatch(
+            states=states,
+            actions=self._actions[entries].astype(np.int64),
+            rewards=self._rewards[entries],
+            next_states=next_states,
+            is_terminal=self._terminals[entries],
+            indices=entries,
+        )
+
+    def _get_prioritized_batch(self, batch_size: int) -> SampleBatch:
+        # One value from each of batch_size equal slices of the total keeps the batch spread out.
+        total = self._tree.total()
+        values = (np.arange(batch_size) + self._random_state.rand(batch_size)) * total / batch_size
+        indices = self._tree.sample(values)
+
+        probabilities = self._tree.get(indices) / total
+        weights = (self._count * probabilities) ** -self.priority_beta
+        self.priority_beta = min(1.0, self.priority_beta + self._beta_increment)
+
+        batch = self._build_batch((indices - self._oldest()) % self.size)
+        batch.weights = (weights / weights.max()).astype(np.float32)
+        return batch
 
-    def get_sample_batch(self, batch_size=1) -> List[MemoryItem]:
-        # Remember that this will return an entire game.
-        return random.sample(self._buffer, batch_size)
+    def get_sample_batch(self, batch_size=1) -> SampleBatch:
+        """
+        Samples transitions, the cost only depends on batch_size and not on how full the memory is.
+        """
+        with self._lock:
+            if self._tree is not None:
+                return self._get_prioritized_batch(batch_size)
+            return self._build_batch(self._sample_offsets(batch_size))
@@ -0,0 +1,16 @@
+from typing import Optional, Tuple
+
+import attr
+
+
+@attr.s(auto_attribs=True)
+class GameOverConfig:
+    # Pixels around the bird's last position searched for it before falling back to the whole screen.
+    bird_margin: int
+    # Pixels around the spot the game over button was last found at that are searched for it.
+    template_margin: int
+    # The template and the searched region are shrunk by this much before matching, 1 matches at full size.
+    template_scale: int
+    # Row and column of the game over button's top left corner. Saves searching the whole screen for it
+    # until it has been shown once, None finds it that way.
+    template_position: Optional[Tuple[int, int]] = attr.ib(default=None)
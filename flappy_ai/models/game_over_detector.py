@@ -0,0 +1,110 @@
+from typing import Tuple
+
+import attr
+import cv2
+import numpy as np
+from structlog import get_logger
+
+from flappy_ai.models.image import Image
+
+# Colours only the bird has.
+BIRD_LOWER_HSV = np.array([0, 100, 100])
+BIRD_UPPER_HSV = np.array([15, 255, 255])
+TEMPLATE_THRESHOLD = 0.8
+
+logger = get_logger(__name__)
+
+
+@attr.s(auto_attribs=True)
+class GameOverDetector:
+    """
+    Works out if the game has ended: the bird is off the screen or the game over button is shown.
+
+    The bird is looked for in a window around where it was last seen and the whole screen is only searched
+    when it is not there, so a bird that is missing is still missed the same way. The game over button never
+    moves, once it has been found only the area around that spot is matched against the template.
+    Passing `template_position` skips searching the whole screen for it until then.
+    """
+
+    template: np.array
+    bird_margin: int = attr.ib(default=8)
+    template_margin: int = attr.ib(default=4)
+    template_scale: int = attr.ib(default=1)
+    # Row and column of the button's top left corner, if it is known up front.
+    template_position: Tuple[int, int] = attr.ib(default=None)
+
+    # top, bottom, left, right of where the bird was last seen.
+    _bird_box: Tuple[int, int, int, int] = attr.ib(init=False, default=None)
+    _template_position: Tuple[int, int] = attr.ib(init=False, default=None)
+    _scaled_template: np.array = attr.ib(init=False, default=None)
+
+    def __attrs_post_init__(self):
+        self._scaled_template = self._scale(self.template)
+        if self.template_position is not None:
+            self._template_position = tuple(self.template_position)
+
+    def _scale(self, image: np.array) -> np.array:
+        if self.template_scale == 1:
+            return image
+        height, width = image.shape[:2]
+        return cv2.resize(
+            image,
+            (max(width // self.template_scale, 1), max(height // self.template_scale, 1)),
+            interpolation=cv2.INTER_AREA,
+        )
+
+    def reset(self):
+        """
+        Forgets where the bird was, call between games.
+        """
+        self._bird_box = None
+
+    def _find_bird(self, rgb: np.array, top: int, bottom: int, left: int, right: int) -> bool:
+        hsv = cv2.cvtColor(rgb[top:bottom, left:right], cv2.COLOR_RGB2HSV)
+        points = cv2.findNonZero(cv2.inRange(hsv, lowerb=BIRD_LOWER_HSV, upperb=BIRD_UPPER_HSV))
+        if points is None or points.size == 0:
+            return False
+        x, y, width, height = cv2.boundingRect(points)
+        self._bird_box = (top + y, top + y + height, left + x, left + x + width)
+        return True
+
+    def bird_visible(self, rgb: np.array) -> bool:
+        if self._bird_box is not None:
+            top, bottom, left, right = self._bird_box
+            margin = self.bird_margin
+            if self._find_bird(rgb, max(top - margin, 0), bottom + margin, max(left - margin, 0), right + margin):
+                return True
+        self._bird_box = None
+        return self._find_bird(rgb, 0, rgb.shape[0], 0, rgb.shape[1])
+
+    def game_over_shown(self, greyscale: np.array) -> bool:
+        top, left = 0, 0
+        region = greyscale
+        if self._template_position is not None:
+            margin = self.template_margin
+            top = max(self._template_position[0] - margin, 0)
+            left = max(self._template_position[1] - margin, 0)
+            height, width = self.template.shape[:2]
+            region = greyscale[top : top + height + 2 * margin, left : left + width + 2 * margin]
+
+        region = self._scale(region)
+        if region.shape[0] < self._scaled_template.shape[0] or region.shape[1] < self._scaled_template.shape[1]:
+            return False
+        # Template matching is very good for exact matches.
+        match = cv2.matchTemplate(region, self._scaled_template, cv2.TM_CCOEFF_NORMED)
+        _, best, _, (x, y) = cv2.minMaxLoc(match)
+        if best < TEMPLATE_THRESHOLD:
+            return False
+        if self._template_position is None:
+            self._template_position = (top + y * self.template_scale, left + x * self.template_scale)
+            logger.debug(
+                "Found the game over button, set GAME_OVER_CONFIG.TemplatePosition to skip searching for it.",
+                template_position=self._template_position,
+            )
+        return True
+
+    def __call__(self, screen: Image) -> bool:
+        # Bird is off screen?
+        if not self.bird_visible(screen.image):
+            return True
+        return self.game_over_shown(screen.as_greyscale())
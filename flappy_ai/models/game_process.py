@@ -1,94 +1,392 @@
+import itertools
+import os
 import time
+from collections import deque
 from multiprocessing import Pipe, Process
-from multiprocessing.connection import Pipe
-from typing import List
+from multiprocessing.connection import Connection, Pipe
+from typing import Callable, Deque, Iterator, List, Union
 
 import attr
 import numpy as np
 from structlog import get_logger
 
+from flappy_ai.config import (actor_config, game_config, recorder_config,
+                              trace_config)
+from flappy_ai.factories.game_factory import game_factory
 from flappy_ai.models import (EpisodeResult, MemoryItem, PredictionRequest,
-                              PredictionResult)
-from flappy_ai.models.game import Game
+                              PredictionResult, WeightsRequest, WeightsUpdate)
+from flappy_ai.models.actor_metrics import ActorMetrics
+from flappy_ai.models.episode_discarded import EpisodeDiscarded
+from flappy_ai.models.episode_recorder import EpisodeRecorder
+from flappy_ai.models.frame_ring import FrameRing
+from flappy_ai.models.frame_stacker import FrameStacker
 from flappy_ai.models.game_data import GameData
+from flappy_ai.models.networks.numpy_dqn import NumpyDQN
 from flappy_ai.models.process_base import ProcessBase
+from flappy_ai.models.stage_timer import stage_timer
+from flappy_ai.models.tracer import tracer
+from flappy_ai.types.game_types import GameTypes
 
 logger = get_logger(__name__)
 
 
 @attr.s(auto_attribs=True)
 class GameProcess(ProcessBase):
+    # Which of the FrameRing's slots belong to this process.
+    actor_index: int = None
+
+    def start(self, *args, **kwargs):
+        super().start(*args, actor_index=self.actor_index, **kwargs)
+
     @staticmethod
-    def _process_execute(child_pipe: Pipe, *args, force_headless=True, episode_number=None, **kwargs):
-        game_data = GameData(episode_number=episode_number)
+    def _request_action(inference_pipe: Connection, request: PredictionRequest) -> PredictionResult:
+        with tracer.span("predict", request=request.sequence):
+            with stage_timer.time("ipc_send"):
+                inference_pipe.send(request)
+            with stage_timer.time("inference_wait"):
+                while True:
+                    result: PredictionResult = inference_pipe.recv()
+                    # The pipe is reused by the next process on the same actor index, so it can still hold
+                    # the answer to a request a previous process sent right before it died.
+                    if result.sequence == request.sequence:
+                        return result
+
+    @staticmethod
+    def _remote_policy(
+        frame_ring: FrameRing, actor_index: int, inference_pipe: Connection, request_sequence: Iterator[int]
+    ) -> Callable[[np.array], int]:
+        """
+        Asks the keras process for every action.
+        """
+
+        def choose_action(state: np.array) -> int:
+            if frame_ring is None:
+                request = PredictionRequest(data=state, sequence=next(request_sequence))
+            else:
+                with stage_timer.time("ipc_send"):
+                    slot, sequence = frame_ring.write(actor_index, state)
+                request = PredictionRequest(slot=slot, sequence=sequence)
+            return GameProcess._request_action(inference_pipe, request).result
+
+        return choose_action
 
+    @staticmethod
+    def _remote_batch_policy(
+        inference_pipe: Connection, request_sequence: Iterator[int]
+    ) -> Callable[[np.array], np.array]:
+        """
+        Asks the keras process for the actions of a whole batch of states in one request.
+        """
+
+        def choose_actions(states: np.array) -> np.array:
+            request = PredictionRequest(data=np.ascontiguousarray(states), batch=True, sequence=next(request_sequence))
+            return GameProcess._request_action(inference_pipe, request).result
+
+        return choose_actions
+
+    @staticmethod
+    def _pull_weights(network: NumpyDQN, inference_pipe: Connection, request_sequence: Iterator[int]):
+        request = WeightsRequest(version=network.version, sequence=next(request_sequence))
+        with tracer.span("pull_weights", request=request.sequence, version=network.version):
+            inference_pipe.send(request)
+            while True:
+                update: WeightsUpdate = inference_pipe.recv()
+                # Like with predictions, anything else was meant for a previous process on the same pipe.
+                if isinstance(update, WeightsUpdate) and update.sequence == request.sequence:
+                    network.update(update)
+                    return
+
+    @staticmethod
+    def _repeat_action(env, stacker: FrameStacker, action: int) -> (int, int):
+        """
+        Holds the action for ActionRepeat game steps, stopping early if the game ends.
+        Only the last screen is pushed onto the stack, the others only go to the max pooling.
+        Returns the summed reward and whether the game ended.
+        """
+        total_reward = 0
+        for repeat in range(actor_config.action_repeat):
+            screen, reward, done = env.step(action)
+            total_reward += reward
+            if done or repeat == actor_config.action_repeat - 1:
+                break
+            with stage_timer.time("stacking"):
+                stacker.observe(screen)
+        with stage_timer.time("stacking"):
+            stacker.push(screen)
+        return total_reward, done
+
+    @staticmethod
+    def _play_episode(
+        env,
+        episode_number: int,
+        choose_action: Callable[[np.array], int],
+    ) -> Union[EpisodeResult, EpisodeDiscarded]:
+        game_data = GameData(episode_number=episode_number)
+        loop_times: List[float] = []
         session_start_time = time.time()
-        with Game(headless=force_headless) as env:
 
-            if child_pipe.poll() and child_pipe.recv() is None:
-                # Shutdown request
-                return
+        # https://danieltakeshi.github.io/2016/11/25/frame-skipping-and-preprocessing-for-deep-q-networks-on-atari-2600-games/
+        # Each state is the last few screens stacked into a single (160, 120, depth) image,
+        # this gives the network an understanding of movement.
+        stacker = FrameStacker(
+            frame_shape=env.state_shape(), depth=actor_config.stack_depth, max_pool=actor_config.max_pool_frames
+        )
+        for _ in range(actor_config.stack_depth):
+            screen, reward, done = env.step(0)
+            stacker.push(screen)
+        # The stacker hands out views of its buffer, the memory keeps its own copy of every state.
+        # The next state of one step is the state of the one after it, so it is only copied once.
+        state = np.ascontiguousarray(stacker.current())
+        while True:
+
+            # Frames can be skipped by repeating the last action, see ACTOR_CONFIG.ActionRepeat.
+            start_time = time.time()
+            # Only the stages of this loop are wanted if it turns out too slow.
+            stage_timer.lap()
+
+            action = choose_action(state)
+
+            reward, done = GameProcess._repeat_action(env, stacker, action)
+            next_state = np.ascontiguousarray(stacker.current())
+
+            # One hot encoding.
+            if action == 0:
+                taken_action = [1, 0]
+            else:
+                taken_action = [0, 1]
+
+            memory_item = MemoryItem(state=state, action=taken_action)
+            memory_item.reward = reward
+            memory_item.is_terminal = bool(done)
+            memory_item.next_state = next_state
+            game_data.append(memory_item)
+
+            if done:
+                break
 
-            loop_times: List[float] = []
+            game_data.score += reward
+            state = next_state
 
-            # https://danieltakeshi.github.io/2016/11/25/frame-skipping-and-preprocessing-for-deep-q-networks-on-atari-2600-games/
-            screen_history: List[np.array] = []
+            loop_time = time.time() - start_time
+            stage_timer.record("loop", loop_time)
+            if loop_time > 0.25 * actor_config.action_repeat:
+                discarded = EpisodeDiscarded(
+                    episode_number=episode_number,
+                    reason="slow_loop",
+                    loop_time=loop_time,
+                    stage_times=stage_timer.lap(),
+                )
+                logger.warn(
+                    "[GameProcess] Took to long to complete loop, tossing game!",
+                    loop_time=loop_time,
+                    slowest_stage=discarded.slowest_stage(),
+                )
+                return discarded
+            # Handy to know how long it takes to complete a game.
+            loop_times.append(loop_time)
+
+        logger.debug(
+            "[GameProcess] Episode completed.",
+            episode_number=episode_number,
+            average_loop_time=np.mean(loop_times) if loop_times else None,
+            total_run_time=time.time() - session_start_time,
+        )
+        return EpisodeResult(game_data=game_data)
+
+    @staticmethod
+    def _play_vector_games(
+        child_pipe: Connection,
+        make_env: Callable[[int], any],
+        choose_actions: Callable[[np.array], np.array],
+        finished: Callable[[EpisodeResult], None],
+    ):
+        """
+        Plays the episodes sent down the child pipe in the games of a VectorGame, all of them stepped at once,
+        and hands every EpisodeResult to `finished`. Returns once a None asks the process to quit.
+
+        A game only takes an episode number when it starts, so one that has none keeps playing unrecorded until
+        its next game. make_env gets the first episode number to seed the games with.
+        The next state of the last step of an episode is the first state of the game after it, which nothing
+        uses as the step is terminal. Nothing is discarded for being slow, the games wait for the actions.
+        """
+        episode_numbers: Deque[int] = deque()
+
+        def receive(block: bool) -> bool:
+            # False once the process has been asked to quit.
+            while block or child_pipe.poll():
+                episode_number = child_pipe.recv()
+                if episode_number is None:
+                    return False
+                episode_numbers.append(episode_number)
+                block = False
+            return True
+
+        if not receive(block=True):
+            return
+        with make_env(episode_numbers[0]) as env:
+            game_data: List[GameData] = [None] * env.size
+            # The state each recorded game is on, copied as the observations are only valid until the next step.
+            states: List[np.array] = [None] * env.size
+            observations = env.reset()
+            starting = np.ones(env.size, dtype=bool)
             while True:
+                # Nothing to play until more episodes arrive.
+                if not receive(block=not episode_numbers and all(data is None for data in game_data)):
+                    return
+                for game in np.flatnonzero(starting)[: len(episode_numbers)]:
+                    game_data[game] = GameData(episode_number=episode_numbers.popleft())
+                    states[game] = np.array(observations[game], order="C")
 
-                # A note for future games, it may be better to skip frames and repeat the last
-                # action during that time.
-                # We cannot really skip frames here as its already slow to get them.
                 start_time = time.time()
-                while len(screen_history) < 4:
-                    state, reward, done = env.step(0)
-                    screen_history.append(state)
-
-                # Each state is a array of the last 4 screens [screen1, 2, 3, 4])
-                # This give the network understanding of movement.
-                # In this case the network will be expecting an input shape of (4, 160, 120)
-                # from there we can use stack to reshape the images into a single image (160, 120, 4)
-                # I'm not sure if this works?
-                # Maybe i need 4 seperate inputs to the network instead.
-                state = np.stack(np.array(screen_history[-4:]), axis=2)
-
-                child_pipe.send(PredictionRequest(data=state))
-                action: PredictionResult = child_pipe.recv()
-
-                next_state, reward, done = env.step(action.result)
-                screen_history.append(next_state)
-                next_state = np.stack(np.array(screen_history[-4:]), axis=2)
-
-                # The reward goes back one memory item since that is the action that created it.
-                # same wth the terminal state.
-                if len(game_data) > 0:
-                    game_data[-1].reward = reward
-                    game_data[-1].is_terminal = done
-                    game_data[-1].next_state = state
-
-                if done:
-                    break
-
-                game_data.score += reward
-
-                # One hot encoding.
-                if action.result == 0:
-                    taken_action = [1, 0]
-                else:
-                    taken_action = [0, 1]
-
-                game_data.append(MemoryItem(state=next_state, action=taken_action))
-
-                loop_time = time.time() - start_time
-                if loop_time > 0.25:
-                    logger.warn("[GameProcess] Took to long to complete loop, tossing game!", loop_time=loop_time)
+                stage_timer.lap()
+                actions = choose_actions(observations)
+                observations, rewards, dones = env.step(actions)
+
+                for game, data in enumerate(game_data):
+                    if data is None:
+                        continue
+                    # One hot encoding.
+                    memory_item = MemoryItem(state=states[game], action=[1, 0] if actions[game] == 0 else [0, 1])
+                    memory_item.reward = int(rewards[game])
+                    memory_item.is_terminal = bool(dones[game])
+                    memory_item.next_state = states[game] = np.array(observations[game], order="C")
+                    data.append(memory_item)
+                    if dones[game]:
+                        game_data[game] = None
+                        finished(EpisodeResult(game_data=data))
+                    else:
+                        data.score += memory_item.reward
+                # Finished games have already started over.
+                starting = dones
+                stage_timer.record("loop", time.time() - start_time)
+
+    @staticmethod
+    def _process_execute(
+        child_pipe: Pipe,
+        *args,
+        force_headless=True,
+        game_type: GameTypes = None,
+        frame_ring: FrameRing = None,
+        actor_index: int = None,
+        inference_pipe: Connection = None,
+        **kwargs,
+    ):
+        """
+        Keeps a game open and plays an episode for every episode number sent down the child pipe,
+        sending back an EpisodeResult, or EpisodeDiscarded if the episode had to be thrown away.
+        With GameTypes.VECTOR the episodes are played side by side in one VectorGame, see _play_vector_games.
+        A None asks the process to quit.
+        """
+        tracer.configure(trace_config, process_name=f"actor-{actor_index}")
+        if game_type is None:
+            game_type = game_config.game_type
+        # Predictions go straight to the keras process, the child pipe is left for talking to the runner.
+        if inference_pipe is None:
+            inference_pipe = child_pipe
+        # The pipe is reused by whichever process takes this actor index next, starting from the pid keeps
+        # the sequences of two processes from ever overlapping.
+        request_sequence = itertools.count(os.getpid() << 32)
+
+        network = None
+        if actor_config.local_inference:
+            # Actions are picked here and the keras process is only asked for new weights now and then.
+            network = NumpyDQN(seed=game_config.seed + actor_index)
+
+            def choose_action(state: np.array) -> int:
+                with tracer.span("local_predict"), stage_timer.time("inference"):
+                    return network.act(state)
+
+            def choose_actions(states: np.array) -> np.array:
+                with tracer.span("local_predict"), stage_timer.time("inference"):
+                    return network.act_batch(states)
+
+        else:
+            choose_action = GameProcess._remote_policy(frame_ring, actor_index, inference_pipe, request_sequence)
+            choose_actions = GameProcess._remote_batch_policy(inference_pipe, request_sequence)
+        episodes_since_pull = 0
+        last_pull = 0.0
+        last_metrics = time.time()
+        recorder = None
+        if recorder_config.enabled:
+            recorder = EpisodeRecorder(
+                directory=os.path.join(recorder_config.directory, f"actor-{actor_index}"),
+                chunk_frames=recorder_config.chunk_frames,
+            ).start()
+
+        if game_type is GameTypes.VECTOR:
+
+            def make_env(first_episode_number: int):
+                # The games of a VectorGame share one random state, seeded from the first episode it plays.
+                return game_factory(
+                    game_type=game_type,
+                    seed=game_config.seed + first_episode_number,
+                    games=game_config.vector_games,
+                    stack_depth=actor_config.stack_depth,
+                )
+
+            def finished(result: EpisodeResult):
+                nonlocal episodes_since_pull, last_pull, last_metrics
+                child_pipe.send(result)
+                if recorder is not None:
+                    recorder.record(result.game_data)
+                episodes_since_pull += 1
+                if network is not None and (
+                    episodes_since_pull >= actor_config.weights_sync_episodes
+                    or time.time() - last_pull >= actor_config.weights_sync_seconds
+                ):
+                    GameProcess._pull_weights(network, inference_pipe, request_sequence)
+                    episodes_since_pull = 0
+                    last_pull = time.time()
+                if time.time() - last_metrics >= actor_config.metrics_every_seconds:
+                    last_metrics = time.time()
+                    child_pipe.send(ActorMetrics(actor_index=actor_index, stages=stage_timer.summary()))
+                    stage_timer.reset()
+
+            GameProcess._signal_ready(child_pipe)
+            if network is not None:
+                GameProcess._pull_weights(network, inference_pipe, request_sequence)
+                last_pull = time.time()
+            GameProcess._play_vector_games(child_pipe, make_env, choose_actions, finished)
+            if recorder is not None:
+                recorder.stop()
+            tracer.dump()
+            return
+
+        # Every game is seeded from its episode number on reset, see below.
+        with game_factory(game_type=game_type, headless=force_headless) as env:
+            GameProcess._signal_ready(child_pipe)
+            while True:
+                episode_number = child_pipe.recv()
+                if episode_number is None:
+                    # Shutdown request
+                    if recorder is not None:
+                        recorder.stop()
+                    tracer.dump()
                     return
-                # Handy to know how long it takes to complete a game.
-                loop_times.append(loop_time)
-
-        # Send the session data up to the main process.
-        # Do not exit until the data has been read.
-        # Exiting before causes the data to be lost.
-        child_pipe.send(EpisodeResult(game_data=game_data))
-        logger.debug("[GameProcess] Completed.", average_loop_time=np.mean(loop_times), total_run_time=time.time()-session_start_time)
-        while child_pipe.poll():
-            time.sleep(1)
+
+                # Pulled before the game starts so the wait for the weights does not eat into it.
+                if network is not None and (
+                    network.version < 0
+                    or episodes_since_pull >= actor_config.weights_sync_episodes
+                    or time.time() - last_pull >= actor_config.weights_sync_seconds
+                ):
+                    GameProcess._pull_weights(network, inference_pipe, request_sequence)
+                    episodes_since_pull = 0
+                    last_pull = time.time()
+                episodes_since_pull += 1
+
+                # Including the first game, so every episode number is played with its own seed
+                # whichever actor gets it and however often the actors are restarted.
+                env.reset(seed=game_config.seed + episode_number)
+
+                with tracer.span("episode", episode=episode_number):
+                    result = GameProcess._play_episode(env, episode_number, choose_action)
+                child_pipe.send(result)
+                # Recorded once the result is on its way so the runner is not kept waiting.
+                if recorder is not None and isinstance(result, EpisodeResult):
+                    recorder.record(result.game_data)
+
+                if time.time() - last_metrics >= actor_config.metrics_every_seconds:
+                    last_metrics = time.time()
+                    child_pipe.send(ActorMetrics(actor_index=actor_index, stages=stage_timer.summary()))
+                    stage_timer.reset()
@@ -0,0 +1,70 @@
+import attr
+import numpy as np
+
+
+@attr.s(auto_attribs=True)
+class Histogram:
+    """
+    Fixed bucket histogram, cheap enough to record every sample on a hot path.
+    A value v lands in the first bucket whose upper edge is at least v, values past the last edge
+    share an overflow bucket.
+    """
+
+    edges: np.array
+
+    _counts: np.array = attr.ib(init=False, default=None)
+    _total: float = attr.ib(init=False, default=0.0)
+    _max: float = attr.ib(init=False, default=0.0)
+
+    def __attrs_post_init__(self):
+        self.edges = np.asarray(self.edges, dtype=np.float64)
+        self._counts = np.zeros(len(self.edges) + 1, dtype=np.int64)
+
+    @classmethod
+    def linear(cls, start: float, stop: float, count: int) -> "Histogram":
+        return cls(edges=np.linspace(start, stop, count))
+
+    @classmethod
+    def exponential(cls, start: float, factor: float, count: int) -> "Histogram":
+        return cls(edges=start * factor ** np.arange(count))
+
+    def add(self, value: float):
+        self._counts[np.searchsorted(self.edges, value)] += 1
+        self._total += value
+        if value > self._max:
+            self._max = float(value)
+
+    def count(self) -> int:
+        return int(self._counts.sum())
+
+    def mean(self) -> float:
+        count = self.count()
+        return self._total / count if count else 0.0
+
+    def percentile(self, percent: float) -> float:
+        """
+        Upper edge of the bucket the percentile falls in, so it is never under reported,
+        capped at the largest value seen.
+        """
+        count = self.count()
+        if not count:
+            return 0.0
+        bucket = int(np.searchsorted(np.cumsum(self._counts), count * percent / 100.0))
+        if bucket >= len(self.edges):
+            return self._max
+        return min(float(self.edges[bucket]), self._max)
+
+    def summary(self) -> dict:
+        return {
+            "count": self.count(),
+            "mean": round(float(self.mean()), 4),
+            "p50": self.percentile(50),
+            "p90": self.percentile(90),
+            "p99": self.percentile(99),
+            "max": round(self._max, 4),
+        }
+
+    def reset(self):
+        self._counts[:] = 0
+        self._total = 0.0
+        self._max = 0.0
@@ -6,12 +6,14 @@ import numpy as np
 @attr.s(auto_attribs=True)
 class Image:
     image: np.array
+    _greyscale: np.array = attr.ib(default=None)
+    # Where the HSV copy is written if it is needed, allocated on demand otherwise.
+    _hsv_buffer: np.array = attr.ib(default=None)
     _hsv: np.array = attr.ib(init=False, default=None)
-    _greyscale: np.array = attr.ib(init=False, default=None)
 
     def as_HSV(self) -> np.array:
         if self._hsv is None:
-            self._hsv = cv2.cvtColor(self.image, cv2.COLOR_RGB2HSV)
+            self._hsv = cv2.cvtColor(self.image, cv2.COLOR_RGB2HSV, dst=self._hsv_buffer)
         return self._hsv
 
     def as_greyscale(self) -> np.array:
@@ -0,0 +1,13 @@
+import attr
+
+from flappy_ai.types.transport_types import TransportTypes
+
+
+@attr.s(auto_attribs=True)
+class InferenceConfig:
+    # Most prediction requests answered with a single forward pass.
+    max_batch_size: int
+    # How long the first request of a batch may wait for more to arrive.
+    max_wait_ms: float
+    # How actors hand their states to the keras process.
+    transport: TransportTypes = attr.ib(default=TransportTypes.PIPE)
@@ -1,13 +1,21 @@
 import time
-from multiprocessing.connection import Pipe
+from multiprocessing.connection import Connection, Pipe, wait
+from typing import List, Tuple
 
 import attr
 import numpy as np
 from structlog import get_logger
 
+from flappy_ai.config import inference_config, learner_config, trace_config
 from flappy_ai.factories.network_factory import network_factory
-from flappy_ai.models import EpisodeResult, PredictionRequest, PredictionResult
+from flappy_ai.models import (EpisodeResult, PredictionRequest,
+                              PredictionResult, WeightsRequest)
+from flappy_ai.models.frame_ring import FrameRing
+from flappy_ai.models.histogram import Histogram
+from flappy_ai.models.learner import Learner
+from flappy_ai.models.networks.abstract_network import AbstractNetwork
 from flappy_ai.models.process_base import ProcessBase
+from flappy_ai.models.tracer import tracer
 from flappy_ai.types.network_types import NetworkTypes
 
 logger = get_logger(__name__)
@@ -15,46 +23,138 @@ logger = get_logger(__name__)
 
 @attr.s(auto_attribs=True)
 class KerasProcess(ProcessBase):
+    # Saving the trainer snapshot on the way out can take a while with a big replay memory.
+    shutdown_timeout: float = 300
+
+    @staticmethod
+    def _collect_batch(
+        connections: List[Connection], ready: List[Connection]
+    ) -> (List[Tuple[Connection, PredictionRequest]], List[Tuple[Connection, any]]):
+        """
+        Gathers prediction requests from every connection until the batch is full or the wait deadline passes.
+        Anything that is not a prediction request is handed back to be dealt with after the batch.
+        Returns the requests and the other messages along with the connection each one has to be answered on.
+        """
+        requests: List[Tuple[Connection, PredictionRequest]] = []
+        other_messages: List[Tuple[Connection, any]] = []
+        deadline = time.time() + inference_config.max_wait_ms / 1000
+        while True:
+            for connection in ready:
+                while connection.poll() and len(requests) < inference_config.max_batch_size:
+                    message = connection.recv()
+                    if isinstance(message, PredictionRequest):
+                        requests.append((connection, message))
+                    else:
+                        other_messages.append((connection, message))
+
+            remaining = deadline - time.time()
+            if not requests or len(requests) >= inference_config.max_batch_size or remaining <= 0:
+                return requests, other_messages
+            ready = wait(connections, timeout=remaining)
+            if not ready:
+                return requests, other_messages
+
     @staticmethod
-    def _process_execute(child_pipe: Pipe, *args, network_type: NetworkTypes = None, **kwargs):
+    def _predict_batch(agent: AbstractNetwork, requests: List[PredictionRequest]) -> List[any]:
+        """
+        Picks an action for every state in the requests, with a single forward pass for all of them.
+        Batch requests get an array of actions back, one for each of their states.
+        """
+        states = []
+        for request in requests:
+            states.extend(request.data if request.batch else [request.data])
+        counts = [len(request.data) if request.batch else 1 for request in requests]
+
+        use_random = np.random.rand(len(states)) <= agent._session_epsilon
+        use_random &= ~np.repeat([request.no_random for request in requests], counts)
+
+        actions = np.empty(len(states), dtype=np.int64)
+        for idx in np.flatnonzero(use_random):
+            actions[idx] = agent.predict_random(states[idx])
+        if not np.all(use_random):
+            predicted = np.flatnonzero(~use_random)
+            actions[predicted] = agent.predict_batch(np.stack([states[idx] for idx in predicted]))
+
+        results = np.split(actions, np.cumsum(counts)[:-1])
+        return [result if request.batch else int(result[0]) for request, result in zip(requests, results)]
 
+    @staticmethod
+    def _process_execute(
+        child_pipe: Pipe,
+        *args,
+        network_type: NetworkTypes = None,
+        frame_ring: FrameRing = None,
+        actor_pipes: List[Connection] = None,
+        **kwargs,
+    ):
+        tracer.configure(trace_config, process_name="keras")
         last_update = time.time()
         AGENT = network_factory(network_type=network_type)
         AGENT.load()
+        # Training happens on its own thread, this one only serves predictions and hands over episodes.
+        LEARNER = Learner(agent=AGENT, config=learner_config)
+        LEARNER.start()
+        # The runner waits on this before starting the actors.
+        KerasProcess._signal_ready(child_pipe)
+
+        batch_sizes = Histogram.linear(1, inference_config.max_batch_size, inference_config.max_batch_size)
+        batch_latencies_ms = Histogram.exponential(0.5, 2, 12)
+
+        # Actors send their prediction requests over their own pipes, the child pipe carries everything else
+        # from the runner. Prediction requests are still answered on whichever pipe they arrive on.
+        connections = [child_pipe] + list(actor_pipes or [])
 
         while True:
-            if not child_pipe.poll():
-                time.sleep(0.01)
-                continue
-
-            request = child_pipe.recv()
-
-            if isinstance(request, PredictionRequest):
-
-                if np.random.rand() <= AGENT._session_epsilon or request.no_random:
-                    result = AGENT.predict_random(request.data)
-                else:
-                    result = AGENT.predict(request.data)
-
-                child_pipe.send(PredictionResult(result=result))
-
-            elif isinstance(request, EpisodeResult):
-                for item in request.game_data:
-                    AGENT.memory.append(item)
-                    if len(AGENT.memory) > AGENT.config.observe_frames_before_learning:
-                        AGENT.fit_batch()
-                        # logger.debug("[KerasProcess] Fit Batch Complete", runtime=time.time()-start_time, batch_size=batch_size)
-                # Let the runner know that we're done and ready for another task.
-                child_pipe.send(True)
-            elif request is None:
-                AGENT.save()
-                # Shutdown request
-                if request is None:
+            ready = wait(connections, timeout=1)
+
+            start_time = time.time()
+            requests, messages = KerasProcess._collect_batch(connections, ready)
+            if requests:
+                with tracer.span("predict_batch", requests=[request.sequence for _, request in requests]):
+                    for _, request in requests:
+                        if request.slot is not None:
+                            request.data = frame_ring.read(request.slot, request.sequence)
+                    results = KerasProcess._predict_batch(AGENT, [request for _, request in requests])
+                    for (connection, request), result in zip(requests, results):
+                        connection.send(PredictionResult(result=result, sequence=request.sequence))
+
+                batch_sizes.add(len(requests))
+                batch_latencies_ms.add((time.time() - start_time) * 1000)
+
+            for connection, request in messages:
+                if isinstance(request, EpisodeResult):
+                    with tracer.span("add_episode", episode=request.game_data.episode_number):
+                        LEARNER.add_episode(request)
+                elif isinstance(request, WeightsRequest):
+                    # From an actor doing its own inference, see ACTOR_CONFIG.LocalInference.
+                    update = AGENT.weights_update(request.version)
+                    update.sequence = request.sequence
+                    connection.send(update)
+                elif request is None:
+                    LEARNER.stop()
+                    AGENT.save(wait=True)
+                    AGENT.save_snapshot()
+                    tracer.dump()
+                    # Shutdown request
                     return
 
+            if not LEARNER.is_alive():
+                tracer.dump()
+                raise Exception("Learner thread died.")
+
             if (time.time() - last_update) / 60 > 5:
                 # Only print updates and save every 5 minutes
                 last_update = time.time()
-                logger.debug("KERAS PROCESS UPDATE", epsilon=AGENT._session_epsilon, memory_len=len(AGENT.memory))
+                logger.debug(
+                    "KERAS PROCESS UPDATE",
+                    epsilon=AGENT._session_epsilon,
+                    memory_len=len(AGENT.memory),
+                    fit_steps=LEARNER.fit_steps,
+                    transitions_added=LEARNER.transitions_added,
+                    batch_sizes=batch_sizes.summary(),
+                    batch_latencies_ms=batch_latencies_ms.summary(),
+                )
+                batch_sizes.reset()
+                batch_latencies_ms.reset()
                 # logger.debug("Stats", loss=np.mean(AGENT.loss_history), acc=np.mean(AGENT.acc_history))
-                AGENT.save()
+                LEARNER.save()
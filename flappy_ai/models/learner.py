@@ -0,0 +1,103 @@
+import threading
+
+import attr
+import numpy as np
+from structlog import get_logger
+
+from flappy_ai.models.episode_result import EpisodeResult
+from flappy_ai.models.learner_config import LearnerConfig
+from flappy_ai.models.networks.abstract_network import AbstractNetwork
+from flappy_ai.models.tracer import tracer
+
+logger = get_logger(__name__)
+
+
+@attr.s(auto_attribs=True)
+class Learner:
+    """
+    Trains the agent on a background thread so predictions keep being served while it learns.
+    Episodes are added to the memory as they arrive and the thread keeps fitting batches until it is
+    `replay_ratio` batches per transition ahead, then waits for more transitions.
+    Predictions use a separate copy of the weights which is refreshed every `sync_weights_every` batches.
+    """
+
+    agent: AbstractNetwork
+    config: LearnerConfig
+
+    fit_steps: int = attr.ib(init=False, default=0)
+    transitions_added: int = attr.ib(init=False, default=0)
+    # Frames already in the memory before the first episode was added, from a reopened or restored memory.
+    _memory_at_start: int = attr.ib(init=False, default=0)
+
+    _thread: threading.Thread = attr.ib(init=False, default=None)
+    _stop: threading.Event = attr.ib(init=False, default=attr.Factory(threading.Event))
+    # Notified when transitions are added or the learner is stopped.
+    _condition: threading.Condition = attr.ib(init=False, default=attr.Factory(threading.Condition))
+    # Held while fitting so a save never sees half updated weights.
+    _train_lock: threading.Lock = attr.ib(init=False, default=attr.Factory(threading.Lock))
+
+    def start(self):
+        self._memory_at_start = len(self.agent.memory)
+        self._thread = threading.Thread(target=self._run, name="learner", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        with self._condition:
+            self._stop.set()
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+
+    def is_alive(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def add_episode(self, episode: EpisodeResult):
+        """
+        Adds the whole episode to the memory in one go, so the learner thread only holds up the caller once.
+        """
+        items = list(episode.game_data)
+        if not items:
+            return
+        memory = self.agent.memory
+        memory.extend(
+            np.stack([item.state[..., -1] for item in items]),
+            # Actions arrive one hot encoded.
+            np.array([np.argmax(item.action) for item in items], dtype=np.int8),
+            np.array([item.reward for item in items], dtype=np.float32),
+            np.array([item.is_terminal for item in items], dtype=bool),
+            earlier_frames=np.moveaxis(items[0].state[..., -memory.history_length : -1], -1, 0),
+        )
+        with self._condition:
+            self.transitions_added += len(items)
+            self._condition.notify_all()
+
+    def save(self):
+        with self._train_lock:
+            self.agent.save()
+
+    def _steps_owed(self) -> int:
+        # Nothing is trained on until the memory holds enough frames to observe. Counted from the transitions
+        # and not the memory length, which stops growing once the memory is full.
+        observing = max(self.agent.config.observe_frames_before_learning - self._memory_at_start, 0)
+        return int((self.transitions_added - observing) * self.config.replay_ratio) - self.fit_steps
+
+    def _run(self):
+        while not self._stop.is_set():
+            with self._condition:
+                # Wait for the actors to add more transitions.
+                while self._steps_owed() <= 0 and not self._stop.is_set():
+                    self._condition.wait()
+            if self._stop.is_set():
+                break
+
+            with self._train_lock, tracer.span("fit_batch", step=self.fit_steps):
+                self.agent.fit_batch()
+            self.fit_steps += 1
+
+            if self.fit_steps % self.config.sync_weights_every == 0:
+                with tracer.span("sync_weights"):
+                    self.agent.sync_inference_weights()
+
+        # Whatever was learned since the last sync should not be lost to the predictions.
+        self.agent.sync_inference_weights()
+        logger.debug("Learner stopped.", fit_steps=self.fit_steps, transitions_added=self.transitions_added)
@@ -0,0 +1,9 @@
+import attr
+
+
+@attr.s(auto_attribs=True)
+class LearnerConfig:
+    # Batches trained on for every transition added to the memory.
+    replay_ratio: float
+    # How many batches are trained on before the weights used for predictions are refreshed.
+    sync_weights_every: int
@@ -0,0 +1,86 @@
+import json
+import os
+from pathlib import Path
+from typing import Tuple
+
+import attr
+import numpy as np
+from structlog import get_logger
+
+from flappy_ai.models.game_history import GameHistory
+from flappy_ai.models.memory_item import MemoryItem
+
+logger = get_logger(__name__)
+
+
+@attr.s(auto_attribs=True)
+class MemmapGameHistory(GameHistory):
+    """
+    GameHistory stored in numpy.memmap files under `location`.
+    The OS page cache keeps the recently used parts resident, so the memory can be a lot larger than RAM.
+    If the files already exist with the same layout they are reopened and the memory carries on where it left off.
+    """
+
+    location: str = attr.ib(default="data/replay")
+
+    # cursor and count, kept on disk so a reopened memory knows where it stopped.
+    _meta: np.array = attr.ib(init=False, default=None)
+    _reopened: bool = attr.ib(init=False, default=False)
+
+    def __attrs_post_init__(self):
+        Path(self.location).mkdir(parents=True, exist_ok=True)
+        self._reopened = self._layout_matches()
+        if not self._reopened:
+            # layout.json says the files are complete, a stale one must not outlive a crash while they are rewritten.
+            try:
+                os.remove(self._layout_path())
+            except FileNotFoundError:
+                pass
+
+        super().__attrs_post_init__()
+        self._meta = self._allocate("meta", (2,), np.int64)
+        if self._reopened:
+            self._cursor, self._count = (int(x) for x in self._meta)
+            self.reset_priorities()
+            logger.debug("Reopened replay memory.", location=self.location, memory_len=self._count)
+        else:
+            # Only written once every file exists.
+            with open(f"{self._layout_path()}.tmp", "w") as file:
+                file.write(json.dumps(self._layout()))
+            os.replace(f"{self._layout_path()}.tmp", self._layout_path())
+
+    def _layout(self) -> dict:
+        return {"size": self.size, "frame_shape": list(self.frame_shape), "history_length": self.history_length}
+
+    def _layout_path(self) -> str:
+        return os.path.join(self.location, "layout.json")
+
+    def _layout_matches(self) -> bool:
+        try:
+            with open(self._layout_path(), "r") as file:
+                return json.loads(file.read()) == self._layout()
+        except (FileNotFoundError, ValueError):
+            return False
+
+    def _allocate(self, name: str, shape: Tuple[int, ...], dtype) -> np.array:
+        mode = "r+" if self._reopened else "w+"
+        return np.memmap(os.path.join(self.location, f"{name}.dat"), dtype=dtype, mode=mode, shape=shape)
+
+    def _append(self, memory: MemoryItem):
+        super()._append(memory)
+        self._meta[0] = self._cursor
+        self._meta[1] = self._count
+
+    def _extend(self, frames: np.array, actions: np.array, rewards: np.array, terminals: np.array):
+        super()._extend(frames, actions, rewards, terminals)
+        self._meta[0] = self._cursor
+        self._meta[1] = self._count
+
+    def restore(self, directory: str):
+        super().restore(directory)
+        self._meta[0] = self._cursor
+        self._meta[1] = self._count
+
+    def flush(self):
+        for array in (self._frames, self._actions, self._rewards, self._terminals, self._meta):
+            array.flush()
@@ -1,5 +1,7 @@
 import attr
 
+from flappy_ai.types.memory_types import MemoryTypes
+
 
 @attr.s(auto_attribs=True)
 class DQNConfig:
@@ -12,3 +14,19 @@ class DQNConfig:
     memory_size: int
     batch_size: int
     save_location: str
+    memory_type: MemoryTypes = attr.ib(default=MemoryTypes.RAM)
+    # Where the memmap backed memory keeps its files.
+    memory_location: str = attr.ib(default="data/replay")
+    prioritized_replay: bool = attr.ib(default=False)
+    priority_alpha: float = attr.ib(default=0.6)
+    priority_beta: float = attr.ib(default=0.4)
+    priority_beta_anneal_steps: int = attr.ib(default=100000)
+    # Computes the targets and applies the gradients in one compiled graph call instead of predict then fit.
+    compiled_train_step: bool = attr.ib(default=True)
+    # Weight snapshots are written here in the background, the newest checkpoints_to_keep are kept.
+    checkpoint_location: str = attr.ib(default="saved_models/checkpoints")
+    checkpoints_to_keep: int = attr.ib(default=5)
+    # Full trainer state including the replay memory, written on shutdown and read back on start.
+    snapshot_location: str = attr.ib(default="saved_models/snapshot")
+    # Replay entries per compressed chunk, restoring needs about this many entries of extra memory.
+    snapshot_chunk_size: int = attr.ib(default=2048)
@@ -9,6 +9,10 @@ class AbstractNetwork(metaclass=ABCMeta):
     def predict(self, state: any) -> int:
         raise NotImplementedError()
 
+    @abstractmethod
+    def predict_batch(self, states: any) -> any:
+        raise NotImplementedError()
+
     @abstractmethod
     def predict_random(self, state: any) -> int:
         raise NotImplementedError()
@@ -17,10 +21,22 @@ class AbstractNetwork(metaclass=ABCMeta):
     def fit_batch(self):
         raise NotImplementedError()
 
+    @abstractmethod
+    def sync_inference_weights(self):
+        raise NotImplementedError()
+
+    @abstractmethod
+    def weights_update(self, version: int) -> any:
+        raise NotImplementedError()
+
     @abstractmethod
     def load(self):
         raise NotImplementedError()
 
     @abstractmethod
-    def save(self):
+    def save(self, wait: bool = False):
+        raise NotImplementedError()
+
+    @abstractmethod
+    def save_snapshot(self):
         raise NotImplementedError()
@@ -1,25 +1,48 @@
 import random
+import threading
+import zipfile
 from typing import List, Tuple
-from flappy_ai import Session
 
 import attr
+import keras.backend as K
 import numpy as np
 import tensorflow as tf
 from keras.layers import (BatchNormalization, Conv2D, Dense, Flatten, Input,
                           Lambda)
-from keras.models import Sequential
+from keras.models import Sequential, clone_model
 from keras.optimizers import RMSprop
 from structlog import get_logger
 
-from flappy_ai.models.sql_models.fit_data import FitData
+from flappy_ai import Session
+from flappy_ai.config import results_writer_config
+from flappy_ai.factories.memory_factory import memory_factory
+from flappy_ai.models.checkpointer import Checkpointer
 from flappy_ai.models.game_history import GameHistory
 from flappy_ai.models.network_configs.dqn_config import DQNConfig
 from flappy_ai.models.networks.abstract_network import AbstractNetwork
+from flappy_ai.models.results_writer import ResultsWriter
+from flappy_ai.models.sample_batch import SampleBatch
+from flappy_ai.models.sql_models.fit_data import FitData
+from flappy_ai.models.tracer import tracer
+from flappy_ai.models.trainer_snapshot import TrainerSnapshot
+from flappy_ai.models.weights_update import WeightsUpdate
 
 logger = get_logger(__name__)
-config = tf.ConfigProto()
-config.gpu_options.allow_growth = True
-session = tf.Session(config=config)
+session = None
+
+
+def _create_session():
+    """
+    Gives keras a session that only takes GPU memory as it needs it.
+    Created when the first network is built instead of on import.
+    """
+    global session
+    if session is not None:
+        return
+    config = tf.ConfigProto()
+    config.gpu_options.allow_growth = True
+    session = tf.Session(config=config)
+    K.set_session(session)
 
 
 @attr.s(auto_attribs=True)
@@ -32,14 +55,75 @@ class DQNNetwork(AbstractNetwork):
 
     memory: GameHistory = attr.ib(default=None, init=False)
     model: any = attr.ib(default=None, init=False)
+    # Batches trained on over every run, carried over through the checkpoints.
+    steps: int = attr.ib(default=0, init=False)
 
     _session_epsilon: float = attr.ib(default=None, init=False)
+    # Predictions are served from a double buffered copy of the model so training can carry on in another thread.
+    # New weights are written to the idle copy which then becomes the active one.
+    _inference_models: List[any] = attr.ib(default=None, init=False)
+    _inference_locks: List[threading.Lock] = attr.ib(default=None, init=False)
+    _active_inference: int = attr.ib(default=0, init=False)
+    # Goes up every time the inference weights change, actors doing their own inference compare against it.
+    _inference_version: int = attr.ib(default=0, init=False)
+    _train_function: any = attr.ib(default=None, init=False)
+    _results_writer: ResultsWriter = attr.ib(default=None, init=False)
+    _checkpointer: Checkpointer = attr.ib(default=None, init=False)
 
     def __attrs_post_init__(self):
-        self.memory = GameHistory(size=self.config.memory_size)
+        _create_session()
+        self.memory = memory_factory(
+            config=self.config, frame_shape=self.data_shape[:2], history_length=self.data_shape[2]
+        )
         self.model = self._build_model()
+        # Keras builds these lazily, which is not safe once more than one thread uses the model.
+        if self.config.compiled_train_step:
+            self._train_function = self._build_train_function()
+        else:
+            self.model._make_train_function()
+        self.model._make_predict_function()
+        self._inference_models = [self._build_inference_model() for _ in range(2)]
+        self._inference_locks = [threading.Lock() for _ in range(2)]
 
         self._session_epsilon = self.config.start_epsilon
+        self._results_writer = ResultsWriter(
+            flush_rows=results_writer_config.flush_rows, flush_seconds=results_writer_config.flush_seconds
+        ).start()
+        self._checkpointer = Checkpointer(
+            directory=self.config.checkpoint_location, keep=self.config.checkpoints_to_keep
+        ).start()
+
+    def _build_inference_model(self):
+        model = clone_model(self.model)
+        model.set_weights(self.model.get_weights())
+        model._make_predict_function()
+        return model
+
+    def sync_inference_weights(self):
+        """
+        Copies the trained weights into the idle inference model and makes it the one predictions use.
+        """
+        idle = 1 - self._active_inference
+        with self._inference_locks[idle]:
+            self._inference_models[idle].set_weights(self.model.get_weights())
+        self._active_inference = idle
+        self._inference_version += 1
+
+    def weights_update(self, version: int) -> WeightsUpdate:
+        """
+        The weights predictions are currently made with, left out if they are still at `version`.
+        """
+        active = self._active_inference
+        with self._inference_locks[active]:
+            update = WeightsUpdate(version=self._inference_version, epsilon=self._session_epsilon)
+            if version != update.version:
+                update.weights = self._inference_models[active].get_weights()
+        return update
+
+    def _inference_predict(self, states: np.array) -> np.array:
+        active = self._active_inference
+        with self._inference_locks[active]:
+            return self._inference_models[active].predict(states, batch_size=len(states))
 
     def _build_model(self):
 
@@ -80,6 +164,93 @@ class DQNNetwork(AbstractNetwork):
 
         return model
 
+    def _predict_in_inference_mode(self, frames):
+        """
+        Runs frames through the layers of the model, sharing its weights, with batch norm always using
+        the moving statistics and leaving them alone, the same as predict.
+        """
+        x = frames
+        for layer in self.model.layers:
+            x = layer(x, training=False) if isinstance(layer, BatchNormalization) else layer(x)
+        return x
+
+    def _build_train_function(self):
+        """
+        Builds a single graph call that takes a raw batch out of the memory, works out the Q targets,
+        and applies the optimizer to the loss of the actions that were taken.
+        Returns the loss and the TD errors.
+        """
+        states = K.placeholder(shape=(None,) + self.data_shape, dtype="uint8", name="states")
+        actions = K.placeholder(shape=(None,), dtype="int64", name="actions")
+        rewards = K.placeholder(shape=(None,), dtype="float32", name="rewards")
+        next_states = K.placeholder(shape=(None,) + self.data_shape, dtype="uint8", name="next_states")
+        is_terminal = K.placeholder(shape=(None,), dtype="bool", name="is_terminal")
+        weights = K.placeholder(shape=(None,), dtype="float32", name="weights")
+
+        # Only the start states run in training mode, so only they move the batch norm statistics.
+        # The next states use the moving statistics, like the keras path and the actors do.
+        frames = K.cast(states, "float32")
+        start_Q_values = self.model(frames)
+        # The targets are constants as far as the gradients go.
+        next_Q_values = K.stop_gradient(self._predict_in_inference_mode(K.cast(next_states, "float32")))
+
+        # The Q values of the terminal states is 0 by definition.
+        not_terminal = 1.0 - K.cast(is_terminal, "float32")
+        Q_values = rewards + self.config.gamma * not_terminal * K.max(next_Q_values, axis=1)
+        taken_Q_values = K.sum(start_Q_values * K.one_hot(actions, self.action_size), axis=1)
+        td_errors = Q_values - taken_Q_values
+        # Only the action that was taken adds to the loss. Dividing by the action count keeps it on the same scale
+        # as the mean squared error over every action the keras path fits against.
+        loss = K.mean(weights * K.square(td_errors)) / self.action_size
+
+        updates = self.model.optimizer.get_updates(loss=loss, params=self.model.trainable_weights)
+        # The batch norm moving averages.
+        updates += self.model.get_updates_for(frames)
+
+        inputs = [states, actions, rewards, next_states, is_terminal, weights]
+        if not isinstance(K.learning_phase(), int):
+            inputs.append(K.learning_phase())
+        return K.function(inputs=inputs, outputs=[loss, td_errors], updates=updates)
+
+    def _train_step(self, batch: SampleBatch) -> (float, None, np.array):
+        weights = batch.weights if batch.weights is not None else np.ones(len(batch), dtype=np.float32)
+        inputs = [batch.states, batch.actions, batch.rewards, batch.next_states, batch.is_terminal, weights]
+        if not isinstance(K.learning_phase(), int):
+            # Training mode.
+            inputs.append(1)
+        loss, td_errors = self._train_function(inputs)
+        # There is no accuracy in regressing Q values, so none is worked out.
+        return float(loss), None, td_errors
+
+    def _train_step_keras(self, batch: SampleBatch) -> (float, float, np.array):
+        # Predict the Q values of the start and next states in a single call.
+        predicted_Q_values = self.model.predict(
+            np.concatenate([batch.states, batch.next_states]), batch_size=2 * len(batch)
+        )
+        start_Q_values, next_Q_values = np.split(predicted_Q_values, 2)
+        # The Q values of the terminal states is 0 by definition, so override them
+        next_Q_values[batch.is_terminal] = 0
+        # The Q values of each start state is the reward + gamma * the max next state Q value
+        Q_values = batch.rewards + self.config.gamma * np.max(next_Q_values, axis=1)
+        # Only the action that was taken gets a new target, the others keep their current prediction
+        # so they do not add to the loss.
+        rows = np.arange(len(batch))
+        td_errors = Q_values - start_Q_values[rows, batch.actions]
+        targets = start_Q_values
+        targets[rows, batch.actions] = Q_values
+        # tensorboard = TensorBoard(log_dir=f"logs/")
+        history = self.model.fit(
+            x=batch.states,
+            y=targets,
+            # Importance sampling weights from the prioritized memory, None when sampling uniformly.
+            sample_weight=batch.weights,
+            # epochs=1, batch_size=len(start_states), verbose=0, callbacks=[tensorboard]
+            epochs=1,
+            batch_size=len(batch),
+            verbose=0,
+        )
+        return history.history["loss"][0], history.history["acc"][0], td_errors
+
     def predict(self, state) -> int:
         """
         Note for later, predict expects and returns an array of items.
@@ -90,10 +261,18 @@ class DQNNetwork(AbstractNetwork):
         np.expand_dims(state, axis=0).shape
         (1, 159, 81, 1)
         """
-        act_values = self.model.predict(np.expand_dims(state, axis=0))
+        act_values = self._inference_predict(np.expand_dims(state, axis=0))
         # act_values -> array([[ -3.0126321, -11.75323  ]], dtype=float32)
         return np.argmax(act_values[0])
 
+    def predict_batch(self, states: np.array) -> np.array:
+        """
+        Same as predict but for a whole batch of states such as the ones VectorGame returns.
+        Returns the chosen action for every state in a single forward pass.
+        """
+        act_values = self._inference_predict(states)
+        return np.argmax(act_values, axis=1)
+
     def predict_random(self, state) -> int:
         return random.randrange(self.action_size)
 
@@ -105,7 +284,7 @@ class DQNNetwork(AbstractNetwork):
         - model: The DQN
         - gamma: Discount factor (should be 0.99)
         - start_states: numpy array of starting states
-        - actions: numpy array of one-hot encoded actions corresponding to the start states
+        - actions: numpy array of the action indices corresponding to the start states
         - rewards: numpy array of rewards corresponding to the start states and actions
         - next_states: numpy array of the resulting states corresponding to the start states and actions
         - is_terminal: numpy boolean array of whether the resulting state is terminal
@@ -114,32 +293,14 @@ class DQNNetwork(AbstractNetwork):
         plt.imshow(start_states[0][:,:,0], cmap=plt.cm.binary)
         though the colors will be fucked
         """
-        batch_items = self.memory.get_sample_batch(batch_size=self.config.batch_size)
+        batch = self.memory.get_sample_batch(batch_size=self.config.batch_size)
+        if self._train_function is not None:
+            loss, accuracy, td_errors = self._train_step(batch)
+        else:
+            loss, accuracy, td_errors = self._train_step_keras(batch)
+        self.memory.update_priorities(batch.indices, td_errors)
+        self.steps += 1
 
-        start_states = np.array([x.state for x in batch_items])
-        actions = np.array([x.action for x in batch_items])
-        rewards = np.array([x.reward for x in batch_items])
-        next_states = np.array([x.next_state for x in batch_items])
-        is_terminal = np.array([x.is_terminal for x in batch_items])
-        # start_states = np.array([x.merged_state for x in game_data][:-1])
-
-        # First, predict the Q values of the next states.
-        next_Q_values = self.model.predict(next_states)
-        # The Q values of the terminal states is 0 by definition, so override them
-        next_Q_values[is_terminal] = 0
-        # The Q values of each start state is the reward + gamma * the max next state Q value
-        Q_values = rewards + self.config.gamma * np.max(next_Q_values, axis=1)
-        # Fit the keras model. Note how we are passing the actions as the mask and multiplying
-        # the targets by the actions.
-        # tensorboard = TensorBoard(log_dir=f"logs/")
-        history = self.model.fit(
-            x=start_states,
-            y=actions * Q_values[:, None],
-            # epochs=1, batch_size=len(start_states), verbose=0, callbacks=[tensorboard]
-            epochs=1,
-            batch_size=len(start_states),
-            verbose=0,
-        )
         # Annealing linearly
         # we want to reduce e over a set number of frames
         # just check that we have the required observation frames before doing so
@@ -151,29 +312,91 @@ class DQNNetwork(AbstractNetwork):
                 self.config.start_epsilon - self.config.epsilon_min
             ) / self.config.anneal_epsilon_over_x_frames
 
+        self._results_writer.write(FitData(epsilon=self._session_epsilon, loss=loss, accuracy=accuracy))
 
-        session = Session()
-        session.add(
-            FitData(
-                epsilon=self._session_epsilon,
-                loss=history.history["loss"][0],
-                accuracy=history.history["acc"][0]
-            )
+    def _load_snapshot(self) -> bool:
+        # A memory mapped memory that was reopened already holds the replay.
+        memory = None if len(self.memory) else self.memory
+        try:
+            snapshot = TrainerSnapshot.read(self.config.snapshot_location, memory)
+            if snapshot is None:
+                return False
+            self.model.set_weights(snapshot.weights)
+            self.model.optimizer.set_weights(snapshot.optimizer_weights)
+        except (OSError, ValueError, KeyError, zipfile.BadZipFile) as e:
+            logger.warn("Unable to load trainer snapshot.", location=self.config.snapshot_location, error=str(e))
+            if memory is not None:
+                # Start over from an empty memory rather than half a restored one.
+                self.memory = memory_factory(
+                    config=self.config, frame_shape=self.data_shape[:2], history_length=self.data_shape[2]
+                )
+            return False
+        self.steps = snapshot.step
+        self._session_epsilon = snapshot.epsilon
+        logger.debug(
+            "Loaded trainer snapshot", step=self.steps, epsilon=self._session_epsilon, memory_len=len(self.memory)
         )
-        session.commit()
+        return True
+
+    def _load_checkpoint(self, after_step: int = -1) -> bool:
+        checkpoint = self._checkpointer.latest()
+        if checkpoint is None or checkpoint.step <= after_step:
+            return False
+        try:
+            self.model.set_weights(checkpoint.weights)
+        except ValueError as e:
+            # Most likely saved from a different model layout.
+            logger.warn("Checkpoint does not fit the model.", path=checkpoint.path, error=str(e))
+            return False
+        self.steps = checkpoint.step
+        self._session_epsilon = checkpoint.epsilon
+        logger.debug("Loaded checkpoint", path=checkpoint.path, step=self.steps, epsilon=self._session_epsilon)
+        return True
 
     def load(self):
-        session = Session()
-        result = session.query(FitData).order_by(FitData.id.desc()).first()
-        if result:
-            self._session_epsilon = result.epsilon
-            logger.debug("Loaded Epsilon Data", epsilon=self._session_epsilon)
+        restored = self._load_snapshot()
+        # Checkpoints carry on being written after the snapshot, a newer one has fresher weights.
+        loaded = self._load_checkpoint(after_step=self.steps if restored else -1)
+        # Runs from before the checkpoints only have the HDF5 weights and the epsilon in the fit data.
+        if not restored and not loaded:
+            session = Session()
+            result = session.query(FitData).order_by(FitData.id.desc()).first()
+            if result:
+                self._session_epsilon = result.epsilon
+                logger.debug("Loaded Epsilon Data", epsilon=self._session_epsilon)
 
-        try:
-            self.model.load_weights(self.config.save_location)
-        except OSError as e:
-            logger.warn("Unable to load saved weights.")
+            try:
+                self.model.load_weights(self.config.save_location)
+            except OSError as e:
+                logger.warn("Unable to load saved weights.")
+        for _ in self._inference_models:
+            self.sync_inference_weights()
         #self._session_epsilon = self.fit_history[-1].epsilon
 
-    def save(self):
-        self.model.save_weights(self.config.save_location)
+    def save(self, wait: bool = False):
+        """
+        Snapshots the weights and leaves writing them to the checkpointer's thread, so training and
+        predictions only wait on the copy.
+        With `wait` set it only returns once they are on disk, along with the memory and the results,
+        for when the process is about to exit. Otherwise the OS writes the memory mapped memory back
+        on its own and the results writer flushes on its own thread.
+        """
+        with tracer.span("checkpoint_snapshot", step=self.steps):
+            self._checkpointer.save(weights=self.model.get_weights(), step=self.steps, epsilon=self._session_epsilon)
+        if wait:
+            self.memory.flush()
+            self._results_writer.flush()
+            self._checkpointer.flush()
+
+    def save_snapshot(self):
+        """
+        Writes a TrainerSnapshot so a restart picks up with the same memory and optimizer state.
+        Appending to the memory waits while it is written, so this is only done on the way out.
+        """
+        with tracer.span("trainer_snapshot", step=self.steps):
+            TrainerSnapshot(
+                step=self.steps,
+                epsilon=self._session_epsilon,
+                weights=self.model.get_weights(),
+                optimizer_weights=self.model.optimizer.get_weights(),
+            ).write(self.config.snapshot_location, self.memory, chunk_size=self.config.snapshot_chunk_size)
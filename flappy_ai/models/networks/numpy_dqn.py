@@ -0,0 +1,100 @@
+from typing import List
+
+import attr
+import numpy as np
+from numpy.lib.stride_tricks import as_strided
+
+from flappy_ai.models.weights_update import WeightsUpdate
+
+# Keras' default, the model does not set its own.
+BATCH_NORM_EPSILON = 1e-3
+# The strides of the two conv layers DQNNetwork._build_model stacks.
+CONV_STRIDES = (4, 2)
+
+
+def _conv2d(x: np.array, kernel: np.array, bias: np.array, stride: int) -> np.array:
+    """
+    A channels last "valid" convolution, every window is gathered with a strided view and multiplied
+    by the kernel in a single tensordot.
+    """
+    batch, height, width, channels = x.shape
+    kernel_height, kernel_width = kernel.shape[:2]
+    out_height = (height - kernel_height) // stride + 1
+    out_width = (width - kernel_width) // stride + 1
+    batch_stride, row_stride, column_stride = x.strides[:3]
+    windows = as_strided(
+        x,
+        shape=(batch, out_height, out_width, kernel_height, kernel_width, channels),
+        strides=(batch_stride, row_stride * stride, column_stride * stride) + x.strides[1:],
+        writeable=False,
+    )
+    return np.tensordot(windows, kernel, axes=3) + bias
+
+
+@attr.s(auto_attribs=True)
+class NumpyDQN:
+    """
+    The forward pass of the model DQNNetwork trains, done with NumPy on the CPU so an actor can pick its
+    own actions instead of asking the keras process for every one.
+    Takes the weights in the order model.get_weights() returns them, which are sent over in WeightsUpdates.
+    Has to be kept in step with DQNNetwork._build_model.
+    """
+
+    action_size: int = attr.ib(default=2)
+    # Every actor is forked with the same global NumPy random state, each needs its own to explore differently.
+    seed: int = attr.ib(default=None)
+
+    # Version of the weights in use, -1 until the first update.
+    version: int = attr.ib(init=False, default=-1)
+    epsilon: float = attr.ib(init=False, default=1.0)
+    _weights: List[np.array] = attr.ib(init=False, default=None)
+    _random_state: np.random.RandomState = attr.ib(init=False, default=None)
+
+    def __attrs_post_init__(self):
+        self._random_state = np.random.RandomState(self.seed)
+
+    def update(self, update: WeightsUpdate):
+        self.epsilon = update.epsilon
+        if update.weights is None or update.version <= self.version:
+            return
+        if len(update.weights) != 12:
+            raise ValueError(f"Expected the 12 weights of DQNNetwork's model, got {len(update.weights)}.")
+        gamma, beta, moving_mean, moving_variance = update.weights[:4]
+        # The batch norm folds into a single scale and shift.
+        scale = gamma / np.sqrt(moving_variance + BATCH_NORM_EPSILON)
+        shift = beta - moving_mean * scale
+        self._weights = [scale.astype(np.float32), shift.astype(np.float32)] + [
+            np.asarray(weight, dtype=np.float32) for weight in update.weights[4:]
+        ]
+        self.version = update.version
+
+    def q_values(self, states: np.array) -> np.array:
+        if self._weights is None:
+            raise ValueError("No weights have been loaded yet.")
+        scale, shift, conv1_kernel, conv1_bias, conv2_kernel, conv2_bias, *dense = self._weights
+        x = states.astype(np.float32) * scale + shift
+        x = np.maximum(_conv2d(x, conv1_kernel, conv1_bias, CONV_STRIDES[0]), 0)
+        x = np.maximum(_conv2d(x, conv2_kernel, conv2_bias, CONV_STRIDES[1]), 0)
+        dense1_kernel, dense1_bias, dense2_kernel, dense2_bias = dense
+        x = np.maximum(x.reshape(len(x), -1) @ dense1_kernel + dense1_bias, 0)
+        return x @ dense2_kernel + dense2_bias
+
+    def predict(self, state: np.array) -> int:
+        return int(np.argmax(self.q_values(state[np.newaxis])[0]))
+
+    def act(self, state: np.array) -> int:
+        """
+        Epsilon greedy, the same choice the keras process makes for a prediction request.
+        """
+        if self._random_state.rand() <= self.epsilon:
+            return self._random_state.randint(self.action_size)
+        return self.predict(state)
+
+    def act_batch(self, states: np.array) -> np.array:
+        """
+        act for a whole batch of states, such as the ones VectorGame returns, in a single forward pass.
+        """
+        actions = np.argmax(self.q_values(states), axis=1)
+        use_random = self._random_state.rand(len(states)) <= self.epsilon
+        actions[use_random] = self._random_state.randint(self.action_size, size=int(np.count_nonzero(use_random)))
+        return actions
@@ -5,5 +5,10 @@ import attr
 
 @attr.s(auto_attribs=True)
 class PredictionRequest:
-    data: any
+    # The state itself, left empty when it was written to a FrameRing slot instead.
+    data: any = attr.ib(default=None)
     no_random: bool = attr.ib(default=False)
+    # data holds a batch of states, such as the ones VectorGame returns, and gets an action for each of them.
+    batch: bool = attr.ib(default=False)
+    slot: int = attr.ib(default=None)
+    sequence: int = attr.ib(default=None)
@@ -5,4 +5,7 @@ import attr
 
 @attr.s(auto_attribs=True)
 class PredictionResult:
+    # An array of actions when the request was a batch.
     result: int
+    # Echoes the sequence number of the request it answers.
+    sequence: int = attr.ib(default=None)
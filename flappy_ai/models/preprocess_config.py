@@ -0,0 +1,17 @@
+import attr
+
+
+@attr.s(auto_attribs=True)
+class PreprocessConfig:
+    # Screenshots are decoded at 1 / scale of their size, one of 1, 2, 4 or 8.
+    scale: int
+    # Pixels cut off each side of the decoded screenshot before it is resized.
+    crop_top: int
+    crop_bottom: int
+    crop_left: int
+    crop_right: int
+    # What the cropped screenshot is resized to, has to match the shape the network expects.
+    output_height: int
+    output_width: int
+    # Pixels brighter than this become 255 and the rest 0, 0 leaves the greyscale as is.
+    threshold: int
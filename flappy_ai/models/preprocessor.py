@@ -0,0 +1,106 @@
+import attr
+import cv2
+import numpy as np
+
+from flappy_ai.models.image import Image
+from flappy_ai.models.preprocess_config import PreprocessConfig
+from flappy_ai.models.stage_timer import stage_timer
+
+_COLOUR_FLAGS = {
+    1: cv2.IMREAD_COLOR,
+    2: cv2.IMREAD_REDUCED_COLOR_2,
+    4: cv2.IMREAD_REDUCED_COLOR_4,
+    8: cv2.IMREAD_REDUCED_COLOR_8,
+}
+
+
+@attr.s(auto_attribs=True)
+class Preprocessor:
+    """
+    Turns PNG screenshots into observations.
+    The screenshot is decoded at a reduced scale, cropped, area resized to the output shape, turned to
+    greyscale and optionally binarized. Everything after the decode is written into buffers allocated once
+    per process. The greyscale is the plain mean of the colour channels rounded down, as Image.as_greyscale
+    has always worked it out, so the pixel values the saved networks were trained on stay the same.
+
+    The returned frames live in a ring of `buffers` output buffers, so a frame is only valid until
+    `buffers` more frames have been processed. Copy it if it has to be kept for longer.
+    """
+
+    config: PreprocessConfig
+    buffers: int = attr.ib(default=8)
+
+    _greyscale: np.array = attr.ib(init=False, default=None)
+    _colour: np.array = attr.ib(init=False, default=None)
+    _hsv: np.array = attr.ib(init=False, default=None)
+    # Holds the resized colour screenshot before it is converted to RGB.
+    _bgr: np.array = attr.ib(init=False, default=None)
+    # The channels summed up on the way to their mean.
+    _channel_sum: np.array = attr.ib(init=False, default=None)
+    _position: int = attr.ib(init=False, default=0)
+
+    def __attrs_post_init__(self):
+        if self.config.scale not in _COLOUR_FLAGS:
+            raise ValueError(f"Screenshots can only be decoded at 1 / {list(_COLOUR_FLAGS)} of their size.")
+        shape = (self.config.output_height, self.config.output_width)
+        self._greyscale = np.empty((self.buffers,) + shape, dtype=np.uint8)
+        self._colour = np.empty((self.buffers,) + shape + (3,), dtype=np.uint8)
+        self._hsv = np.empty((self.buffers,) + shape + (3,), dtype=np.uint8)
+        self._bgr = np.empty(shape + (3,), dtype=np.uint8)
+        self._channel_sum = np.empty(shape, dtype=np.uint16)
+
+    def _next_position(self) -> int:
+        self._position = (self._position + 1) % self.buffers
+        return self._position
+
+    def _crop(self, image: np.array) -> np.array:
+        # A view, nothing is copied.
+        height, width = image.shape[:2]
+        return image[
+            self.config.crop_top : height - self.config.crop_bottom,
+            self.config.crop_left : width - self.config.crop_right,
+        ]
+
+    def _resize(self, image: np.array, out: np.array):
+        if image.shape == out.shape:
+            np.copyto(out, image)
+        else:
+            cv2.resize(
+                image, (self.config.output_width, self.config.output_height), dst=out, interpolation=cv2.INTER_AREA
+            )
+
+    def _mean_greyscale(self, colour: np.array, out: np.array) -> np.array:
+        # The same as np.mean(colour, axis=2).astype(np.uint8), without the float64 copies.
+        np.sum(colour, axis=2, dtype=np.uint16, out=self._channel_sum)
+        return np.floor_divide(self._channel_sum, 3, out=out, casting="unsafe")
+
+    def _binarize(self, greyscale: np.array):
+        if self.config.threshold:
+            cv2.threshold(greyscale, self.config.threshold, 255, cv2.THRESH_BINARY, dst=greyscale)
+
+    def greyscale(self, png: bytes) -> np.array:
+        """
+        The observation alone, the colours are only kept until the greyscale is worked out.
+        """
+        with stage_timer.time("decode"):
+            image = cv2.imdecode(np.frombuffer(png, np.uint8), _COLOUR_FLAGS[self.config.scale])
+        with stage_timer.time("preprocess"):
+            out = self._greyscale[self._next_position()]
+            self._resize(self._crop(image), self._bgr)
+            self._mean_greyscale(self._bgr, out)
+            self._binarize(out)
+        return out
+
+    def colour(self, png: bytes) -> Image:
+        """
+        The observation along with the RGB screenshot it came from, for when colours are needed as well.
+        """
+        with stage_timer.time("decode"):
+            image = cv2.imdecode(np.frombuffer(png, np.uint8), _COLOUR_FLAGS[self.config.scale])
+        with stage_timer.time("preprocess"):
+            position = self._next_position()
+            self._resize(self._crop(image), self._bgr)
+            colour = cv2.cvtColor(self._bgr, cv2.COLOR_BGR2RGB, dst=self._colour[position])
+            greyscale = self._mean_greyscale(colour, self._greyscale[position])
+            self._binarize(greyscale)
+        return Image(colour, greyscale=greyscale, hsv_buffer=self._hsv[position])
@@ -1,15 +1,11 @@
 import atexit
-import time
+import os
 from multiprocessing import Pipe, Process
-from multiprocessing.connection import Pipe
+from multiprocessing.connection import Pipe, wait
 
 import attr
-import numpy as np
 
-from flappy_ai.models import (EpisodeResult, MemoryItem, PredictionRequest,
-                              PredictionResult)
-from flappy_ai.models.game import Game
-from flappy_ai.models.game_data import GameData
+from flappy_ai.models.process_ready import ProcessReady
 
 
 @attr.s(auto_attribs=True)
@@ -17,6 +13,8 @@ class ProcessBase:
     parent_pipe: Pipe = None  # data into the process
     child_pipe: Pipe = None  # data out from the process
     _child_process: int = None
+    # How long cleanup waits for the process to quit before killing it.
+    shutdown_timeout: float = 10
 
     def __attrs_post_init__(self):
         self.parent_pipe, self.child_pipe = Pipe()
@@ -37,6 +35,31 @@ class ProcessBase:
         self._child_process: Process = Process(target=self._process_execute, args=(self.child_pipe,), kwargs=kwargs)
         self._child_process.start()
 
+    @staticmethod
+    def _signal_ready(child_pipe: Pipe):
+        """
+        Called from inside the process once it has started up and can take work.
+        """
+        child_pipe.send(ProcessReady(pid=os.getpid()))
+
+    def wait_until_ready(self, timeout: float = None):
+        """
+        Blocks until the process says it is ready, raises if it exits or times out first.
+        """
+        if not wait([self.parent_pipe, self.sentinel()], timeout=timeout):
+            raise TimeoutError(f"{type(self).__name__} did not start within {timeout} seconds.")
+        if not self.parent_pipe.poll():
+            raise Exception(f"{type(self).__name__} exited before it was ready.")
+        message = self.parent_pipe.recv()
+        if not isinstance(message, ProcessReady):
+            raise Exception(f"{type(self).__name__} sent {message} before it was ready.")
+
+    def sentinel(self) -> int:
+        """
+        Becomes ready in multiprocessing.connection.wait once the process has exited.
+        """
+        return self._child_process.sentinel
+
     def has_started(self) -> bool:
         return self._child_process is not None and self._child_process.is_alive()
 
@@ -52,11 +75,6 @@ class ProcessBase:
         if self.parent_pipe:
             # Processes upon receving None should quit.
             self.parent_pipe.send(None)
-        timeout_sec = 10
-        p_sec = 0
-        for second in range(timeout_sec):
-            if self._child_process.is_alive():
-                time.sleep(1)
-            p_sec += 1
-            if p_sec >= timeout_sec:
-                self._child_process.kill()
+        self._child_process.join(self.shutdown_timeout)
+        if self._child_process.is_alive():
+            self._child_process.kill()
@@ -0,0 +1,10 @@
+import attr
+
+
+@attr.s(auto_attribs=True)
+class ProcessReady:
+    """
+    Sent up the pipe by a process once it has finished starting up and can take work.
+    """
+
+    pid: int
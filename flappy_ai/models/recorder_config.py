@@ -0,0 +1,10 @@
+import attr
+
+
+@attr.s(auto_attribs=True)
+class RecorderConfig:
+    enabled: bool
+    # Each actor records into its own directory under this one.
+    directory: str
+    # Frames gathered before a chunk is compressed and written.
+    chunk_frames: int
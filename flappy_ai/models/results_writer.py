@@ -1,7 +1,86 @@
+import atexit
+import queue
+import threading
+import time
+from typing import List
+
 import attr
+from structlog import get_logger
+
+from flappy_ai import Base, Session
+from flappy_ai.models.tracer import tracer
+
+logger = get_logger(__name__)
 
 
 @attr.s(auto_attribs=True)
 class ResultsWriter:
+    """
+    Writes rows to the database from a background thread so whoever produces them never waits on the disk.
+    Rows are queued in memory and saved with a single bulk insert once `flush_rows` of them are waiting
+    or the oldest has waited `flush_seconds`. Anything still queued is written when the writer is stopped,
+    which also happens when the process exits.
+    """
+
+    flush_rows: int = attr.ib(default=500)
+    flush_seconds: float = attr.ib(default=5.0)
+
+    _queue: queue.Queue = attr.ib(init=False, default=attr.Factory(queue.Queue))
+    _thread: threading.Thread = attr.ib(init=False, default=None)
+    _stop: threading.Event = attr.ib(init=False, default=attr.Factory(threading.Event))
+    # Only one flush at a time, whichever thread it is called from.
+    _flush_lock: threading.Lock = attr.ib(init=False, default=attr.Factory(threading.Lock))
+
+    def start(self) -> "ResultsWriter":
+        self._thread = threading.Thread(target=self._run, name="results_writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+        return self
+
+    def write(self, row: Base):
+        self._queue.put(row)
+
+    def flush(self):
+        """
+        Writes everything that has been queued so far, blocks until it is in the database.
+        """
+        with self._flush_lock:
+            rows: List[Base] = []
+            while True:
+                try:
+                    rows.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if not rows:
+                return
+            session = Session()
+            try:
+                with tracer.span("db_commit", rows=len(rows)):
+                    session.bulk_save_objects(rows)
+                    session.commit()
+            except Exception:
+                session.rollback()
+                logger.exception("Unable to write results.", rows=len(rows))
+            finally:
+                session.close()
+
+    def stop(self):
+        if self._stop.is_set():
+            return
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.flush()
+
+    def _run(self):
+        first_queued = None
+        while not self._stop.is_set():
+            queued = self._queue.qsize()
+            if queued and first_queued is None:
+                first_queued = time.time()
 
-    pass
\ No newline at end of file
+            if queued >= self.flush_rows or (first_queued and time.time() - first_queued >= self.flush_seconds):
+                self.flush()
+                first_queued = None
+            else:
+                self._stop.wait(0.1)
@@ -0,0 +1,9 @@
+import attr
+
+
+@attr.s(auto_attribs=True)
+class ResultsWriterConfig:
+    # Queued rows are written once there are this many of them...
+    flush_rows: int
+    # ...or once the oldest of them has waited this long.
+    flush_seconds: float
@@ -0,0 +1,114 @@
+import attr
+import numpy as np
+
+
+@attr.s(auto_attribs=True)
+class RollingSeries:
+    """
+    Summarises an ever growing series in a fixed number of buckets.
+    Every bucket keeps the count, sum, min and max of `bucket_width` consecutive points. Once every bucket is
+    in use neighbouring buckets are merged and the width doubles, so memory and plotting cost stay the same
+    no matter how many points have been added.
+    """
+
+    buckets: int = attr.ib(default=1024)
+
+    bucket_width: int = attr.ib(init=False, default=1)
+    _size: int = attr.ib(init=False, default=0)
+    # The x of the first point in each bucket.
+    _x: np.array = attr.ib(init=False, default=None)
+    _count: np.array = attr.ib(init=False, default=None)
+    _sum: np.array = attr.ib(init=False, default=None)
+    _min: np.array = attr.ib(init=False, default=None)
+    _max: np.array = attr.ib(init=False, default=None)
+
+    def __attrs_post_init__(self):
+        if self.buckets % 2:
+            raise ValueError("Buckets are merged in pairs so there has to be an even number of them.")
+        self._x = np.zeros(self.buckets, dtype=np.float64)
+        self._count = np.zeros(self.buckets, dtype=np.int64)
+        self._sum = np.zeros(self.buckets, dtype=np.float64)
+        self._min = np.zeros(self.buckets, dtype=np.float64)
+        self._max = np.zeros(self.buckets, dtype=np.float64)
+
+    def __len__(self):
+        return self._size
+
+    def _merge(self):
+        half = self.buckets // 2
+        self._x[:half] = self._x[0::2]
+        self._count[:half] = self._count[0::2] + self._count[1::2]
+        self._sum[:half] = self._sum[0::2] + self._sum[1::2]
+        self._min[:half] = np.minimum(self._min[0::2], self._min[1::2])
+        self._max[:half] = np.maximum(self._max[0::2], self._max[1::2])
+        self._size = half
+        self.bucket_width *= 2
+
+    def _add_to_last(self, x: np.array, y: np.array):
+        last = self._size - 1
+        self._count[last] += len(y)
+        self._sum[last] += y.sum()
+        self._min[last] = min(self._min[last], y.min())
+        self._max[last] = max(self._max[last], y.max())
+
+    def _add_buckets(self, x: np.array, y: np.array):
+        """
+        Adds whole buckets, the last one may be partly filled.
+        """
+        new = -(-len(y) // self.bucket_width)
+        padding = new * self.bucket_width - len(y)
+        # Padding with the last value leaves the min and max alone, the sum and count only take the real points.
+        y_padded = np.concatenate([y, np.full(padding, y[-1])]).reshape(new, self.bucket_width)
+        counts = np.full(new, self.bucket_width)
+        counts[-1] -= padding
+        sums = y_padded.sum(axis=1)
+        sums[-1] -= padding * y[-1]
+
+        buckets = slice(self._size, self._size + new)
+        self._x[buckets] = x[:: self.bucket_width]
+        self._count[buckets] = counts
+        self._sum[buckets] = sums
+        self._min[buckets] = y_padded.min(axis=1)
+        self._max[buckets] = y_padded.max(axis=1)
+        self._size += new
+
+    def extend(self, x: np.array, y: np.array):
+        x = np.asarray(x, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        # Missing values, such as a metric that was not recorded, are skipped.
+        keep = ~np.isnan(y)
+        x, y = x[keep], y[keep]
+
+        while len(y):
+            if self._size and self._count[self._size - 1] < self.bucket_width:
+                take = self.bucket_width - self._count[self._size - 1]
+                self._add_to_last(x[:take], y[:take])
+            else:
+                if self._size == self.buckets:
+                    self._merge()
+                    continue
+                take = (self.buckets - self._size) * self.bucket_width
+                self._add_buckets(x[:take], y[:take])
+            x, y = x[take:], y[take:]
+
+    def x(self) -> np.array:
+        return self._x[: self._size]
+
+    def mean(self) -> np.array:
+        return self._sum[: self._size] / np.maximum(self._count[: self._size], 1)
+
+    def min(self) -> np.array:
+        return self._min[: self._size]
+
+    def max(self) -> np.array:
+        return self._max[: self._size]
+
+    def moving_average(self, window: int) -> np.array:
+        """
+        The average of the points in the last `window` buckets at every bucket, weighted by how many points each holds.
+        """
+        sums = np.cumsum(self._sum[: self._size])
+        counts = np.cumsum(self._count[: self._size])
+        sums[window:] = sums[window:] - sums[:-window]
+        counts[window:] = counts[window:] - counts[:-window]
+        return sums / np.maximum(counts, 1)
@@ -0,0 +1,22 @@
+import attr
+import numpy as np
+
+
+@attr.s(auto_attribs=True)
+class SampleBatch:
+    """
+    A batch of transitions pulled out of the replay memory, ready to be fed to the network.
+    """
+
+    states: np.array  # uint8 (batch, 160, 120, 4)
+    actions: np.array  # Index of the action taken in each state.
+    rewards: np.array
+    next_states: np.array  # uint8 (batch, 160, 120, 4)
+    is_terminal: np.array
+    # Where each transition lives in the replay memory.
+    indices: np.array = attr.ib(default=None)
+    # Importance sampling weights, only set when the memory is prioritized.
+    weights: np.array = attr.ib(default=None)
+
+    def __len__(self):
+        return len(self.actions)
@@ -0,0 +1,158 @@
+import attr
+import numpy as np
+
+# All of the measurements below are in pixels of the (160, 120) greyscale observation,
+# velocities are in pixels per step.
+SCREEN_HEIGHT = 160
+SCREEN_WIDTH = 120
+GROUND_Y = 140
+
+BIRD_X = 30
+BIRD_WIDTH = 8
+BIRD_HEIGHT = 6
+BIRD_START_Y = 70.0
+GRAVITY = 1.0
+FLAP_VELOCITY = -5.0
+MAX_FALL_VELOCITY = 8.0
+
+PIPE_COUNT = 3
+PIPE_WIDTH = 16
+PIPE_GAP = 44
+PIPE_SPACING = 64
+PIPE_SPEED = 3
+PIPE_START_X = SCREEN_WIDTH + 20
+# Keeps the gap away from the top of the screen and the ground.
+PIPE_GAP_MARGIN = 16
+
+BACKGROUND_COLOUR = 200
+PIPE_COLOUR = 120
+GROUND_COLOUR = 90
+BIRD_COLOUR = 50
+
+
+def random_gap_y(random_state: np.random.RandomState, size=None):
+    """
+    The center of a pipe gap, picked so the whole gap sits between the top of the screen and the ground.
+    """
+    low = PIPE_GAP_MARGIN + PIPE_GAP // 2
+    high = GROUND_Y - PIPE_GAP_MARGIN - PIPE_GAP // 2
+    return random_state.randint(low, high + 1, size=size)
+
+
+@attr.s(auto_attribs=True)
+class SimulatedGame:
+    """
+    A headless Flappy Bird written in NumPy.
+    Has the same surface as Game so it can be swapped in wherever a game is needed, but renders the
+    observation straight into an array instead of screen-shotting a browser.
+    Given the same seed it will always play out the same way.
+    """
+
+    # Accepted so the game can be swapped with Game, there is never a window.
+    headless: bool = attr.ib(default=True)
+    seed: int = attr.ib(default=None)
+
+    _random_state: np.random.RandomState = attr.ib(init=False, default=None)
+    _game_over: bool = attr.ib(init=False, default=False)
+    _bird_y: float = attr.ib(init=False, default=BIRD_START_Y)
+    _bird_velocity: float = attr.ib(init=False, default=0.0)
+    _pipe_x: np.array = attr.ib(init=False, default=None)
+    _pipe_gap_y: np.array = attr.ib(init=False, default=None)
+    # Pipes the bird has flown through, the reward stays per step to match Game.
+    pipes_passed: int = attr.ib(init=False, default=0)
+
+    def __attrs_post_init__(self):
+        self._random_state = np.random.RandomState(self.seed)
+        self._new_game()
+
+    @staticmethod
+    def actions():
+        return 2
+
+    @staticmethod
+    def state_shape() -> (int, int):
+        return (SCREEN_HEIGHT, SCREEN_WIDTH)
+
+    def quit(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        pass
+
+    def _new_game(self):
+        self._game_over = False
+        self._bird_y = BIRD_START_Y
+        self._bird_velocity = 0.0
+        self._pipe_x = PIPE_START_X + np.arange(PIPE_COUNT) * PIPE_SPACING
+        self._pipe_gap_y = random_gap_y(self._random_state, size=PIPE_COUNT)
+        self.pipes_passed = 0
+
+    def _collided(self) -> bool:
+        bird_top = self._bird_y
+        bird_bottom = self._bird_y + BIRD_HEIGHT
+        if bird_top < 0 or bird_bottom >= GROUND_Y:
+            return True
+
+        overlapping = (self._pipe_x < BIRD_X + BIRD_WIDTH) & (self._pipe_x + PIPE_WIDTH > BIRD_X)
+        outside_gap = (bird_top < self._pipe_gap_y - PIPE_GAP // 2) | (bird_bottom > self._pipe_gap_y + PIPE_GAP // 2)
+        return bool(np.any(overlapping & outside_gap))
+
+    def _render(self) -> np.array:
+        screen = np.empty(self.state_shape(), dtype=np.uint8)
+        screen[:GROUND_Y] = BACKGROUND_COLOUR
+        screen[GROUND_Y:] = GROUND_COLOUR
+
+        for pipe_x, gap_y in zip(self._pipe_x, self._pipe_gap_y):
+            left = max(int(pipe_x), 0)
+            right = min(int(pipe_x) + PIPE_WIDTH, SCREEN_WIDTH)
+            if left >= right:
+                continue
+            screen[: gap_y - PIPE_GAP // 2, left:right] = PIPE_COLOUR
+            screen[gap_y + PIPE_GAP // 2 : GROUND_Y, left:right] = PIPE_COLOUR
+
+        bird_top = min(max(int(self._bird_y), 0), GROUND_Y)
+        screen[bird_top : int(self._bird_y) + BIRD_HEIGHT, BIRD_X : BIRD_X + BIRD_WIDTH] = BIRD_COLOUR
+        return screen
+
+    def step(self, action) -> (np.array, int, bool):
+        if self._game_over:
+            # Like the real game nothing moves once the bird has crashed.
+            return self._render(), -1, 1
+
+        if action == 1:
+            self._bird_velocity = FLAP_VELOCITY
+        else:
+            self._bird_velocity = min(self._bird_velocity + GRAVITY, MAX_FALL_VELOCITY)
+        self._bird_y += self._bird_velocity
+
+        passed_before = self._pipe_x + PIPE_WIDTH <= BIRD_X
+        self._pipe_x -= PIPE_SPEED
+        self.pipes_passed += int(np.sum((self._pipe_x + PIPE_WIDTH <= BIRD_X) & ~passed_before))
+
+        # Pipes that scroll off the left of the screen are recycled behind the last one.
+        off_screen = self._pipe_x + PIPE_WIDTH <= 0
+        for idx in np.flatnonzero(off_screen):
+            self._pipe_x[idx] = self._pipe_x.max() + PIPE_SPACING
+            self._pipe_gap_y[idx] = random_gap_y(self._random_state)
+
+        done = int(self._collided())
+        if done:
+            self._game_over = True
+
+        if done:
+            reward = -1
+        else:
+            reward = 1
+
+        return self._render(), reward, done
+
+    def game_over(self) -> bool:
+        return self._game_over
+
+    def reset(self, seed: int = None):
+        if seed is not None:
+            self._random_state = np.random.RandomState(seed)
+        self._new_game()
@@ -0,0 +1,14 @@
+from sqlalchemy import Column, Float, Integer, String
+
+from flappy_ai.database import Base
+
+
+class DiscardedEpisode(Base):
+    __tablename__ = "discarded_episodes"
+
+    id = Column(Integer, primary_key=True)
+    episode_number = Column(Integer)
+    reason = Column(String)
+    # The stage that took longest in the loop that got the episode thrown away.
+    slowest_stage = Column(String)
+    loop_time = Column(Float)
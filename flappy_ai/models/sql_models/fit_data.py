@@ -1,5 +1,6 @@
-from sqlalchemy import Column, Integer, String, Float
-from flappy_ai import Base, engine
+from sqlalchemy import Column, Float, Integer, String
+
+from flappy_ai.database import Base
 
 
 class FitData(Base):
@@ -9,6 +10,3 @@ class FitData(Base):
     epsilon = Column(Float)
     loss = Column(Float)
     accuracy = Column(Float)
-
-
-FitData.metadata.create_all(engine)
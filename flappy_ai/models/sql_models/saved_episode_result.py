@@ -1,5 +1,6 @@
 from sqlalchemy import Column, Integer, String
-from flappy_ai import Base, engine
+
+from flappy_ai.database import Base
 
 
 class SavedEpisodeResult(Base):
@@ -9,6 +10,3 @@ class SavedEpisodeResult(Base):
     # Not promised to be unique
     episode_number = Column(Integer)
     score = Column(Integer)
-
-
-SavedEpisodeResult.metadata.create_all(engine)
\ No newline at end of file
@@ -0,0 +1,19 @@
+from sqlalchemy import Column, Float, Integer, String
+
+from flappy_ai.database import Base
+
+
+class StageTiming(Base):
+    __tablename__ = "stage_timings"
+
+    id = Column(Integer, primary_key=True)
+    created = Column(Float)
+    actor_index = Column(Integer)
+    stage = Column(String)
+    # Milliseconds, over the samples since the actor's previous report.
+    count = Column(Integer)
+    mean = Column(Float)
+    p50 = Column(Float)
+    p90 = Column(Float)
+    p99 = Column(Float)
+    max = Column(Float)
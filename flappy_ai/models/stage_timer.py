@@ -0,0 +1,63 @@
+import time
+from typing import Dict
+
+import attr
+
+from flappy_ai.models.histogram import Histogram
+
+
+@attr.s(auto_attribs=True)
+class StageTimer:
+    """
+    Times the named stages of a hot loop, each into its own Histogram of milliseconds.
+    Stages are timed with `with stage_timer.time("decode"):` wherever they happen, so the game, the preprocessor
+    and the actor loop all record into the one timer of their process without it being passed around.
+    """
+
+    _histograms: Dict[str, Histogram] = attr.ib(init=False, default=attr.Factory(dict))
+    # Seconds spent in each stage since the last lap.
+    _lap: Dict[str, float] = attr.ib(init=False, default=attr.Factory(dict))
+
+    def record(self, stage: str, seconds: float):
+        histogram = self._histograms.get(stage)
+        if histogram is None:
+            # 0.05ms up to about 1.6s.
+            histogram = self._histograms[stage] = Histogram.exponential(0.05, 2, 16)
+        histogram.add(seconds * 1000)
+        self._lap[stage] = self._lap.get(stage, 0.0) + seconds
+
+    def time(self, stage: str) -> "_TimedStage":
+        return _TimedStage(self, stage)
+
+    def lap(self) -> Dict[str, float]:
+        """
+        Seconds spent in each stage since the last lap, used to find which stage made a loop slow.
+        """
+        lap, self._lap = self._lap, {}
+        return lap
+
+    def summary(self) -> Dict[str, dict]:
+        return {stage: histogram.summary() for stage, histogram in self._histograms.items()}
+
+    def reset(self):
+        # Stages that do not run again before the next summary should not show up in it with nothing recorded.
+        self._histograms = {}
+        self._lap = {}
+
+
+class _TimedStage:
+    __slots__ = ("_timer", "_stage", "_start")
+
+    def __init__(self, timer: StageTimer, stage: str):
+        self._timer = timer
+        self._stage = stage
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._timer.record(self._stage, time.perf_counter() - self._start)
+
+
+# The timer of this process.
+stage_timer = StageTimer()
@@ -0,0 +1,66 @@
+import attr
+import numpy as np
+
+# Updates of up to this many leaves are propagated in Python rather than with numpy.
+_SMALL_UPDATE = 32
+
+
+@attr.s(auto_attribs=True)
+class SumTree:
+    """
+    Binary tree stored in a flat array where every node holds the sum of its children.
+    The leaves are the priorities, so sampling proportionally to priority and updating a priority
+    are both O(log n). Every method works on a whole batch of indices at once.
+    """
+
+    capacity: int
+
+    _leaf_offset: int = attr.ib(init=False, default=None)
+    _depth: int = attr.ib(init=False, default=None)
+    _nodes: np.array = attr.ib(init=False, default=None)
+
+    def __attrs_post_init__(self):
+        self._depth = max(int(np.ceil(np.log2(self.capacity))), 1)
+        self._leaf_offset = 2 ** self._depth
+        # Node 0 is unused, the root lives at 1 and the children of node i are 2i and 2i + 1.
+        self._nodes = np.zeros(2 * self._leaf_offset, dtype=np.float64)
+
+    def total(self) -> float:
+        return float(self._nodes[1])
+
+    def get(self, indices: np.array) -> np.array:
+        return self._nodes[np.asarray(indices) + self._leaf_offset]
+
+    def update(self, indices: np.array, priorities: np.array):
+        nodes = np.asarray(indices) + self._leaf_offset
+        self._nodes[nodes] = priorities
+        if len(nodes) <= _SMALL_UPDATE:
+            # A handful of leaves, such as an append touches, is far quicker to walk up one node at a time
+            # than with a few array operations per level.
+            tree = self._nodes
+            level = set(nodes.tolist())
+            for _ in range(self._depth):
+                level = {node >> 1 for node in level}
+                for node in level:
+                    tree[node] = tree[2 * node] + tree[2 * node + 1]
+            return
+        # Parents shared by several leaves are summed more than once, which still gives the same value
+        # and is cheaper than deduplicating them on every level.
+        for _ in range(self._depth):
+            nodes = nodes // 2
+            self._nodes[nodes] = self._nodes[2 * nodes] + self._nodes[2 * nodes + 1]
+
+    def sample(self, values: np.array) -> np.array:
+        """
+        Finds the leaf each value falls into when the priorities are laid end to end, values are in [0, total).
+        """
+        values = np.array(values, dtype=np.float64)
+        nodes = np.ones(len(values), dtype=np.int64)
+        for _ in range(self._depth):
+            left = 2 * nodes
+            left_sum = self._nodes[left]
+            # Never walk into an empty branch, rounding can otherwise land us on a zero priority leaf.
+            go_right = ((values >= left_sum) & (self._nodes[left + 1] > 0)) | (left_sum <= 0)
+            values = np.where(go_right, values - left_sum, values)
+            nodes = left + go_right
+        return nodes - self._leaf_offset
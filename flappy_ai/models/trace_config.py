@@ -0,0 +1,10 @@
+import attr
+
+
+@attr.s(auto_attribs=True)
+class TraceConfig:
+    enabled: bool
+    # Each process writes its spans here, the runner merges them into trace.json.
+    directory: str
+    # Spans kept per process, the oldest are dropped once it is full.
+    buffer_size: int
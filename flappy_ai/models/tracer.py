@@ -0,0 +1,155 @@
+import glob
+import json
+import os
+import signal
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, Tuple
+
+import attr
+from structlog import get_logger
+
+from flappy_ai.models.trace_config import TraceConfig
+
+logger = get_logger(__name__)
+
+MERGED_TRACE = "trace.json"
+
+
+class _NoSpan:
+    """
+    Handed out while tracing is off so a span costs next to nothing.
+    """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        pass
+
+
+_NO_SPAN = _NoSpan()
+
+
+class _Span:
+    __slots__ = ("_events", "_name", "_args", "_thread", "_start")
+
+    def __init__(self, events: Deque[Tuple], name: str, args: dict, thread: int):
+        self._events = events
+        self._name = name
+        self._args = args
+        self._thread = thread
+
+    def __enter__(self):
+        self._start = time.time_ns() // 1000
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        end = time.time_ns() // 1000
+        self._events.append((self._name, self._start, end - self._start, self._thread, self._args))
+
+
+@attr.s(auto_attribs=True)
+class Tracer:
+    """
+    Records spans into a ring buffer in memory, so tracing can be left on without the buffer growing.
+    Each process has its own tracer, configured when the process starts, which writes its spans to
+    `trace-<pid>.json` when the process stops or receives SIGUSR1. merge() combines the files of every process
+    into one trace in the Chrome trace event format, which chrome://tracing and ui.perfetto.dev open.
+    Timestamps are wall clock so spans from different processes line up.
+    """
+
+    enabled: bool = attr.ib(default=False)
+    directory: str = attr.ib(default="data/traces")
+    process_name: str = attr.ib(default=None)
+
+    # (name, start us, duration us, thread id, args)
+    _events: Deque[Tuple] = attr.ib(init=False, default=attr.Factory(deque))
+    # Threads can be gone by the time the trace is written, so their names are kept as they record spans.
+    _thread_names: Dict[int, str] = attr.ib(init=False, default=attr.Factory(dict))
+
+    def configure(self, config: TraceConfig, process_name: str):
+        self.enabled = config.enabled
+        self.directory = config.directory
+        self.process_name = process_name
+        if not self.enabled:
+            return
+        self._events = deque(maxlen=config.buffer_size)
+        os.makedirs(self.directory, exist_ok=True)
+        try:
+            signal.signal(signal.SIGUSR1, self._on_signal)
+        except (AttributeError, ValueError):
+            # No SIGUSR1 on Windows, and signals can only be handled on the main thread.
+            logger.warn("Traces can not be dumped on a signal in this process.", process_name=process_name)
+
+    def span(self, name: str, **args):
+        """
+        Times the block it wraps, `with tracer.span("fit_batch"):`.
+        """
+        if not self.enabled:
+            return _NO_SPAN
+        thread = threading.current_thread()
+        self._thread_names[thread.ident] = thread.name
+        return _Span(self._events, name, args, thread.ident)
+
+    def _on_signal(self, signum, frame):
+        self.dump()
+
+    def _path(self) -> str:
+        return os.path.join(self.directory, f"trace-{os.getpid()}.json")
+
+    def dump(self):
+        """
+        Writes the spans in the buffer to this process' trace file, replacing what it held before.
+        """
+        if not self.enabled:
+            return
+        # list() copies the deque in one go, other threads can carry on appending.
+        events = list(self._events)
+        pid = os.getpid()
+        threads = dict(self._thread_names)
+        trace = [{"name": "process_name", "ph": "M", "pid": pid, "args": {"name": self.process_name or str(pid)}}]
+        trace += [
+            {"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": threads.get(tid, str(tid))}}
+            for tid in {event[3] for event in events}
+        ]
+        trace += [
+            {"name": name, "ph": "X", "ts": start, "dur": duration, "pid": pid, "tid": tid, "args": args}
+            for name, start, duration, tid, args in events
+        ]
+        temp_path = f"{self._path()}.tmp"
+        with open(temp_path, "w") as file:
+            json.dump(trace, file)
+        os.replace(temp_path, self._path())
+        logger.debug("Trace written.", path=self._path(), spans=len(events))
+
+    def clear_directory(self):
+        """
+        Removes the trace files of earlier runs, so a merge only picks up this one.
+        """
+        if not self.enabled:
+            return
+        for path in glob.glob(os.path.join(self.directory, "trace-*.json")):
+            os.remove(path)
+
+    def merge(self) -> str:
+        """
+        Combines every process' trace file into a single trace, returns where it was written.
+        """
+        events = []
+        for path in sorted(glob.glob(os.path.join(self.directory, "trace-*.json"))):
+            try:
+                with open(path, "r") as file:
+                    events += json.load(file)
+            except (OSError, ValueError):
+                logger.warn("Unable to read trace.", path=path)
+        path = os.path.join(self.directory, MERGED_TRACE)
+        with open(path, "w") as file:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, file)
+        logger.debug("Traces merged.", path=path, events=len(events))
+        return path
+
+
+# The tracer of this process.
+tracer = Tracer()
@@ -0,0 +1,128 @@
+import os
+import random
+import shutil
+import time
+from typing import List, Optional
+
+import attr
+import numpy as np
+from structlog import get_logger
+
+from flappy_ai.models.game_history import GameHistory
+
+logger = get_logger(__name__)
+
+
+def _weight_arrays(prefix: str, weights: List[np.array]) -> dict:
+    arrays = {f"{prefix}_{i}": weight for i, weight in enumerate(weights)}
+    arrays[f"{prefix}_count"] = len(weights)
+    return arrays
+
+
+def _read_weights(data, prefix: str) -> List[np.array]:
+    return [data[f"{prefix}_{i}"] for i in range(int(data[f"{prefix}_count"]))]
+
+
+@attr.s(auto_attribs=True)
+class TrainerSnapshot:
+    """
+    Everything training needs to carry on where it stopped: the weights, the optimizer slots, the step counter,
+    epsilon, the random number generators and the whole replay memory.
+
+    Stored as a directory holding trainer.npz and the replay memory in compressed chunks, see GameHistory.dump.
+    It is written next to the old snapshot and swapped in with renames, so there is always one complete snapshot.
+    """
+
+    step: int
+    epsilon: float
+    weights: List[np.array]
+    optimizer_weights: List[np.array]
+
+    def write(self, location: str, memory: GameHistory, chunk_size: int = 2048):
+        start_time = time.time()
+        temp_location = f"{location}.tmp"
+        old_location = f"{location}.old"
+        shutil.rmtree(temp_location, ignore_errors=True)
+        os.makedirs(temp_location)
+
+        memory.dump(temp_location, chunk_size=chunk_size)
+        python_version, python_state, python_gauss = random.getstate()
+        _, numpy_keys, numpy_position, numpy_has_gauss, numpy_cached_gaussian = np.random.get_state()
+        np.savez(
+            os.path.join(temp_location, "trainer.npz"),
+            step=self.step,
+            epsilon=self.epsilon,
+            python_random_version=python_version,
+            python_random_state=np.array(python_state, dtype=np.int64),
+            python_random_gauss=np.nan if python_gauss is None else python_gauss,
+            numpy_random_keys=numpy_keys,
+            numpy_random_position=numpy_position,
+            numpy_random_has_gauss=numpy_has_gauss,
+            numpy_random_cached_gaussian=numpy_cached_gaussian,
+            **_weight_arrays("weight", self.weights),
+            **_weight_arrays("optimizer_weight", self.optimizer_weights),
+        )
+
+        # A directory can not be renamed over another one, the old snapshot is moved aside first.
+        shutil.rmtree(old_location, ignore_errors=True)
+        if os.path.exists(location):
+            os.rename(location, old_location)
+        os.rename(temp_location, location)
+        shutil.rmtree(old_location, ignore_errors=True)
+        logger.debug(
+            "Trainer snapshot written.",
+            location=location,
+            step=self.step,
+            memory_len=len(memory),
+            seconds=round(time.time() - start_time, 3),
+        )
+
+    @classmethod
+    def read(cls, location: str, memory: Optional[GameHistory] = None) -> Optional["TrainerSnapshot"]:
+        """
+        Restores the random number generators and streams the replay memory back into `memory`,
+        then returns the snapshot for the caller to put the weights in place.
+        Returns None when there is no snapshot. Raises if the snapshot is damaged.
+        """
+        if not os.path.isdir(location):
+            # Only left behind if the process died between the two renames.
+            location = f"{location}.old"
+            if not os.path.isdir(location):
+                return None
+
+        start_time = time.time()
+        with np.load(os.path.join(location, "trainer.npz")) as data:
+            snapshot = cls(
+                step=int(data["step"]),
+                epsilon=float(data["epsilon"]),
+                weights=_read_weights(data, "weight"),
+                optimizer_weights=_read_weights(data, "optimizer_weight"),
+            )
+            python_gauss = float(data["python_random_gauss"])
+            random.setstate(
+                (
+                    int(data["python_random_version"]),
+                    tuple(int(x) for x in data["python_random_state"]),
+                    None if np.isnan(python_gauss) else python_gauss,
+                )
+            )
+            np.random.set_state(
+                (
+                    "MT19937",
+                    data["numpy_random_keys"],
+                    int(data["numpy_random_position"]),
+                    int(data["numpy_random_has_gauss"]),
+                    float(data["numpy_random_cached_gaussian"]),
+                )
+            )
+
+        if memory is not None:
+            memory.restore(location)
+        logger.debug(
+            "Trainer snapshot read.",
+            location=location,
+            step=snapshot.step,
+            memory_len=len(memory) if memory is not None else None,
+            seconds=round(time.time() - start_time, 3),
+        )
+        return snapshot
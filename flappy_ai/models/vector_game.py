@@ -0,0 +1,159 @@
+import attr
+import numpy as np
+
+from flappy_ai.models.frame_stacker import FrameStacker
+from flappy_ai.models.simulated_game import (BACKGROUND_COLOUR, BIRD_COLOUR,
+                                             BIRD_HEIGHT, BIRD_START_Y,
+                                             BIRD_WIDTH, BIRD_X, FLAP_VELOCITY,
+                                             GRAVITY, GROUND_COLOUR, GROUND_Y,
+                                             MAX_FALL_VELOCITY, PIPE_COLOUR,
+                                             PIPE_COUNT, PIPE_GAP,
+                                             PIPE_SPACING, PIPE_SPEED,
+                                             PIPE_START_X, PIPE_WIDTH,
+                                             SCREEN_HEIGHT, SCREEN_WIDTH,
+                                             random_gap_y)
+
+_ROWS = np.arange(SCREEN_HEIGHT)[None, :, None]
+_COLS = np.arange(SCREEN_WIDTH)[None, None, :]
+
+
+@attr.s(auto_attribs=True)
+class VectorGame:
+    """
+    Steps `size` simulated games in lockstep.
+    Every game's state lives in a column of a handful of NumPy arrays so one step() call moves all of them,
+    and the returned observations are already stacked into a (size, 160, 120, 4) batch that can be handed
+    straight to DQNNetwork.predict_batch.
+    Games that finish are reset automatically, the observation returned for them is the first of the new game.
+    The observations are a view into a FrameStacker and are only valid until the next step().
+    """
+
+    size: int
+    seed: int = attr.ib(default=None)
+    # How many frames make up a single observation.
+    stack_frames: int = attr.ib(default=4)
+
+    # Score of the most recently finished episode of each game.
+    episode_scores: np.array = attr.ib(init=False, default=None)
+
+    _random_state: np.random.RandomState = attr.ib(init=False, default=None)
+    _bird_y: np.array = attr.ib(init=False, default=None)
+    _bird_velocity: np.array = attr.ib(init=False, default=None)
+    _pipe_x: np.array = attr.ib(init=False, default=None)
+    _pipe_gap_y: np.array = attr.ib(init=False, default=None)
+    _scores: np.array = attr.ib(init=False, default=None)
+    _stacker: FrameStacker = attr.ib(init=False, default=None)
+
+    def __attrs_post_init__(self):
+        self._random_state = np.random.RandomState(self.seed)
+        self._bird_y = np.empty(self.size, dtype=np.float32)
+        self._bird_velocity = np.empty(self.size, dtype=np.float32)
+        self._pipe_x = np.empty((self.size, PIPE_COUNT), dtype=np.int32)
+        self._pipe_gap_y = np.empty((self.size, PIPE_COUNT), dtype=np.int32)
+        self._scores = np.zeros(self.size, dtype=np.int32)
+        self.episode_scores = np.zeros(self.size, dtype=np.int32)
+        self._stacker = FrameStacker(frame_shape=(self.size, SCREEN_HEIGHT, SCREEN_WIDTH), depth=self.stack_frames)
+        self.reset()
+
+    @staticmethod
+    def actions():
+        return 2
+
+    def state_shape(self) -> (int, int, int):
+        return (SCREEN_HEIGHT, SCREEN_WIDTH, self.stack_frames)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        pass
+
+    def _new_games(self, mask: np.array):
+        count = int(np.count_nonzero(mask))
+        if not count:
+            return
+        self._bird_y[mask] = BIRD_START_Y
+        self._bird_velocity[mask] = 0.0
+        self._pipe_x[mask] = PIPE_START_X + np.arange(PIPE_COUNT) * PIPE_SPACING
+        self._pipe_gap_y[mask] = random_gap_y(self._random_state, size=(count, PIPE_COUNT))
+        self._scores[mask] = 0
+
+    def _collided(self) -> np.array:
+        bird_top = self._bird_y
+        bird_bottom = self._bird_y + BIRD_HEIGHT
+        out_of_bounds = (bird_top < 0) | (bird_bottom >= GROUND_Y)
+
+        overlapping = (self._pipe_x < BIRD_X + BIRD_WIDTH) & (self._pipe_x + PIPE_WIDTH > BIRD_X)
+        outside_gap = (bird_top[:, None] < self._pipe_gap_y - PIPE_GAP // 2) | (
+            bird_bottom[:, None] > self._pipe_gap_y + PIPE_GAP // 2
+        )
+        return out_of_bounds | np.any(overlapping & outside_gap, axis=1)
+
+    def _render(self) -> np.array:
+        """
+        Draws every game at once, the same picture SimulatedGame would draw for each of them.
+        """
+        screens = np.empty((self.size, SCREEN_HEIGHT, SCREEN_WIDTH), dtype=np.uint8)
+        screens[:, :GROUND_Y] = BACKGROUND_COLOUR
+        screens[:, GROUND_Y:] = GROUND_COLOUR
+
+        for pipe in range(PIPE_COUNT):
+            pipe_x = self._pipe_x[:, pipe, None, None]
+            gap_y = self._pipe_gap_y[:, pipe, None, None]
+            in_columns = (_COLS >= pipe_x) & (_COLS < pipe_x + PIPE_WIDTH)
+            in_rows = (_ROWS < gap_y - PIPE_GAP // 2) | ((_ROWS >= gap_y + PIPE_GAP // 2) & (_ROWS < GROUND_Y))
+            screens[in_columns & in_rows] = PIPE_COLOUR
+
+        bird_y = np.trunc(self._bird_y).astype(np.int32)[:, None, None]
+        in_rows = (_ROWS >= np.clip(bird_y, 0, GROUND_Y)) & (_ROWS < bird_y + BIRD_HEIGHT)
+        in_columns = (_COLS >= BIRD_X) & (_COLS < BIRD_X + BIRD_WIDTH)
+        screens[in_rows & in_columns] = BIRD_COLOUR
+        return screens
+
+    def _push_frames(self, screens: np.array, fresh: np.array):
+        self._stacker.push(screens)
+        # A new game has no history yet so its first frame fills the whole stack.
+        if np.any(fresh):
+            self._stacker.fill(fresh)
+
+    def _observations(self) -> np.array:
+        # Oldest frame first, the same order GameProcess stacks its screens in.
+        return self._stacker.current()
+
+    def reset(self) -> np.array:
+        everything = np.ones(self.size, dtype=bool)
+        self._new_games(everything)
+        self._push_frames(self._render(), everything)
+        return self._observations()
+
+    def step(self, actions: np.array) -> (np.array, np.array, np.array):
+        """
+        Advances every game by one frame.
+        Returns the stacked observations, the rewards (1 while alive, -1 on the crash) and the done flags.
+        """
+        flap = np.asarray(actions) == 1
+        self._bird_velocity = np.where(
+            flap, FLAP_VELOCITY, np.minimum(self._bird_velocity + GRAVITY, MAX_FALL_VELOCITY)
+        ).astype(np.float32)
+        self._bird_y += self._bird_velocity
+
+        self._pipe_x -= PIPE_SPEED
+        # Pipes that scroll off the left of the screen are recycled behind the last one.
+        # Only one pipe per game can leave the screen per step, so a single pass is enough.
+        off_screen = self._pipe_x + PIPE_WIDTH <= 0
+        if np.any(off_screen):
+            games, pipes = np.nonzero(off_screen)
+            self._pipe_x[games, pipes] = self._pipe_x[games].max(axis=1) + PIPE_SPACING
+            self._pipe_gap_y[games, pipes] = random_gap_y(self._random_state, size=len(games))
+
+        dones = self._collided()
+        rewards = np.where(dones, -1, 1).astype(np.int32)
+        # Like GameData the score only counts the frames the bird survived.
+        self._scores += ~dones
+
+        if np.any(dones):
+            self.episode_scores[dones] = self._scores[dones]
+            self._new_games(dones)
+        self._push_frames(self._render(), dones)
+
+        return self._observations(), rewards, dones
@@ -0,0 +1,11 @@
+import attr
+
+
+@attr.s(auto_attribs=True)
+class WeightsRequest:
+    """
+    Sent by an actor doing its own inference to ask for weights newer than the version it already has.
+    """
+
+    version: int
+    sequence: int = attr.ib(default=None)
@@ -0,0 +1,17 @@
+from typing import List
+
+import attr
+import numpy as np
+
+
+@attr.s(auto_attribs=True)
+class WeightsUpdate:
+    """
+    The answer to a WeightsRequest, the weights are left out when the actor already has this version.
+    """
+
+    version: int
+    epsilon: float
+    weights: List[np.array] = attr.ib(default=None)
+    # Echoes the sequence number of the request it answers.
+    sequence: int = attr.ib(default=None)
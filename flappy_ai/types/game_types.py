@@ -0,0 +1,7 @@
+from enum import Enum
+
+
+class GameTypes(Enum):
+    SELENIUM = "SELENIUM"
+    SIMULATED = "SIMULATED"
+    VECTOR = "VECTOR"
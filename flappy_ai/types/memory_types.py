@@ -0,0 +1,6 @@
+from enum import Enum
+
+
+class MemoryTypes(Enum):
+    RAM = "RAM"
+    MEMMAP = "MEMMAP"
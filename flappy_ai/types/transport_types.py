@@ -0,0 +1,6 @@
+from enum import Enum
+
+
+class TransportTypes(Enum):
+    PIPE = "PIPE"
+    SHARED_MEMORY = "SHARED_MEMORY"
@@ -0,0 +1,42 @@
+from typing import Tuple
+
+import numpy as np
+
+
+def lttb(x: np.array, y: np.array, threshold: int) -> Tuple[np.array, np.array]:
+    """
+    Largest-Triangle-Three-Buckets downsampling.
+    Keeps the first and last points and from every bucket in between the point that makes the largest triangle
+    with the point kept before it and the average of the next bucket, which holds on to the peaks and dips
+    a plain stride would drop.
+    https://skemman.is/bitstream/1946/15343/3/SS_MSthesis.pdf
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    if threshold >= len(x) or threshold < 3:
+        return x, y
+
+    # threshold - 2 buckets between the first and the last point.
+    edges = np.linspace(1, len(x) - 1, threshold - 1).astype(np.int64)
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = len(x) - 1
+
+    previous = 0
+    for bucket in range(threshold - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        if bucket + 2 < len(edges):
+            next_x = x[end : edges[bucket + 2]].mean()
+            next_y = y[end : edges[bucket + 2]].mean()
+        else:
+            next_x, next_y = x[-1], y[-1]
+
+        # Twice the triangle areas, the factor does not change which one is the largest.
+        areas = np.abs(
+            (x[previous] - next_x) * (y[start:end] - y[previous])
+            - (x[previous] - x[start:end]) * (next_y - y[previous])
+        )
+        previous = start + int(np.argmax(areas))
+        selected[bucket + 1] = previous
+
+    return x[selected], y[selected]
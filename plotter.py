@@ -1,45 +1,89 @@
 import matplotlib.pyplot as plt
-from cattr import structure
+import numpy as np
 from structlog import get_logger
 
-from flappy_ai.models.sql_models.saved_episode_result import SavedEpisodeResult
-from flappy_ai.models.sql_models.fit_data import FitData
 from flappy_ai import Session
+from flappy_ai.models.rolling_series import RollingSeries
+from flappy_ai.models.sql_models.fit_data import FitData
+from flappy_ai.models.sql_models.saved_episode_result import SavedEpisodeResult
+from flappy_ai.utils.downsample import lttb
 
 logger = get_logger(__name__)
 
+REFRESH_SECONDS = 60
+# New rows are read in chunks of this many so catching up on a big table does not load it all at once.
+FETCH_ROWS = 100000
+# Points drawn per line, the refresh costs the same however long training has run for.
+PLOT_POINTS = 500
+# Buckets the moving average is taken over.
+MOVING_AVERAGE_BUCKETS = 16
+
 plt.ion()
 
 f, axarr = plt.subplots(3, 1)
 f.subplots_adjust(hspace=0.3)
 f.suptitle("Results Over Time")
 
-axarr[0].set_title("Loss")
-axarr[0].plot([])
-axarr[1].set_title("Accuracy")
-axarr[1].plot([])
-axarr[2].set_title("Score Per Episode")
-axarr[2].plot([])
-plt.legend()
+SERIES = {
+    "Loss": RollingSeries(),
+    "Epsilon": RollingSeries(),
+    "Score Per Episode": RollingSeries(),
+}
+# The id of the last row read from each table, only rows past it are fetched.
+WATERMARKS = {FitData: 0, SavedEpisodeResult: 0}
+
+
+def fetch_new_rows(session, model, *columns) -> np.array:
+    """
+    Reads every row added since the last call, returns them as an array with a row per record.
+    """
+    chunks = []
+    while True:
+        rows = (
+            session.query(model.id, *columns)
+            .filter(model.id > WATERMARKS[model])
+            .order_by(model.id)
+            .limit(FETCH_ROWS)
+            .all()
+        )
+        if not rows:
+            break
+        # None, such as the accuracy the compiled train step does not record, becomes nan.
+        chunks.append(np.array(rows, dtype=np.float64))
+        WATERMARKS[model] = rows[-1][0]
+        if len(rows) < FETCH_ROWS:
+            break
+    return np.concatenate(chunks) if chunks else np.empty((0, len(columns) + 1))
+
+
+def draw(ax, title: str, series: RollingSeries):
+    ax.cla()
+    ax.set_title(title)
+    if not len(series):
+        return
+    x = series.x()
+    ax.fill_between(x, series.min(), series.max(), alpha=0.2, label="min / max")
+    ax.plot(*lttb(x, series.mean(), PLOT_POINTS), linewidth=0.8, label="mean")
+    ax.plot(*lttb(x, series.moving_average(MOVING_AVERAGE_BUCKETS), PLOT_POINTS), label="moving average")
+    ax.legend(loc="upper left", fontsize="small")
 
 
 while True:
     session = Session()
-    score_history = session.query(SavedEpisodeResult).all()
-    fit_data = session.query(FitData).all()
-    score_history = sorted(score_history, key=lambda x: x.episode_number)
-
-
-    plt.cla()
-    axarr[0].plot((range(0, len(fit_data))), [x.loss for x in fit_data])
-    axarr[1].plot((range(0, len(fit_data))), [x.accuracy for x in fit_data])
-    axarr[2].plot([x.episode_number for x in score_history], [x.score for x in score_history])
-
-    axarr[0].relim()
-    axarr[0].autoscale_view(True, True, True)
-    axarr[1].relim()
-    axarr[1].autoscale_view(True, True, True)
-    axarr[2].relim()
-    axarr[2].autoscale_view(True, True, True)
+    fit_data = fetch_new_rows(session, FitData, FitData.loss, FitData.epsilon)
+    score_history = fetch_new_rows(
+        session, SavedEpisodeResult, SavedEpisodeResult.episode_number, SavedEpisodeResult.score
+    )
+    session.close()
+
+    # Fit data is plotted against the training step, which the row id stands in for.
+    SERIES["Loss"].extend(fit_data[:, 0], fit_data[:, 1])
+    SERIES["Epsilon"].extend(fit_data[:, 0], fit_data[:, 2])
+    SERIES["Score Per Episode"].extend(score_history[:, 1], score_history[:, 2])
+    watermarks = {model.__tablename__: watermark for model, watermark in WATERMARKS.items()}
+    logger.debug("Plot updated", watermarks=watermarks)
+
+    for ax, (title, series) in zip(axarr, SERIES.items()):
+        draw(ax, title, series)
     plt.draw()
-    plt.pause(60)
+    plt.pause(REFRESH_SECONDS)
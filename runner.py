@@ -1,27 +1,61 @@
 import json
 import multiprocessing
+import os
+import signal
+import threading
 import time
+from collections import Counter
+from multiprocessing.connection import Pipe
 from typing import List
 
 from structlog import get_logger
 
-from flappy_ai.models import EpisodeResult, PredictionRequest
-from flappy_ai.models.game_process import GameProcess
+from flappy_ai import Session
+from flappy_ai.config import (actor_config, game_config, inference_config,
+                              results_writer_config, trace_config)
+from flappy_ai.models import EpisodeDiscarded, EpisodeResult
+from flappy_ai.models.actor_metrics import ActorMetrics
+from flappy_ai.models.actor_pool import ActorPool
+from flappy_ai.models.frame_ring import FrameRing
 from flappy_ai.models.keras_process import KerasProcess
-from flappy_ai.types.network_types import NetworkTypes
+from flappy_ai.models.results_writer import ResultsWriter
+from flappy_ai.models.sql_models.discarded_episode import DiscardedEpisode
 from flappy_ai.models.sql_models.saved_episode_result import SavedEpisodeResult
-from flappy_ai import Session
+from flappy_ai.models.sql_models.stage_timing import StageTiming
+from flappy_ai.models.tracer import tracer
+from flappy_ai.types.game_types import GameTypes
+from flappy_ai.types.network_types import NetworkTypes
+from flappy_ai.types.transport_types import TransportTypes
 
 logger = get_logger(__name__)
 
-MAX_CLIENTS = 1
-CLIENTS: List[GameProcess] = []
+MAX_CLIENTS = actor_config.pool_size
+ACTOR_POOL: ActorPool = None
 KERAS_PROCESS = None
+FRAME_RING = None
+# One pipe per actor index straight to the keras process, the runner never touches them.
+ACTOR_PIPES = []
 
 # https://towardsdatascience.com/epoch-vs-iterations-vs-batch-size-4dfb9c7ce9c9
 EPISODES = 30000  # TODO, figure out a optimal number
 
+
+def dump_traces(signum, frame):
+    """
+    SIGUSR1 makes every process write its trace, they are merged once they have had a moment to do so.
+    """
+    tracer.dump()
+    for child in multiprocessing.active_children():
+        os.kill(child.pid, signal.SIGUSR1)
+    threading.Timer(2.0, tracer.merge).start()
+
+
 if __name__ == "__main__":
+    tracer.configure(trace_config, process_name="runner")
+    tracer.clear_directory()
+    if tracer.enabled:
+        signal.signal(signal.SIGUSR1, dump_traces)
+
     session = Session()
     result = session.query(SavedEpisodeResult).order_by(SavedEpisodeResult.episode_number.desc()).first()
     if not result:
@@ -32,68 +66,107 @@ if __name__ == "__main__":
         COMPLETED_EPISODES = result.episode_number
         logger.debug("Loaded episode info.", starting_episode=CURRENT_EPISODES)
 
+    if inference_config.transport is TransportTypes.SHARED_MEMORY:
+        # Has to exist before any of the processes that share it are started.
+        FRAME_RING = FrameRing(actors=MAX_CLIENTS)
+
+    # Created up front so the keras process gets its ends when it starts, each actor gets the other end
+    # of the pipe for its actor index.
+    ACTOR_PIPES = [Pipe() for _ in range(MAX_CLIENTS)]
+
     KERAS_PROCESS = KerasProcess()
-    KERAS_PROCESS.start(network_type=NetworkTypes.DQN)
-    # Give the keras process time to spin up, load models, etc.
-    time.sleep(20)
+    KERAS_PROCESS.start(
+        network_type=NetworkTypes.DQN, frame_ring=FRAME_RING, actor_pipes=[learner for _, learner in ACTOR_PIPES]
+    )
+    # Wait for the keras process to spin up, load models, etc.
+    KERAS_PROCESS.wait_until_ready()
     last_update = time.time()
     EPISODE_RESULTS: List[EpisodeResult] = []
+    # Why episodes were thrown away, by reason.
+    DISCARDED_EPISODES = Counter()
+    RESULTS_WRITER = ResultsWriter(
+        flush_rows=results_writer_config.flush_rows, flush_seconds=results_writer_config.flush_seconds
+    ).start()
+
+    ACTOR_POOL = ActorPool(
+        size=MAX_CLIENTS,
+        game_type=game_config.game_type,
+        inference_pipes=[actor for actor, _ in ACTOR_PIPES],
+        frame_ring=FRAME_RING,
+        # A vector actor plays all of its games at once and keeps as many episodes queued behind them.
+        episodes_per_actor=2 * game_config.vector_games if game_config.game_type is GameTypes.VECTOR else 1,
+    )
+    ACTOR_POOL.start()
 
     while True:
         if not KERAS_PROCESS.is_alive():
             raise Exception("Keras process died.")
 
+        # Keep every actor busy with as much again queued behind it, but never ask for more than we need.
+        while ACTOR_POOL.outstanding() < min(2 * ACTOR_POOL.capacity(), EPISODES - COMPLETED_EPISODES):
+            CURRENT_EPISODES += 1
+            ACTOR_POOL.submit(CURRENT_EPISODES)
+
+        # Sleep until an actor has something for us or a process exits.
+        ACTOR_POOL.wait(KERAS_PROCESS.sentinel(), timeout=1)
+
         # Calls join on completed processes but does not block. =)
         multiprocessing.active_children()
 
-        for client in CLIENTS:
-            if client.parent_pipe and client.parent_pipe.poll():
-                # Queue is FIFO
-                # we may need to toss data if we get too slow?
-                request = client.parent_pipe.recv()
-                if isinstance(request, PredictionRequest):
-                    KERAS_PROCESS.parent_pipe.send(request)
-                    client.parent_pipe.send(KERAS_PROCESS.parent_pipe.recv())
-                elif isinstance(request, EpisodeResult):
-                    # The end result of the session
-                    # Currently I consider set of GameData to be a batch size of one.
-                    # This may be over training, idk
-                    EPISODE_RESULTS.append(request)
-                    COMPLETED_EPISODES += 1
-
-        # Prune off any completed clients
-        CLIENTS = [x for x in CLIENTS if x.is_alive()]
+        for request in ACTOR_POOL.poll():
+            if isinstance(request, EpisodeResult):
+                # The end result of the session
+                # Currently I consider set of GameData to be a batch size of one.
+                # This may be over training, idk
+                EPISODE_RESULTS.append(request)
+                COMPLETED_EPISODES += 1
+            elif isinstance(request, EpisodeDiscarded):
+                # Submitted again by the top of the loop as it no longer counts as outstanding,
+                # unless the actor died, then the pool has already queued the same episode again.
+                DISCARDED_EPISODES[request.reason] += 1
+                RESULTS_WRITER.write(
+                    DiscardedEpisode(
+                        episode_number=request.episode_number,
+                        reason=request.reason,
+                        slowest_stage=request.slowest_stage(),
+                        loop_time=request.loop_time,
+                    )
+                )
+            elif isinstance(request, ActorMetrics):
+                logger.debug("Actor stage timings", actor_index=request.actor_index, stages_ms=request.stages)
+                for stage, summary in request.stages.items():
+                    RESULTS_WRITER.write(
+                        StageTiming(created=time.time(), actor_index=request.actor_index, stage=stage, **summary)
+                    )
 
         if (time.time() - last_update) / 60 > 5:
             last_update = time.time()
             # Only print updates and save every 5 minutes
-            logger.debug("UPDATE", target_episodes=EPISODES, completed_episodes=COMPLETED_EPISODES)
-
-        # Do the batch training after all the clients have completed
-        # Maybe I need to abstract the training out to it's own process?
-        if not CLIENTS:
-            session = Session()
-            session.bulk_save_objects(
-                [SavedEpisodeResult(episode_number=x.game_data.episode_number, score=x.game_data.score) for x in EPISODE_RESULTS]
+            logger.debug(
+                "UPDATE",
+                target_episodes=EPISODES,
+                completed_episodes=COMPLETED_EPISODES,
+                actor_restarts=ACTOR_POOL.restarts,
+                discarded_episodes=dict(DISCARDED_EPISODES),
             )
-            session.commit()
-
-            while EPISODE_RESULTS:
-                KERAS_PROCESS.parent_pipe.send(EPISODE_RESULTS.pop())
 
-                # We just want to make sure that we're done training before moving on.
-                KERAS_PROCESS.parent_pipe.recv()
+        # The keras process trains in the background, so results are handed over as soon as they come in
+        # and the actors keep playing while it learns.
+        while EPISODE_RESULTS:
+            result = EPISODE_RESULTS.pop(0)
+            with tracer.span("relay_episode", episode=result.game_data.episode_number):
+                RESULTS_WRITER.write(
+                    SavedEpisodeResult(episode_number=result.game_data.episode_number, score=result.game_data.score)
+                )
+                KERAS_PROCESS.parent_pipe.send(result)
 
-        # If we are still below the targets interations, refill the clients and continue
         if COMPLETED_EPISODES >= EPISODES:
-            if CLIENTS:
-                continue
-            else:
-                break
-        elif COMPLETED_EPISODES < EPISODES and not CLIENTS:
-            while len(CLIENTS) < MAX_CLIENTS:
-                # Wrong place for this.
-                CURRENT_EPISODES += 1
-                c = GameProcess()
-                CLIENTS.append(c)
-                c.start(episode_number=CURRENT_EPISODES)
+            break
+
+    ACTOR_POOL.stop()
+    # Stopped here rather than at exit so its trace is written before they are merged.
+    KERAS_PROCESS.cleanup()
+    RESULTS_WRITER.stop()
+    if tracer.enabled:
+        tracer.dump()
+        tracer.merge()
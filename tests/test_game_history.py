@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+
+from flappy_ai.factories.game_factory import game_factory
+from flappy_ai.models.game_history import GameHistory
+from flappy_ai.models.game_process import GameProcess
+from flappy_ai.types.game_types import GameTypes
+
+
+def _play(episodes: int):
+    random_state = np.random.RandomState(0)
+    with game_factory(game_type=GameTypes.SIMULATED, headless=True, seed=0) as env:
+        for episode_number in range(episodes):
+            env.reset(seed=episode_number)
+            yield GameProcess._play_episode(env, episode_number, lambda state: int(random_state.rand() < 0.1))
+
+
+def _assert_replayed_as_played(memory: GameHistory, played: dict, first_entries: set):
+    batch = memory.get_sample_batch(batch_size=2000)
+    for idx, entry in enumerate(batch.indices):
+        # Only real entries are ever sampled.
+        item = played[entry]
+        np.testing.assert_array_equal(batch.states[idx], item.state)
+        # The next state of the last step is never used, the next episode's frames follow it in the memory.
+        if not item.is_terminal:
+            np.testing.assert_array_equal(batch.next_states[idx], item.next_state)
+    # The first state of an episode is the one the zero padding used to get wrong.
+    assert first_entries & set(batch.indices)
+
+
+@pytest.mark.parametrize("prioritized", [False, True])
+def test_appended_episodes_are_sampled_as_they_were_played(prioritized):
+    memory = GameHistory(size=10000, prioritized=prioritized)
+    played = {}
+    first_entries = set()
+    for episode in _play(5):
+        for step, item in enumerate(episode.game_data):
+            memory.append(item)
+            played[(memory._cursor - 1) % memory.size] = item
+            if step == 0:
+                first_entries.add((memory._cursor - 1) % memory.size)
+
+    _assert_replayed_as_played(memory, played, first_entries)
+
+
+def test_extended_episodes_are_sampled_as_they_were_played():
+    memory = GameHistory(size=10000)
+    played = {}
+    first_entries = set()
+    for episode in _play(5):
+        items = list(episode.game_data)
+        memory.extend(
+            np.stack([item.state[..., -1] for item in items]),
+            np.array([np.argmax(item.action) for item in items], dtype=np.int8),
+            np.array([item.reward for item in items], dtype=np.float32),
+            np.array([item.is_terminal for item in items], dtype=bool),
+            earlier_frames=np.moveaxis(items[0].state[..., :-1], -1, 0),
+        )
+        played.update({(memory._cursor - len(items) + step) % memory.size: item for step, item in enumerate(items)})
+        first_entries.add((memory._cursor - len(items)) % memory.size)
+
+    _assert_replayed_as_played(memory, played, first_entries)
@@ -0,0 +1,58 @@
+import os
+
+import cv2
+import pytest
+
+from flappy_ai.benchmarks.game_over import (BUTTON_POSITION, fixtures,
+                                            legacy_game_over)
+from flappy_ai.config import game_over_config
+from flappy_ai.models.game_over_detector import GameOverDetector
+from flappy_ai.models.image import Image
+
+
+@pytest.fixture(autouse=True)
+def _repo_root(monkeypatch):
+    # The samples are read from img/ relative to the repository, like the game does.
+    monkeypatch.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _template():
+    return cv2.imread("img/game_over.png", cv2.IMREAD_GRAYSCALE)
+
+
+def _detector(template_position=None) -> GameOverDetector:
+    return GameOverDetector(
+        template=_template(),
+        bird_margin=game_over_config.bird_margin,
+        template_margin=game_over_config.template_margin,
+        template_scale=game_over_config.template_scale,
+        template_position=template_position,
+    )
+
+
+def _fresh(image: Image) -> Image:
+    # Image caches its HSV copy, every check has to work it out for itself.
+    return Image(image.image, greyscale=image.as_greyscale())
+
+
+@pytest.mark.parametrize("template_position", [None, BUTTON_POSITION])
+def test_agrees_with_the_legacy_check_on_every_frame(template_position):
+    images = fixtures(frames=400)
+    legacy = legacy_game_over(_template())
+    expected = [legacy(_fresh(image)) for image in images]
+    # Both finished and running games are in there.
+    assert any(expected) and not all(expected)
+
+    detector = _detector(template_position)
+    # The second game runs with the button position found in the first.
+    for _ in range(2):
+        detector.reset()
+        mismatches = [idx for idx, image in enumerate(images) if detector(_fresh(image)) != expected[idx]]
+        assert mismatches == []
+
+
+@pytest.mark.parametrize("path", ["img/screen_base.png", "img/screen_merged.png"])
+def test_agrees_with_the_legacy_check_on_the_samples(path):
+    image = Image(cv2.cvtColor(cv2.imread(path, cv2.IMREAD_COLOR), cv2.COLOR_BGR2RGB))
+
+    assert _detector()(_fresh(image)) == legacy_game_over(_template())(_fresh(image))
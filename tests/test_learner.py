@@ -0,0 +1,109 @@
+import time
+
+import attr
+import numpy as np
+
+from flappy_ai.models import EpisodeResult, GameData, MemoryItem
+from flappy_ai.models.game_history import GameHistory
+from flappy_ai.models.learner import Learner
+from flappy_ai.models.learner_config import LearnerConfig
+
+
+@attr.s(auto_attribs=True)
+class _Config:
+    observe_frames_before_learning: int
+
+
+@attr.s(auto_attribs=True)
+class _Agent:
+    """
+    Just enough of a network for the learner, every batch only counts itself.
+    """
+
+    memory: GameHistory
+    config: _Config
+    fit_steps: int = 0
+
+    def fit_batch(self):
+        self.fit_steps += 1
+
+    def sync_inference_weights(self):
+        pass
+
+
+def _episode(episode_number: int, length: int) -> EpisodeResult:
+    game_data = GameData(episode_number=episode_number)
+    for idx in range(length):
+        item = MemoryItem(state=np.zeros((4, 4, 4), dtype=np.uint8), action=[1, 0])
+        item.reward = 1
+        item.is_terminal = idx == length - 1
+        game_data.append(item)
+    return EpisodeResult(game_data=game_data)
+
+
+def _wait_for(learner: Learner, fit_steps: int, timeout: float = 10):
+    deadline = time.time() + timeout
+    while learner.fit_steps < fit_steps and time.time() < deadline:
+        time.sleep(0.01)
+
+
+def test_keeps_training_once_the_memory_is_full():
+    agent = _Agent(memory=GameHistory(size=100, frame_shape=(4, 4)), config=_Config(observe_frames_before_learning=10))
+    learner = Learner(agent=agent, config=LearnerConfig(replay_ratio=1.0, sync_weights_every=100))
+    learner.start()
+    try:
+        for episode_number in range(10):
+            learner.add_episode(_episode(episode_number, 50))
+        _wait_for(learner, 490)
+    finally:
+        learner.stop()
+
+    assert len(agent.memory) == 100
+    assert learner.fit_steps == 490
+
+
+def test_a_restored_memory_needs_no_observing():
+    memory = GameHistory(size=100, frame_shape=(4, 4))
+    for item in _episode(0, 100).game_data:
+        memory.append(item)
+    agent = _Agent(memory=memory, config=_Config(observe_frames_before_learning=10))
+    learner = Learner(agent=agent, config=LearnerConfig(replay_ratio=2.0, sync_weights_every=100))
+    learner.start()
+    try:
+        learner.add_episode(_episode(1, 50))
+        _wait_for(learner, 100)
+    finally:
+        learner.stop()
+
+    assert learner.fit_steps == 100
+
+
+def test_adds_episodes_the_same_as_appending_them():
+    appended = GameHistory(size=100, frame_shape=(4, 4), prioritized=True)
+    agent = _Agent(
+        memory=GameHistory(size=100, frame_shape=(4, 4), prioritized=True),
+        config=_Config(observe_frames_before_learning=1000),
+    )
+    learner = Learner(agent=agent, config=LearnerConfig(replay_ratio=1.0, sync_weights_every=100))
+    random_state = np.random.RandomState(0)
+    for episode_number in range(5):
+        episode = _episode(episode_number, 30)
+        for item in episode.game_data:
+            item.state = random_state.randint(0, 256, size=(4, 4, 4), dtype=np.uint8)
+            appended.append(item)
+        learner.add_episode(episode)
+
+    assert learner.transitions_added == 150
+    for name in ("_frames", "_actions", "_rewards", "_terminals", "_cursor", "_count"):
+        np.testing.assert_array_equal(getattr(agent.memory, name), getattr(appended, name))
+    np.testing.assert_array_equal(agent.memory._tree._nodes, appended._tree._nodes)
+
+
+def test_stops_while_waiting_for_transitions():
+    agent = _Agent(memory=GameHistory(size=100, frame_shape=(4, 4)), config=_Config(observe_frames_before_learning=10))
+    learner = Learner(agent=agent, config=LearnerConfig(replay_ratio=1.0, sync_weights_every=100))
+    learner.start()
+    learner.stop()
+
+    assert not learner.is_alive()
+    assert learner.fit_steps == 0
@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+
+from flappy_ai.models.memmap_game_history import MemmapGameHistory
+from flappy_ai.models.memory_item import MemoryItem
+
+
+def _append(memory: MemmapGameHistory, count: int):
+    for idx in range(count):
+        item = MemoryItem(state=np.full((4, 4, 4), idx, dtype=np.uint8), action=[1, 0])
+        item.reward = 1
+        item.is_terminal = idx == count - 1
+        memory.append(item)
+
+
+def test_reopens_where_it_left_off(tmp_path):
+    memory = MemmapGameHistory(size=100, frame_shape=(4, 4), location=str(tmp_path))
+    _append(memory, 20)
+    memory.flush()
+    del memory
+
+    memory = MemmapGameHistory(size=100, frame_shape=(4, 4), location=str(tmp_path))
+    assert len(memory) == 23
+    assert memory.get_sample_batch(batch_size=8).states.shape == (8, 4, 4, 4)
+
+
+def test_a_crash_while_allocating_starts_fresh_next_time(tmp_path, monkeypatch):
+    _append(MemmapGameHistory(size=100, frame_shape=(4, 4), location=str(tmp_path)), 20)
+
+    allocate = MemmapGameHistory._allocate
+
+    def crash_before_meta(self, name, shape, dtype):
+        if name == "meta":
+            raise KeyboardInterrupt
+        return allocate(self, name, shape, dtype)
+
+    monkeypatch.setattr(MemmapGameHistory, "_allocate", crash_before_meta)
+    with pytest.raises(KeyboardInterrupt):
+        MemmapGameHistory(size=200, frame_shape=(4, 4), location=str(tmp_path))
+    monkeypatch.undo()
+
+    for size in (200, 100):
+        memory = MemmapGameHistory(size=size, frame_shape=(4, 4), location=str(tmp_path))
+        assert len(memory) == 0
+        del memory
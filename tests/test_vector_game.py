@@ -0,0 +1,66 @@
+from multiprocessing.connection import Pipe
+
+import numpy as np
+
+from flappy_ai.models.game_process import GameProcess
+from flappy_ai.models.vector_game import VectorGame
+
+
+def _random_actions(seed: int):
+    random_state = np.random.RandomState(seed)
+    return lambda states: (random_state.rand(len(states)) < 0.1).astype(np.int64)
+
+
+def test_steps_every_game_into_a_stacked_batch():
+    env = VectorGame(size=8, seed=0)
+
+    assert env.reset().shape == (8, 160, 120, 4)
+    observations, rewards, dones = env.step(np.zeros(8, dtype=np.int64))
+    assert observations.shape == (8, 160, 120, 4)
+    assert rewards.shape == dones.shape == (8,)
+
+
+def test_finished_games_start_over_on_the_next_step():
+    env = VectorGame(size=8, seed=0)
+    observations = env.reset()
+    choose_actions = _random_actions(0)
+    for _ in range(1000):
+        observations, rewards, dones = env.step(choose_actions(observations))
+        if np.any(dones):
+            break
+    assert np.any(dones)
+    np.testing.assert_array_equal(rewards[dones], -1)
+
+    # A new game has no history, its first frame fills the whole stack.
+    for frame in range(1, 4):
+        np.testing.assert_array_equal(observations[dones][..., frame], observations[dones][..., 0])
+    # The game goes on from its new start.
+    observations, rewards, _ = env.step(np.zeros(8, dtype=np.int64))
+    assert np.all(rewards[dones] == 1)
+
+
+def test_the_vector_actor_plays_every_episode_it_is_sent():
+    parent_pipe, child_pipe = Pipe()
+    episode_numbers = list(range(10, 30))
+    for episode_number in episode_numbers:
+        parent_pipe.send(episode_number)
+    results = []
+
+    def finished(result):
+        results.append(result)
+        if len(results) == len(episode_numbers):
+            parent_pipe.send(None)
+
+    GameProcess._play_vector_games(
+        child_pipe, lambda first: VectorGame(size=8, seed=first), _random_actions(0), finished
+    )
+
+    assert sorted(result.game_data.episode_number for result in results) == episode_numbers
+    for result in results:
+        items = list(result.game_data)
+        assert [item.is_terminal for item in items] == [False] * (len(items) - 1) + [True]
+        assert result.game_data.score == len(items) - 1
+        # Every step goes on from the state the one before it ended in.
+        for item, following in zip(items, items[1:]):
+            np.testing.assert_array_equal(following.state, item.next_state)
+        assert items[0].state.shape == (160, 120, 4)
@@ -0,0 +1,148 @@
+"""
+Trains DQNNetwork on the episodes the actors recorded (see RECORDER_CONFIG) with no game running,
+so collecting experience and training on it can happen at different times and on different machines.
+
+The weights, memory and epsilon carry on from the last run just like the keras process does, and are saved
+the same way when training stops. Episodes are read into the memory on a background thread, which waits for
+training to get through LEARNER_CONFIG.ReplayRatio batches per transition before adding more.
+
+    python3 train_offline.py
+    python3 train_offline.py --episodes data/episodes --steps 100000
+"""
+
+import argparse
+import threading
+import time
+
+import attr
+from structlog import get_logger
+
+from flappy_ai.config import learner_config, recorder_config, trace_config
+from flappy_ai.factories.network_factory import network_factory
+from flappy_ai.models.episode_archive import EpisodeArchive
+from flappy_ai.models.tracer import tracer
+from flappy_ai.types.network_types import NetworkTypes
+
+logger = get_logger(__name__)
+
+
+@attr.s(auto_attribs=True)
+class EpisodeFeeder:
+    """
+    Streams the archive into the memory from a background thread, but never further than training has got:
+    the next episode is only added once ReplayRatio batches have been trained per transition already added,
+    the same pace Learner keeps. Without it an archive bigger than the memory would be read straight through
+    and only its newest MaxMemorySize transitions would ever be trained on.
+    """
+
+    agent: any
+    archive: EpisodeArchive
+    replay_ratio: float
+
+    transitions: int = attr.ib(init=False, default=0)
+    episodes: int = attr.ib(init=False, default=0)
+    fit_steps: int = attr.ib(init=False, default=0)
+    done: bool = attr.ib(init=False, default=False)
+    # Transitions added before training starts, less whatever the memory already held.
+    _observing: int = attr.ib(init=False, default=0)
+    _condition: threading.Condition = attr.ib(init=False, default=attr.Factory(threading.Condition))
+
+    def start(self):
+        self._observing = max(self.agent.config.observe_frames_before_learning - len(self.agent.memory), 0)
+        threading.Thread(target=self._run, name="episode_feeder", daemon=True).start()
+
+    def steps_owed(self) -> int:
+        return int((self.transitions - self._observing) * self.replay_ratio) - self.fit_steps
+
+    def wait_for_steps(self):
+        """
+        Blocks until there is a batch to train on or every episode has been added.
+        """
+        with self._condition:
+            while self.steps_owed() <= 0 and not self.done:
+                self._condition.wait()
+
+    def trained(self):
+        with self._condition:
+            self.fit_steps += 1
+            self._condition.notify_all()
+
+    def _run(self):
+        try:
+            for episode in self.archive.episodes():
+                with self._condition:
+                    while self.steps_owed() > 0:
+                        self._condition.wait()
+                self.agent.memory.extend(
+                    episode.newest_frames(),
+                    episode.actions,
+                    episode.rewards,
+                    episode.terminals,
+                    earlier_frames=episode.earlier_frames(),
+                )
+                with self._condition:
+                    self.transitions += len(episode)
+                    self.episodes += 1
+                    self._condition.notify_all()
+        finally:
+            with self._condition:
+                self.done = True
+                self._condition.notify_all()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train on recorded episodes.")
+    parser.add_argument("--episodes", default=recorder_config.directory, help="Where the episodes were recorded.")
+    parser.add_argument("--steps", type=int, help="Batches to train on, defaults to ReplayRatio per transition.")
+    parser.add_argument("--save-every", type=int, default=1000, help="Batches between checkpoints.")
+    args = parser.parse_args()
+
+    tracer.configure(trace_config, process_name="train_offline")
+    archive = EpisodeArchive(directory=args.episodes)
+    transitions = archive.transitions()
+    if not transitions:
+        raise SystemExit(f"No recorded episodes found in {args.episodes}.")
+    steps = args.steps if args.steps is not None else int(transitions * learner_config.replay_ratio)
+
+    AGENT = network_factory(network_type=NetworkTypes.DQN)
+    AGENT.load()
+    logger.debug("Training on recorded episodes.", transitions=transitions, steps=steps, memory=len(AGENT.memory))
+
+    FEEDER = EpisodeFeeder(agent=AGENT, archive=archive, replay_ratio=learner_config.replay_ratio)
+    FEEDER.start()
+
+    start_time = time.time()
+    last_update = time.time()
+    try:
+        while FEEDER.fit_steps < steps:
+            # Keeps pace with the feeder, then flat out once every episode is in the memory.
+            FEEDER.wait_for_steps()
+            if len(AGENT.memory) <= AGENT.config.observe_frames_before_learning:
+                raise SystemExit(
+                    f"Only {len(AGENT.memory)} frames made it into the memory, "
+                    f"{AGENT.config.observe_frames_before_learning} are needed before learning starts."
+                )
+
+            with tracer.span("fit_batch", step=FEEDER.fit_steps):
+                AGENT.fit_batch()
+            FEEDER.trained()
+
+            if FEEDER.fit_steps % args.save_every == 0:
+                AGENT.save()
+            if time.time() - last_update > 60:
+                last_update = time.time()
+                logger.debug(
+                    "OFFLINE TRAINING UPDATE",
+                    fit_steps=FEEDER.fit_steps,
+                    steps_per_second=round(FEEDER.fit_steps / (time.time() - start_time), 1),
+                    episodes_loaded=FEEDER.episodes,
+                    memory_len=len(AGENT.memory),
+                    epsilon=AGENT._session_epsilon,
+                )
+    except KeyboardInterrupt:
+        logger.debug("Stopping early.", fit_steps=FEEDER.fit_steps)
+
+    AGENT.save(wait=True)
+    AGENT.save_snapshot()
+    tracer.dump()
+    logger.debug("Offline training done.", fit_steps=FEEDER.fit_steps, seconds=round(time.time() - start_time, 1))